@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.db.models.signals import post_delete, post_save
+
+        from .backends import invalidate_user
+
+        def _invalidate(sender, instance, **kwargs):
+            invalidate_user(instance.pk)
+
+        user_model = get_user_model()
+        post_save.connect(_invalidate, sender=user_model, dispatch_uid='accounts_user_cache_save')
+        post_delete.connect(_invalidate, sender=user_model, dispatch_uid='accounts_user_cache_delete')
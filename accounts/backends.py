@@ -0,0 +1,44 @@
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+
+_users = {}
+_lock = threading.Lock()
+
+
+def invalidate_user(user_id=None):
+    """Descarta o usuário do cache do processo (ou todos, sem argumento)."""
+    with _lock:
+        if user_id is None:
+            _users.clear()
+        else:
+            _users.pop(user_id, None)
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend que guarda por processo o usuário carregado da sessão.
+
+    O AuthenticationMiddleware chama get_user() em toda requisição
+    autenticada; com o cache, o SELECT do usuário sai de cada chamada HTMX.
+    Salvar ou excluir o usuário invalida a entrada neste processo (sinais
+    em accounts.apps); nos demais ela expira em AUTH_USER_CACHE_TIMEOUT
+    segundos.
+    """
+
+    def get_user(self, user_id):
+        timeout = getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60)
+        now = time.monotonic()
+        with _lock:
+            cached = _users.get(user_id)
+        if cached is not None and cached[1] > now:
+            # Cópia: cada requisição pode alterar o próprio objeto sem afetar as outras
+            return copy.copy(cached[0])
+
+        user = super().get_user(user_id)
+        if user is not None and timeout > 0:
+            with _lock:
+                _users[user_id] = (copy.copy(user), now + timeout)
+        return user
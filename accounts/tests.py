@@ -1,3 +1,70 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from products.models import Product
+
+from .backends import invalidate_user
+
+
+class AuthOverheadQueryCountTests(TestCase):
+    """Consultas de sessão/autenticação por requisição de fragmento HTMX."""
+
+    # Só a listagem de produtos do próprio fragmento
+    VIEW_QUERIES = 1
+
+    def setUp(self):
+        cache.clear()
+        invalidate_user()
+        self.user = User.objects.create_user('garcom', password='segredo-123')
+        Product.objects.create(name='Cerveja', category='CE', sale_price=10, cost_price=4, quantity=5)
+        self.url = reverse('search_products')
+
+    def _login(self):
+        self.assertTrue(self.client.login(username='garcom', password='segredo-123'))
+        invalidate_user()
+
+    def _warm_request(self):
+        # A primeira requisição preenche os caches de sessão e usuário
+        self.assertEqual(self.client.get(self.url, {'search': 'cer'}).status_code, 200)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db')
+    def test_db_sessions_cost_session_select(self):
+        self._login()
+        self._warm_request()
+        with self.assertNumQueries(self.VIEW_QUERIES + 1):
+            self.client.get(self.url, {'search': 'cer'})
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+    def test_cached_db_sessions_skip_bookkeeping_queries(self):
+        self._login()
+        self._warm_request()
+        with self.assertNumQueries(self.VIEW_QUERIES):
+            self.client.get(self.url, {'search': 'cer'})
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions_skip_bookkeeping_queries(self):
+        self._login()
+        self._warm_request()
+        with self.assertNumQueries(self.VIEW_QUERIES):
+            self.client.get(self.url, {'search': 'cer'})
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+    def test_saving_user_invalidates_cache(self):
+        self._login()
+        self._warm_request()
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+        AUTH_USER_CACHE_TIMEOUT=0,
+    )
+    def test_cache_can_be_disabled(self):
+        self._login()
+        self._warm_request()
+        with self.assertNumQueries(self.VIEW_QUERIES + 1):
+            self.client.get(self.url, {'search': 'cer'})
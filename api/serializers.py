@@ -0,0 +1,148 @@
+"""Serialização compacta (dicts simples) com seleção de campos.
+
+Cada recurso declara os campos disponíveis, os campos padrão e, quando
+for o caso, as colunas do model necessárias para montá-los (usadas em
+only()) e os prefetches que os campos aninhados exigem.
+"""
+from decimal import Decimal
+
+from django.db.models import Prefetch
+
+from sales.models import Payment, SaleItem
+
+
+def _money(value):
+    return str(Decimal(value).quantize(Decimal('0.01')))
+
+
+def _date(value):
+    return value.isoformat() if value else None
+
+
+class Resource:
+    fields = {}
+    default_fields = ()
+    columns = {}
+    prefetches = {}
+
+    @classmethod
+    def parse_fields(cls, raw):
+        """Valida ?fields=a,b,c; retorna None se algum campo não existir."""
+        if not raw:
+            return list(cls.default_fields)
+        requested = [name.strip() for name in raw.split(',') if name.strip()]
+        if not requested or any(name not in cls.fields for name in requested):
+            return None
+        return requested
+
+    @classmethod
+    def project(cls, queryset, fields):
+        columns = {'pk'}
+        for name in fields:
+            columns.update(cls.columns.get(name, ()))
+        if all(cls.columns.get(name) is not None for name in fields):
+            queryset = queryset.only(*columns)
+        lookups = [cls.prefetches[name] for name in fields if name in cls.prefetches]
+        return queryset.prefetch_related(*lookups) if lookups else queryset
+
+    @classmethod
+    def serialize(cls, obj, fields):
+        return {name: cls.fields[name](obj) for name in fields}
+
+
+class ProductResource(Resource):
+    fields = {
+        'id': lambda p: p.pk,
+        'name': lambda p: p.name,
+        'category': lambda p: p.category,
+        'sale_price': lambda p: _money(p.sale_price),
+        'cost_price': lambda p: _money(p.cost_price),
+        'quantity': lambda p: p.quantity,
+        'updated_at': lambda p: _date(p.updated_at),
+    }
+    default_fields = ('id', 'name', 'sale_price', 'quantity')
+    columns = {
+        'id': (),
+        'name': ('name',),
+        'category': ('category',),
+        'sale_price': ('sale_price',),
+        'cost_price': ('cost_price',),
+        'quantity': ('quantity',),
+        'updated_at': ('updated_at',),
+    }
+
+
+class ClientResource(Resource):
+    fields = {
+        'id': lambda c: c.pk,
+        'name': lambda c: c.name,
+        'nickname': lambda c: c.nickname,
+        'phone_number': lambda c: c.phone_number,
+        'debts': lambda c: _money(c.client_debts),
+        'updated_at': lambda c: _date(c.updated_at),
+    }
+    default_fields = ('id', 'name', 'debts')
+    columns = {
+        'id': (),
+        'name': ('name',),
+        'nickname': ('nickname',),
+        'phone_number': ('phone_number',),
+        'debts': ('client_debts',),
+        'updated_at': ('updated_at',),
+    }
+
+
+def _item(item):
+    return {
+        'id': item.pk,
+        'product_id': item.product_id,
+        'name': item.product.name,
+        'quantity': item.quantity,
+        'price': _money(item.price),
+    }
+
+
+def _payment(payment):
+    return {
+        'id': payment.pk,
+        'amount': _money(payment.amount),
+        'method': payment.method,
+        'created_at': _date(payment.created_at),
+    }
+
+
+class SaleResource(Resource):
+    """Espera um queryset com Sale.objects.with_totals()."""
+
+    fields = {
+        'id': lambda s: s.pk,
+        'status': lambda s: s.status,
+        'client_id': lambda s: s.client_id,
+        'client': lambda s: s.get_client_display(),
+        'total': lambda s: _money(s.total_amount),
+        'paid': lambda s: _money(s.paid_total),
+        'balance': lambda s: _money(s.total_amount - s.paid_total),
+        'created_at': lambda s: _date(s.created_at),
+        'updated_at': lambda s: _date(s.updated_at),
+        'items': lambda s: [_item(item) for item in s.items.all()],
+        'payments': lambda s: [_payment(payment) for payment in s.payments.all()],
+    }
+    default_fields = ('id', 'status', 'client', 'total', 'balance')
+    prefetches = {
+        'items': Prefetch(
+            'items',
+            queryset=SaleItem.objects.select_related('product').only(
+                'sale_id', 'product_id', 'product__name', 'quantity', 'price'
+            ).order_by('pk'),
+        ),
+        'payments': Prefetch(
+            'payments',
+            queryset=Payment.objects.only('sale_id', 'amount', 'method', 'created_at').order_by('pk'),
+        ),
+    }
+
+    @classmethod
+    def project(cls, queryset, fields):
+        if 'client' in fields:
+            queryset = queryset.select_related('client')
+        return super().project(queryset, fields)
@@ -0,0 +1,144 @@
+import json
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from clients.models import Client
+from products.models import Product, StockMovement
+from sales.models import Payment, Sale
+
+
+class ProductApiLedgerTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('gerente', password='x'))
+
+    def _ledger(self, product):
+        return StockMovement.objects.filter(product=product).aggregate(total=Sum('quantity'))['total']
+
+    def test_create_and_patch_keep_the_ledger_in_sync(self):
+        response = self.client.post('/api/products/', json.dumps({
+            'name': 'Cerveja', 'category': 'CE', 'sale_price': '10', 'cost_price': '4', 'quantity': 12,
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        product = Product.objects.get()
+        self.assertEqual(self._ledger(product), 12)
+
+        response = self.client.patch(
+            f'/api/products/{product.pk}/', json.dumps({'quantity': 7}), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 7)
+        self.assertEqual(self._ledger(product), 7)
+
+        # PATCH sem mudar a quantidade não grava movimento
+        self.client.patch(
+            f'/api/products/{product.pk}/', json.dumps({'sale_price': '11'}), content_type='application/json'
+        )
+        self.assertEqual(StockMovement.objects.filter(product=product).count(), 2)
+
+
+class StockReceiptApiTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('gerente', password='x'))
+        self.product = Product.objects.create(name='Cerveja', sale_price=10, cost_price=4)
+
+    def test_out_of_range_values_are_bad_requests(self):
+        for line in ({'quantity': 10 ** 19}, {'quantity': 1, 'unit_cost': '1e15'}):
+            response = self.client.post('/api/stock-receipts/', json.dumps({
+                'lines': [{'product_id': self.product.pk, **line}],
+            }), content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.quantity, self.product.cost_price), (0, Decimal('4.00')))
+
+
+class SalesApiTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('garcom', password='x'))
+        self.product = Product.objects.create(name='Cerveja', sale_price=10, cost_price=4, quantity=100)
+
+    def _sale(self, payment=None):
+        sale = Sale.objects.create(client_name='Mesa')
+        sale.add_item(self.product, 2)
+        if payment:
+            sale.apply_payment(Decimal(payment), method='pix')
+        return sale
+
+    def _post(self, url, data):
+        return self.client.post(url, json.dumps(data), content_type='application/json')
+
+    def test_matching_etag_returns_not_modified(self):
+        self._sale()
+        response = self.client.get('/api/sales/')
+        self.assertEqual(response.status_code, 200)
+
+        cached = self.client.get('/api/sales/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b'')
+
+        self._sale()
+        self.assertEqual(self.client.get('/api/sales/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_cursor_pagination_walks_every_sale_once(self):
+        expected = [self._sale().pk for _ in range(5)][::-1]
+        seen, cursor = [], None
+        while True:
+            params = {'limit': 2, 'fields': 'id', **({'cursor': cursor} if cursor else {})}
+            page = self.client.get('/api/sales/', params).json()
+            seen += [row['id'] for row in page['results']]
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
+        self.assertEqual(self.client.get('/api/sales/', {'cursor': '!!'}).status_code, 400)
+
+    def test_list_query_count_does_not_grow_with_sales(self):
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/api/sales/', {'fields': 'id,client,total,items,payments'})
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        self._sale(payment='5')
+        count_queries()  # sessão e usuário ficam em cache depois da primeira requisição
+        few = count_queries()
+        for _ in range(5):
+            self._sale(payment='5')
+        self.assertEqual(count_queries(), few)
+
+    def test_invalid_payment_amounts_are_bad_requests(self):
+        sale = self._sale()
+        for amount in ('NaN', 'sNaN', 'Infinity', '-Infinity', '1e20', '0', '-5', '1.001', 'abc', None):
+            with self.subTest(amount=amount):
+                response = self._post(f'/api/sales/{sale.pk}/payments/', {'amount': amount})
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(Payment.objects.exists())
+        self.assertEqual(self.client.get('/api/sales/').status_code, 200)
+
+        response = self._post(f'/api/sales/{sale.pk}/payments/', {'amount': '5.50', 'method': 'pix'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['balance'], '14.50')
+
+    def test_create_sale_validates_client_fields(self):
+        for data in (
+            {'client_name': 5},
+            {'client_name': ['Mesa']},
+            {'client_id': 'abc'},
+            {'client_id': [1]},
+            {'client_id': True},
+            {'client_id': 10 ** 30},
+        ):
+            with self.subTest(data=data):
+                self.assertEqual(self._post('/api/sales/', data).status_code, 400)
+        self.assertFalse(Sale.objects.exists())
+
+        client = Client.objects.create(name='Maria', phone_number='999')
+        response = self._post('/api/sales/', {'client_id': str(client.pk), 'client_name': ' Mesa 2 '})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Sale.objects.get().client, client)
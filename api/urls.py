@@ -0,0 +1,15 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('products/', views.products, name='api_products'),
+    path('products/<int:pk>/', views.product_detail, name='api_product_detail'),
+    path('clients/', views.clients, name='api_clients'),
+    path('clients/<int:pk>/', views.client_detail, name='api_client_detail'),
+    path('stock-receipts/', views.stock_receipts, name='api_stock_receipts'),
+    path('sales/', views.sales, name='api_sales'),
+    path('sales/<int:pk>/', views.sale_detail, name='api_sale_detail'),
+    path('sales/<int:pk>/items/', views.sale_items, name='api_sale_items'),
+    path('sales/<int:pk>/items/<int:item_id>/', views.sale_item_detail, name='api_sale_item_detail'),
+    path('sales/<int:pk>/payments/', views.sale_payments, name='api_sale_payments'),
+]
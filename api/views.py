@@ -0,0 +1,300 @@
+import base64
+import hashlib
+import json
+
+from django.http import (
+    HttpResponseNotAllowed,
+    JsonResponse,
+)
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from clients.forms import ClientForm
+from clients.models import Client
+from products.forms import ProductForm
+from products.models import Product, StockMovement, StockReceipt
+from sales.forms import PaymentForm
+from sales.models import Sale, SaleItem
+from .serializers import ClientResource, ProductResource, SaleResource, _money
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def _json(request, data, status=200):
+    """Resposta JSON compacta com ETag; devolve 304 se o cliente já tem a versão."""
+    body = json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode()
+    etag = f'"{hashlib.md5(body).hexdigest()}"'
+    if request.method == 'GET' and status == 200:
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+    response = JsonResponse({}, status=status)
+    response.content = body
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _error(request, message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _form_errors(form):
+    return JsonResponse({'errors': {field: [str(e) for e in errors] for field, errors in form.errors.items()}}, status=400)
+
+
+def api_login_required(view):
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return _error(request, "Autenticação necessária.", status=401)
+        return view(request, *args, **kwargs)
+    wrapper.__name__ = view.__name__
+    wrapper.__doc__ = view.__doc__
+    return wrapper
+
+
+def _body(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _encode_cursor(pk):
+    return base64.urlsafe_b64encode(str(pk).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    return int(base64.urlsafe_b64decode(padded.encode()).decode())
+
+
+def _list(request, resource, queryset, descending=False):
+    """Lista paginada por cursor (keyset no pk), com seleção de campos."""
+    fields = resource.parse_fields(request.GET.get('fields'))
+    if fields is None:
+        return _error(request, "Campo inválido em 'fields'.")
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        cursor = request.GET.get('cursor')
+        if cursor:
+            after = _decode_cursor(cursor)
+            queryset = queryset.filter(pk__lt=after) if descending else queryset.filter(pk__gt=after)
+    except (ValueError, TypeError):
+        return _error(request, "Parâmetro de paginação inválido.")
+
+    queryset = resource.project(queryset.order_by('-pk' if descending else 'pk'), fields)
+    rows = list(queryset[:limit + 1])
+    next_cursor = _encode_cursor(rows[limit - 1].pk) if len(rows) > limit else None
+    return _json(request, {
+        'results': [resource.serialize(obj, fields) for obj in rows[:limit]],
+        'next_cursor': next_cursor,
+    })
+
+
+def _detail(request, resource, queryset, pk, status=200):
+    fields = resource.parse_fields(request.GET.get('fields'))
+    if fields is None:
+        return _error(request, "Campo inválido em 'fields'.")
+    obj = get_object_or_404(resource.project(queryset, fields), pk=pk)
+    return _json(request, resource.serialize(obj, fields), status=status)
+
+
+@api_login_required
+def products(request):
+    if request.method == 'GET':
+        queryset = Product.objects.all()
+        if request.GET.get('search'):
+            queryset = queryset.filter(name__icontains=request.GET['search'])
+        return _list(request, ProductResource, queryset)
+    if request.method == 'POST':
+        data = _body(request)
+        if data is None:
+            return _error(request, "JSON inválido.")
+        form = ProductForm(data)
+        if not form.is_valid():
+            return _form_errors(form)
+        with transaction.atomic():
+            product = form.save()
+            StockMovement.record([(product, product.quantity)], StockMovement.Reason.ADJUSTMENT)
+        return _detail(request, ProductResource, Product.objects.all(), product.pk, status=201)
+    return HttpResponseNotAllowed(['GET', 'POST'])
+
+
+@api_login_required
+def product_detail(request, pk):
+    if request.method == 'GET':
+        return _detail(request, ProductResource, Product.objects.all(), pk)
+    if request.method == 'PATCH':
+        product = get_object_or_404(Product, pk=pk)
+        data = _body(request)
+        if data is None:
+            return _error(request, "JSON inválido.")
+        previous = product.quantity
+        form = ProductForm({**ProductForm(instance=product).initial, **data}, instance=product)
+        if not form.is_valid():
+            return _form_errors(form)
+        with transaction.atomic():
+            form.save()
+            # Mesmo registro das telas de produto: o ledger precisa acompanhar Product.quantity
+            StockMovement.record(
+                [(product, product.quantity - previous)], StockMovement.Reason.ADJUSTMENT
+            )
+        return _detail(request, ProductResource, Product.objects.all(), pk)
+    return HttpResponseNotAllowed(['GET', 'PATCH'])
+
+
+@api_login_required
+def clients(request):
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    queryset = Client.objects.all()
+    if request.GET.get('search'):
+        queryset = queryset.filter(name__icontains=request.GET['search'])
+    return _list(request, ClientResource, queryset)
+
+
+@api_login_required
+def client_detail(request, pk):
+    if request.method == 'GET':
+        return _detail(request, ClientResource, Client.objects.all(), pk)
+    if request.method == 'PATCH':
+        client = get_object_or_404(Client, pk=pk)
+        data = _body(request)
+        if data is None:
+            return _error(request, "JSON inválido.")
+        data.pop('photo', None)
+        form = ClientForm({**ClientForm(instance=client).initial, **data}, instance=client)
+        if not form.is_valid():
+            return _form_errors(form)
+        form.save()
+        return _detail(request, ClientResource, Client.objects.all(), pk)
+    return HttpResponseNotAllowed(['GET', 'PATCH'])
+
+
+@api_login_required
+def sales(request):
+    if request.method == 'GET':
+        queryset = Sale.objects.with_totals()
+        if request.GET.get('status'):
+            queryset = queryset.filter(status=request.GET['status'])
+        return _list(request, SaleResource, queryset, descending=True)
+    if request.method == 'POST':
+        data = _body(request)
+        if data is None:
+            return _error(request, "JSON inválido.")
+        client_id, client_name = data.get('client_id'), data.get('client_name') or ''
+        if not isinstance(client_name, str) or len(client_name) > 255:
+            return _error(request, "Nome do cliente inválido.")
+        client = None
+        if client_id:
+            if isinstance(client_id, bool) or not isinstance(client_id, (int, str)) \
+                    or not str(client_id).isdigit():
+                return _error(request, "Cliente inválido.")
+            client = Client.objects.filter(pk=int(client_id)).first()
+            if client is None:
+                return _error(request, "Cliente inválido.")
+        sale = Sale.objects.create(client=client, client_name=client_name.strip())
+        return _detail(request, SaleResource, Sale.objects.with_totals(), sale.pk, status=201)
+    return HttpResponseNotAllowed(['GET', 'POST'])
+
+
+@api_login_required
+def sale_detail(request, pk):
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    return _detail(request, SaleResource, Sale.objects.with_totals(), pk)
+
+
+@api_login_required
+def sale_items(request, pk):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    sale = get_object_or_404(Sale, pk=pk)
+    data = _body(request)
+    if data is None:
+        return _error(request, "JSON inválido.")
+    try:
+        if data.get('entry'):
+            # Lançamento rápido pelo código: {"entry": "12 x3"}
+            sale.add_item_by_code(str(data['entry']))
+        else:
+            try:
+                product = Product.objects.get(pk=int(data.get('product_id')))
+                quantity = int(data.get('quantity', 1))
+            except (Product.DoesNotExist, ValueError, TypeError):
+                return _error(request, "Produto ou quantidade inválidos.")
+            sale.add_item(product, quantity)
+    except ValueError as e:
+        return _error(request, str(e))
+    return _detail(request, SaleResource, Sale.objects.with_totals(), pk, status=201)
+
+
+@api_login_required
+def sale_item_detail(request, pk, item_id):
+    if request.method != 'DELETE':
+        return HttpResponseNotAllowed(['DELETE'])
+    sale = get_object_or_404(Sale, pk=pk)
+    if sale.status != Sale.STATUS_OPEN:
+        return _error(request, "Venda não está aberta.")
+    item = get_object_or_404(SaleItem, pk=item_id, sale=sale)
+    try:
+        sale.remove_item(item)
+    except ValueError as e:
+        return _error(request, str(e))
+    return _detail(request, SaleResource, Sale.objects.with_totals(), pk)
+
+
+@api_login_required
+def sale_payments(request, pk):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    sale = get_object_or_404(Sale, pk=pk)
+    if sale.status != Sale.STATUS_OPEN:
+        return _error(request, "Venda não está aberta.")
+    data = _body(request)
+    if data is None:
+        return _error(request, "JSON inválido.")
+    form = PaymentForm(data)
+    if not form.is_valid():
+        return _form_errors(form)
+    try:
+        sale.apply_payment(**form.cleaned_data)
+    except ValueError as e:
+        return _error(request, str(e))
+    return _detail(request, SaleResource, Sale.objects.with_totals(), pk, status=201)
+
+
+@api_login_required
+def stock_receipts(request):
+    """Entrada de mercadoria: {"supplier", "note", "lines": [{"product_id", "quantity", "unit_cost"}]}"""
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    data = _body(request)
+    if data is None or not isinstance(data.get('lines'), list):
+        return _error(request, "JSON inválido.")
+    lines = [line for line in data['lines'] if isinstance(line, dict)]
+    try:
+        receipt = StockReceipt.receive(
+            StockReceipt.parse_lines(
+                [line.get('product_id') for line in lines],
+                [line.get('quantity') for line in lines],
+                [line.get('unit_cost') for line in lines],
+            ),
+            user=request.user,
+            supplier=str(data.get('supplier') or '').strip(),
+            note=str(data.get('note') or '').strip(),
+        )
+    except ValueError as e:
+        return _error(request, str(e))
+    return _json(request, {
+        'id': receipt.pk,
+        'total_cost': _money(receipt.total_cost),
+        'lines': [
+            {'product_id': line.product_id, 'quantity': line.quantity, 'unit_cost': _money(line.unit_cost)}
+            for line in receipt.lines.all()
+        ],
+    }, status=201)
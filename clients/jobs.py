@@ -0,0 +1,31 @@
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+
+from tasks.queue import task
+from .models import Client
+
+PHOTO_MAX_SIZE = (800, 800)
+
+
+@task
+def shrink_client_photo(client_id):
+    """Reduz a foto enviada (celulares mandam 4000px+) e corrige a rotação EXIF."""
+    from PIL import Image, ImageOps
+
+    client = Client.objects.filter(pk=client_id).first()
+    if client is None or not client.photo:
+        return
+    with client.photo.open('rb') as f:
+        image = ImageOps.exif_transpose(Image.open(f))
+        image.load()
+    if image.width <= PHOTO_MAX_SIZE[0] and image.height <= PHOTO_MAX_SIZE[1]:
+        return
+    image.thumbnail(PHOTO_MAX_SIZE)
+    output = BytesIO()
+    image.convert('RGB').save(output, format='JPEG', quality=85, optimize=True)
+
+    old_name = client.photo.name
+    client.photo.save(f'client_{client.pk}.jpg', ContentFile(output.getvalue()), save=False)
+    Client.objects.filter(pk=client.pk).update(photo=client.photo.name)
+    client.photo.storage.delete(old_name)
@@ -1,6 +1,7 @@
 from django.shortcuts import render, redirect
 from clients.models import Client
 from clients.forms import ClientForm
+from clients.jobs import shrink_client_photo
 from django.contrib.auth.decorators import login_required
 
 
@@ -10,7 +11,8 @@ def client_list(request):
     form = ClientForm(request.POST or None, request.FILES or None)
 
     if request.method == 'POST' and form.is_valid():
-        form.save()
+        client = form.save()
+        shrink_client_photo.enqueue(client.pk)
         return redirect('client_list')
 
     return render(
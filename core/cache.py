@@ -0,0 +1,56 @@
+"""Gerações de cache compartilhadas entre workers.
+
+Cada namespace ('products', 'sales') tem um contador no cache padrão
+(CACHE_BACKEND). As chaves de dados incluem a geração atual, então
+invalidar é só trocar o contador por um valor novo: todos os workers passam a montar
+chaves novas e as antigas expiram sozinhas. Os caches por processo
+(products.codes) comparam a geração com a do momento em que foram
+montados.
+
+Os contadores são trocados pelos sinais em products.apps e
+sales.apps, sempre depois do commit, para que nenhum worker remonte o
+cache com dados ainda não gravados.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+PRODUCTS = 'products'
+SALES = 'sales'
+
+
+def _key(namespace):
+    return f'generation:{namespace}'
+
+
+def generation(namespace):
+    """Geração atual do namespace (cria o contador se não existir)."""
+    value = cache.get(_key(namespace))
+    if value is None:
+        # Começa no relógio: um contador expulso do cache não repete gerações antigas
+        start = time.time_ns() // 1000
+        cache.add(_key(namespace), start, timeout=None)
+        value = cache.get(_key(namespace), start)
+    return value
+
+
+def bump(namespace):
+    """Invalida tudo do namespace em todos os workers.
+
+    Grava uma geração nova a partir do relógio em vez de usar incr: no
+    FileBasedCache o incr é get+set, e dois bumps simultâneos virariam um
+    só. Assim qualquer bump, mesmo concorrente, troca a geração por uma
+    que nunca foi usada.
+    """
+    current = cache.get(_key(namespace)) or 0
+    cache.set(_key(namespace), max(time.time_ns() // 1000, current + 1), timeout=None)
+
+
+def bump_on_commit(namespace):
+    transaction.on_commit(lambda: bump(namespace))
+
+
+def versioned_key(namespace, *parts):
+    """'namespace:g<geração>:parte1:parte2...'"""
+    return ':'.join([namespace, f'g{generation(namespace)}', *map(str, parts)])
@@ -1,6 +1,8 @@
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -26,6 +28,8 @@ INSTALLED_APPS = [
     'accounts',
     'sales',
     'dashboard',
+    'api',
+    'tasks',
 ]
 
 MIDDLEWARE = [
@@ -65,6 +69,22 @@ DATABASES = {
     }
 }
 
+# Banco só de leitura para relatórios (ver dashboard.replica): uma réplica Postgres
+# ou uma cópia do SQLite atualizada por manage.py refresh_reporting_db
+if os.environ.get('REPORTING_DB_NAME'):
+    DATABASES['reporting'] = {
+        'ENGINE': os.environ.get('REPORTING_DB_ENGINE', 'django.db.backends.sqlite3'),
+        'NAME': os.environ['REPORTING_DB_NAME'],
+        'HOST': os.environ.get('REPORTING_DB_HOST', ''),
+        'PORT': os.environ.get('REPORTING_DB_PORT', ''),
+        'USER': os.environ.get('REPORTING_DB_USER', ''),
+        'PASSWORD': os.environ.get('REPORTING_DB_PASSWORD', ''),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['dashboard.replica.ReportingRouter']
+# Atraso máximo (segundos) aceito antes de os relatórios voltarem a ler do primário
+REPORTING_MAX_LAG = int(os.environ.get('REPORTING_MAX_LAG', 300))
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -95,9 +115,74 @@ STATIC_URL = '/static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache compartilhado entre workers: 'file' (padrão), 'db' (rode manage.py
+# createcachetable), 'redis' (requer o pacote redis) ou 'locmem' (só serve com
+# um único processo: cada worker teria suas próprias gerações). Os testes usam
+# locmem (ver core.test_runner).
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'file')
+CACHE_LOCATIONS = {
+    'locmem': 'disk-da-maga',
+    'file': str(BASE_DIR / 'cache'),
+    'db': 'django_cache',
+    'redis': 'redis://127.0.0.1:6379/0',
+}
+CACHE_ENGINES = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'db': 'django.core.cache.backends.db.DatabaseCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+if CACHE_BACKEND not in CACHE_ENGINES:
+    raise ImproperlyConfigured(
+        f"CACHE_BACKEND inválido: {CACHE_BACKEND!r} (use {', '.join(CACHE_ENGINES)})"
+    )
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_ENGINES[CACHE_BACKEND],
+        'LOCATION': os.environ.get('CACHE_LOCATION', CACHE_LOCATIONS[CACHE_BACKEND]),
+        'KEY_PREFIX': 'disk',
+    },
+}
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+# Sessões: 'cached_db' (padrão), 'db' ou 'signed_cookies' (sem consulta ao banco)
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'cached_db')
+SESSION_BACKENDS = ('cached_db', 'db', 'signed_cookies')
+if SESSION_BACKEND not in SESSION_BACKENDS:
+    raise ImproperlyConfigured(
+        f"SESSION_BACKEND inválido: {SESSION_BACKEND!r} (use {', '.join(SESSION_BACKENDS)})"
+    )
+SESSION_ENGINE = f'django.contrib.sessions.backends.{SESSION_BACKEND}'
+
+# Usuário da sessão fica em cache por processo (ver accounts.backends)
+AUTHENTICATION_BACKENDS = ['accounts.backends.CachedModelBackend']
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get('AUTH_USER_CACHE_TIMEOUT', 60))
+
+# Índice código -> produto em memória, conferido contra a geração 'products' (ver core.cache)
+PRODUCT_CODE_INDEX_TIMEOUT = 300
+
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'product_list'
 LOGOUT_REDIRECT_URL = 'login'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
+
+# Gráficos do relatório em PDF: 'matplotlib' (PNG) ou 'reportlab' (vetorial)
+REPORT_CHART_BACKEND = 'matplotlib'
+
+# Carrega matplotlib/reportlab em segundo plano quando o worker WSGI sobe
+REPORT_PREWARM = os.environ.get('REPORT_PREWARM', '') == '1'
+
+# Fila de tarefas (ver tasks.queue): com TASKS_ASYNC=1 o trabalho pesado vai para
+# o manage.py run_worker; desligado, roda na própria requisição
+TASKS_ASYNC = os.environ.get('TASKS_ASYNC', '') == '1'
+TASK_LOCK_TIMEOUT = 600
+TASK_RETENTION_DAYS = 7
+
+# Vendas antes desta hora contam para o dia anterior no fechamento de caixa
+BUSINESS_DAY_START_HOUR = 6
+
+# Arquivamento de vendas fechadas (ver manage.py archive_sales)
+SALES_ARCHIVE_DIR = BASE_DIR / 'archive'
+SALES_ARCHIVE_AFTER_DAYS = 365
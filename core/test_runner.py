@@ -0,0 +1,28 @@
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'disk-da-maga-tests',
+        'KEY_PREFIX': 'disk',
+    },
+}
+
+
+class TestRunner(DiscoverRunner):
+    """Roda os testes com cache em memória.
+
+    O cache padrão (arquivo, banco ou redis) sobrevive entre execuções e é
+    compartilhado com o servidor de desenvolvimento; gerações e dados em
+    cache de uma execução não podem vazar para a próxima.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._caches = override_settings(CACHES=TEST_CACHES)
+        self._caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._caches.disable()
+        super().teardown_test_environment(**kwargs)
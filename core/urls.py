@@ -12,6 +12,9 @@ from products.views import (
     ProductUpdateView,
     ProductDeleteView,
     search_products,
+    product_export,
+    product_import,
+    stock_receive,
 )
 
 urlpatterns = [
@@ -22,6 +25,9 @@ urlpatterns = [
     path('logout/', logout_view, name='logout'),
     path('products/', ProductListView.as_view(), name='product_list'),
     path('products/search/', search_products, name='search_products'),
+    path('products/export/', product_export, name='product_export'),
+    path('products/import/', product_import, name='product_import'),
+    path('products/receive/', stock_receive, name='stock_receive'),
     path(
         'products/create/', ProductCreateView.as_view(), name='product_create'
     ),
@@ -38,4 +44,5 @@ urlpatterns = [
     path('clients/', client_list, name='client_list'),
     path('sales/', include('sales.urls')),
     path('dashboard/', include('dashboard.urls')),
+    path('api/', include('api.urls')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.REPORT_PREWARM:
+    from dashboard.prewarm import prewarm_reports  # noqa: E402
+
+    prewarm_reports()
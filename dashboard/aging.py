@@ -0,0 +1,56 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, Min, Q, Sum, Value, When
+from django.utils import timezone
+
+from sales.models import Sale
+
+# (chave, rótulo, idade mínima em dias, idade máxima em dias ou None)
+AGING_BUCKETS = (
+    ('0_30', '0–30 dias', 0, 30),
+    ('31_60', '31–60 dias', 31, 60),
+    ('61_90', '61–90 dias', 61, 90),
+    ('90_plus', '90+ dias', 91, None),
+)
+
+
+def build_debt_aging(now=None):
+    """Saldo em aberto de cada cliente separado pela idade das comandas.
+
+    Uma única query agrupada por cliente: o saldo de cada venda aberta
+    (total dos itens - pagamentos, via Sale.objects.with_totals) é somado
+    no bucket de idade do created_at com agregação condicional. Comandas
+    avulsas, sem cliente cadastrado, ficam de fora.
+    """
+    now = now or timezone.now()
+    money = DecimalField(max_digits=14, decimal_places=2)
+    balance = F('total_amount') - F('paid_total')
+
+    buckets = {}
+    for key, _, min_days, max_days in AGING_BUCKETS:
+        age = Q(created_at__lte=now - timedelta(days=min_days))
+        if max_days is not None:
+            age &= Q(created_at__gt=now - timedelta(days=max_days + 1))
+        buckets[key] = Sum(Case(When(age, then=balance), default=Value(Decimal('0')), output_field=money))
+
+    rows = Sale.objects.with_totals()\
+        .filter(status=Sale.STATUS_OPEN, client__isnull=False)\
+        .values('client', 'client__name')\
+        .annotate(total=Sum(balance, output_field=money), oldest=Min('created_at'), **buckets)\
+        .filter(total__gt=0)\
+        .order_by('-total')
+
+    report = []
+    for row in rows:
+        report.append({
+            'client_id': row['client'],
+            'name': row['client__name'],
+            'buckets': {key: float(row[key]) for key, *_ in AGING_BUCKETS},
+            'total': float(row['total']),
+            'oldest_sale': timezone.localtime(row['oldest']).strftime('%d/%m/%Y'),
+            'days_outstanding': (now - row['oldest']).days,
+        })
+    # Quem deve há mais tempo primeiro, depois o maior saldo
+    report.sort(key=lambda r: (-r['buckets']['90_plus'], -r['buckets']['61_90'], -r['total']))
+    return report
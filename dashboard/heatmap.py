@@ -0,0 +1,82 @@
+from io import BytesIO
+
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractHour, ExtractWeekDay
+from django.utils import timezone
+
+from sales.models import Sale, SaleHourRollup, SaleItem
+
+# ExtractWeekDay devolve 1 (domingo) a 7 (sábado).
+WEEKDAY_LABELS = ['Dom', 'Seg', 'Ter', 'Qua', 'Qui', 'Sex', 'Sáb']
+
+
+def build_sales_heatmap(start_date, end_date):
+    """Matriz 7x24 (dia da semana x hora local) das vendas finalizadas.
+
+    O agrupamento é feito no banco, então o custo não depende do número
+    de vendas no período: são duas queries que devolvem no máximo 168
+    linhas cada. A parte já arquivada do período vem de SaleHourRollup,
+    uma linha por dia e hora.
+    """
+    tz = timezone.get_current_timezone()
+    sales = Sale.objects.filter(
+        status=Sale.STATUS_FINALIZED,
+        created_at__gte=start_date,
+        created_at__lte=end_date,
+    )
+    counts = [[0] * 24 for _ in range(7)]
+    revenue = [[0.0] * 24 for _ in range(7)]
+
+    rows = sales.annotate(
+        weekday=ExtractWeekDay('created_at', tzinfo=tz),
+        hour=ExtractHour('created_at', tzinfo=tz),
+    ).values('weekday', 'hour').annotate(total=Count('pk')).order_by()
+    for row in rows:
+        counts[row['weekday'] - 1][row['hour']] = row['total']
+
+    rows = SaleItem.objects.filter(sale__in=sales).annotate(
+        weekday=ExtractWeekDay('sale__created_at', tzinfo=tz),
+        hour=ExtractHour('sale__created_at', tzinfo=tz),
+    ).values('weekday', 'hour').annotate(
+        total=Sum(F('price') * F('quantity'))
+    ).order_by()
+    for row in rows:
+        revenue[row['weekday'] - 1][row['hour']] = float(row['total'] or 0)
+
+    _add_archived(counts, revenue, start_date, end_date)
+    return {
+        'weekdays': WEEKDAY_LABELS,
+        'hours': list(range(24)),
+        'counts': counts,
+        'revenue': revenue,
+    }
+
+
+def _add_archived(counts, revenue, start_date, end_date):
+    rows = SaleHourRollup.objects.filter(
+        day__gte=timezone.localtime(start_date).date(),
+        day__lte=timezone.localtime(end_date).date(),
+    ).annotate(weekday=ExtractWeekDay('day')).values('weekday', 'hour').annotate(
+        sales=Sum('sales'), total=Sum('revenue'),
+    ).order_by()
+    for row in rows:
+        counts[row['weekday'] - 1][row['hour']] += row['sales']
+        revenue[row['weekday'] - 1][row['hour']] += float(row['total'])
+
+
+def render_heatmap_png(heatmap):
+    """Desenha o heatmap de receita como PNG (API de Figure, sem pyplot)."""
+    from matplotlib.figure import Figure  # type: ignore
+
+    fig = Figure(figsize=(10, 3.5))
+    ax = fig.add_subplot()
+    image = ax.imshow(heatmap['revenue'], aspect='auto', cmap='Reds')
+    ax.set_yticks(range(7), labels=heatmap['weekdays'])
+    ax.set_xticks(range(24), labels=[f'{h}h' for h in heatmap['hours']], fontsize=8)
+    ax.set_title('Receita por dia da semana e hora', fontsize=12, fontweight='bold')
+    fig.colorbar(image, ax=ax, label='R$')
+    fig.tight_layout()
+
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png')
+    return buffer.getvalue()
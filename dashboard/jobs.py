@@ -0,0 +1,30 @@
+from datetime import datetime
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from tasks.queue import enqueue, task
+from .replica import reporting_reads
+
+REPORTS_DIR = 'reports'
+# PDF não baixado é apagado depois deste tempo (o download apaga na hora)
+REPORT_FILE_TTL = 3600
+
+
+@task(priority=5, max_attempts=2)
+def render_report_pdf(start_date, end_date, granularity, path):
+    """Gera o PDF do relatório (datas em ISO) e grava em `path` no default_storage."""
+    from .pdf import build_report_pdf
+    from .views import _get_report_data
+
+    start_date = datetime.fromisoformat(start_date)
+    end_date = datetime.fromisoformat(end_date)
+    with reporting_reads():
+        data = _get_report_data(start_date, end_date, granularity)
+    default_storage.save(path, ContentFile(build_report_pdf(data, start_date, end_date)))
+    enqueue(delete_report_pdf, [path], delay=REPORT_FILE_TTL)
+
+
+@task
+def delete_report_pdf(path):
+    default_storage.delete(path)
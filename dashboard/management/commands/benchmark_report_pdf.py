@@ -0,0 +1,80 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from dashboard.pdf import CHART_BACKENDS, build_report_pdf
+from dashboard.views import _get_report_data
+
+
+def _sample_data(buckets):
+    labels = [f'{day:02d}/01/2025' for day in range(1, buckets + 1)]
+    products = ['Cerveja', 'Refrigerante', 'Whisky', 'Petiscos', 'Outros']
+    return {
+        'granularity': 'day',
+        'series_title': 'Vendas por Dia',
+        'series_labels': labels,
+        'series_values': [float(100 + (i * 37) % 250) for i in range(buckets)],
+        'product_percentages': [
+            {'name': name, 'percentage': 20.0, 'total': 500.0, 'quantity': 50}
+            for name in products
+        ],
+        'total_vendas': 2500.0,
+        'total_produtos_vendidos': 250,
+        'out_of_stock': 0,
+        'most_sold_product': {'name': 'Cerveja', 'quantity': 50},
+        'least_sold_product': {'name': 'Outros', 'quantity': 50},
+        'has_data': True,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compara tempo de geração e tamanho do PDF do relatório por backend de gráficos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=20)
+        parser.add_argument('--buckets', type=int, default=12,
+                            help='Barras no gráfico de vendas (dados sintéticos).')
+        parser.add_argument('--from-db', action='store_true',
+                            help='Usa as vendas reais dos últimos 30 dias.')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Threads gerando PDFs ao mesmo tempo (como workers do servidor).')
+
+    def handle(self, *args, **options):
+        end_date = timezone.now()
+        start_date = end_date - timedelta(days=30)
+        if options['from_db']:
+            data = _get_report_data(start_date, end_date, 'day')
+        else:
+            data = _sample_data(options['buckets'])
+
+        for backend in CHART_BACKENDS:
+            build_report_pdf(data, start_date, end_date, chart_backend=backend)  # aquecimento
+            timings = []
+            for _ in range(options['runs']):
+                started = time.perf_counter()
+                pdf = build_report_pdf(data, start_date, end_date, chart_backend=backend)
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f"{backend:<11} média {statistics.mean(timings):7.1f} ms  "
+                f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:7.1f} ms  "
+                f"tamanho {len(pdf) / 1024:7.1f} KiB"
+            )
+
+            # Mesmo lote em paralelo: tempo médio por PDF com as threads disputando CPU e GIL
+            workers = options['concurrency']
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(build_report_pdf, data, start_date, end_date, chart_backend=backend)
+                    for _ in range(options['runs'])
+                ]
+                for future in futures:
+                    future.result()
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stdout.write(
+                f"{'':<11} {workers} threads: {elapsed / options['runs']:7.1f} ms por PDF"
+            )
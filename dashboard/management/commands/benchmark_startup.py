@@ -0,0 +1,88 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Roda num processo novo: sobe o WSGI e carrega as URLconfs, como um worker antes do 1º request
+CHILD_SCRIPT = """
+import json, resource, sys, time
+started = time.perf_counter()
+from core.wsgi import application
+from django.urls import get_resolver
+get_resolver().url_patterns
+elapsed = time.perf_counter() - started
+if '--wait-prewarm' in sys.argv:
+    import threading
+    for thread in threading.enumerate():
+        if thread.name == 'report-prewarm':
+            thread.join()
+print(json.dumps({
+    'seconds': elapsed,
+    'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'heavy': [name for name in %r if name in sys.modules],
+}))
+"""
+
+HEAVY_MODULES = ('matplotlib', 'reportlab', 'numpy')
+
+
+def _parse_importtime(stderr):
+    """{módulo: tempo cumulativo em ms} das linhas de -X importtime."""
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, _, rest = line.partition(':')
+        _, total, name = (part.strip() for part in rest.split('|'))
+        cumulative[name] = int(total) / 1000
+    return cumulative
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede o boot de um worker (core.wsgi + URLconfs) em processos novos: '
+        'tempo, RSS máximo, módulos de relatório carregados e os imports mais caros.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--top', type=int, default=10,
+                            help='Quantos imports mais caros listar (-X importtime).')
+        parser.add_argument('--prewarm', action='store_true',
+                            help='Liga REPORT_PREWARM e espera o pre-warm terminar.')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+        argv = [sys.executable, '-X', 'importtime', '-c', CHILD_SCRIPT % (HEAVY_MODULES,)]
+        if options['prewarm']:
+            env['REPORT_PREWARM'] = '1'
+            argv.append('--wait-prewarm')
+
+        runs = []
+        for _ in range(options['runs']):
+            proc = subprocess.run(
+                argv, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                raise CommandError(proc.stderr[-2000:])
+            runs.append((json.loads(proc.stdout.strip().splitlines()[-1]), _parse_importtime(proc.stderr)))
+
+        seconds = [result['seconds'] * 1000 for result, _ in runs]
+        rss = [result['rss_kb'] / 1024 for result, _ in runs]
+        result, importtime = runs[-1]
+        self.stdout.write(
+            f"boot     mediana {statistics.median(seconds):7.1f} ms  "
+            f"min {min(seconds):7.1f} ms  ({len(runs)} execuções)"
+        )
+        self.stdout.write(f"RSS máx  mediana {statistics.median(rss):7.1f} MB")
+        heavy = ', '.join(result['heavy']) or 'nenhum'
+        self.stdout.write(f"módulos de relatório carregados: {heavy}")
+
+        self.stdout.write("\nimports mais caros (cumulativo, última execução):")
+        for name, ms in sorted(importtime.items(), key=lambda kv: kv[1], reverse=True)[:options['top']]:
+            self.stdout.write(f"  {ms:8.1f} ms  {name}")
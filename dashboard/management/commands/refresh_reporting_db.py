@@ -0,0 +1,57 @@
+import os
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from dashboard.models import ReplicaHeartbeat
+from dashboard.replica import REPORTING_ALIAS, replica_lag
+
+SQLITE_ENGINE = 'django.db.backends.sqlite3'
+
+
+class Command(BaseCommand):
+    help = (
+        'Grava a batida de replicação no primário e, se os dois bancos forem SQLite, '
+        'copia o primário para o banco de relatórios (REPORTING_DB_NAME). '
+        'Com réplica Postgres só a batida é gravada; a replicação leva o resto.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=float, default=0,
+                            help='Repete a cada N segundos (0 = uma vez só).')
+
+    def handle(self, *args, **options):
+        if REPORTING_ALIAS not in connections.databases:
+            raise CommandError("Banco de relatórios não configurado (REPORTING_DB_NAME).")
+        while True:
+            self.refresh()
+            if not options['every']:
+                break
+            time.sleep(options['every'])
+
+    def refresh(self):
+        started = time.monotonic()
+        ReplicaHeartbeat.beat()
+        primary = connections.databases[DEFAULT_DB_ALIAS]
+        reporting = connections.databases[REPORTING_ALIAS]
+        if primary['ENGINE'] == SQLITE_ENGINE and reporting['ENGINE'] == SQLITE_ENGINE:
+            self._copy_sqlite(str(primary['NAME']), str(reporting['NAME']))
+            connections[REPORTING_ALIAS].close()
+        lag = replica_lag()
+        lag = 'sem batida' if lag is None else f'{lag:.1f}s'
+        self.stdout.write(f"Banco de relatórios atualizado em {time.monotonic() - started:.2f}s (atraso {lag})")
+
+    def _copy_sqlite(self, source, target):
+        # API de backup do SQLite: cópia consistente sem travar o primário durante todo o processo;
+        # o arquivo novo substitui o antigo de uma vez, então leitores nunca veem cópia pela metade
+        tmp = f'{target}.tmp'
+        src = sqlite3.connect(source)
+        dst = sqlite3.connect(tmp)
+        try:
+            src.backup(dst, pages=1024, sleep=0.01)
+        finally:
+            dst.close()
+            src.close()
+        os.replace(tmp, target)
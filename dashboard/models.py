@@ -1,3 +1,12 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class ReplicaHeartbeat(models.Model):
+    """Linha única gravada no primário; no banco de relatórios mostra o atraso da cópia."""
+
+    beat_at = models.DateTimeField(verbose_name='Batida em')
+
+    @classmethod
+    def beat(cls, using='default'):
+        cls.objects.using(using).update_or_create(pk=1, defaults={'beat_at': timezone.now()})
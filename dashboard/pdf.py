@@ -0,0 +1,298 @@
+"""Montagem do relatório financeiro em PDF.
+
+Usa apenas a API orientada a objetos do matplotlib (Figure +
+FigureCanvasAgg), sem o gerenciador global de figuras do pyplot, então
+pode ser chamada de várias threads ao mesmo tempo. Os estilos do
+ReportLab são criados uma única vez, na importação do módulo.
+
+Os gráficos podem ser gerados como PNG pelo matplotlib (padrão) ou
+desenhados como vetor diretamente pelo reportlab.graphics, conforme
+settings.REPORT_CHART_BACKEND ('matplotlib' ou 'reportlab').
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.utils import timezone
+
+import matplotlib  # type: ignore
+matplotlib.use('Agg')  # Backend não-interativo
+from matplotlib.backends.backend_agg import FigureCanvasAgg  # type: ignore
+from matplotlib.figure import Figure  # type: ignore
+
+from reportlab.graphics.charts.barcharts import VerticalBarChart  # type: ignore
+from reportlab.graphics.charts.piecharts import Pie  # type: ignore
+from reportlab.graphics.shapes import Drawing, String  # type: ignore
+from reportlab.lib import colors  # type: ignore
+from reportlab.lib.enums import TA_CENTER  # type: ignore
+from reportlab.lib.pagesizes import A4  # type: ignore
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet  # type: ignore
+from reportlab.lib.units import inch  # type: ignore
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle  # type: ignore
+
+# Estilos (somente leitura depois de criados)
+STYLES = getSampleStyleSheet()
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=STYLES['Heading1'],
+    fontSize=24,
+    textColor=colors.HexColor('#B91C1C'),  # Vermelho similar ao tema
+    spaceAfter=30,
+    alignment=TA_CENTER
+)
+HEADING_STYLE = ParagraphStyle(
+    'CustomHeading',
+    parent=STYLES['Heading2'],
+    fontSize=16,
+    textColor=colors.HexColor('#B91C1C'),
+    spaceAfter=12,
+    spaceBefore=12
+)
+FOOTER_STYLE = ParagraphStyle(
+    'Footer',
+    parent=STYLES['Normal'],
+    alignment=TA_CENTER,
+    fontSize=9,
+    textColor=colors.grey
+)
+STATS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#FEE2E2')),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 11),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+    ('TOPPADDING', (0, 0), (-1, -1), 12),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+])
+PRODUCT_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#B91C1C')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+])
+CHART_COLORS = ['#2563EB', '#F97316', '#10B981', '#06B6D4', '#8B5CF6']
+CHART_BACKENDS = ('matplotlib', 'reportlab')
+CHART_WIDTH = 5.5*inch
+CHART_HEIGHT = 3.7*inch
+
+# Pool compartilhado para desenhar os dois gráficos em paralelo
+_chart_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='pdf-chart')
+
+
+def _format_currency(value):
+    return f"R$ {float(value):,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def _figure_png(fig):
+    img_buffer = BytesIO()
+    FigureCanvasAgg(fig).print_png(img_buffer)
+    img_buffer.seek(0)
+    return img_buffer
+
+
+def render_series_chart(title, labels, values):
+    """Gráfico de barras das vendas por período, como PNG em memória"""
+    fig = Figure(figsize=(6, 4))
+    ax = fig.add_subplot()
+    bars = ax.bar(labels, values, color='#2563EB', edgecolor='black')
+    ax.set_ylabel('Valor (R$)', fontsize=10)
+    ax.set_xlabel('Período', fontsize=10)
+    ax.set_title(title, fontsize=12, fontweight='bold')
+    ax.grid(axis='y', alpha=0.3)
+
+    # Adicionar valores nas barras (só quando há espaço)
+    if len(bars) <= 12:
+        for bar in bars:
+            height = bar.get_height()
+            ax.text(bar.get_x() + bar.get_width()/2., height,
+                    f'R$ {height:,.0f}'.replace(',', '.'),
+                    ha='center', va='bottom', fontsize=8)
+    else:
+        ax.tick_params(axis='x', labelrotation=90, labelsize=6)
+
+    fig.tight_layout()
+    return _figure_png(fig)
+
+
+def render_products_chart(product_percentages):
+    """Gráfico de pizza da participação por produto, como PNG em memória"""
+    fig = Figure(figsize=(6, 4))
+    ax = fig.add_subplot()
+    ax.pie(
+        [p['percentage'] for p in product_percentages],
+        labels=[p['name'] for p in product_percentages],
+        colors=CHART_COLORS[:len(product_percentages)],
+        autopct='%1.1f%%',
+        startangle=90,
+        textprops={'fontsize': 9},
+    )
+    ax.set_title('Participação por Produto', fontsize=12, fontweight='bold')
+    fig.tight_layout()
+    return _figure_png(fig)
+
+
+def draw_series_chart(title, labels, values):
+    """Gráfico de barras vetorial (reportlab.graphics)"""
+    drawing = Drawing(CHART_WIDTH, CHART_HEIGHT)
+    drawing.add(String(CHART_WIDTH / 2, CHART_HEIGHT - 16, title,
+                       fontName='Helvetica-Bold', fontSize=12, textAnchor='middle'))
+
+    chart = VerticalBarChart()
+    chart.x = 60
+    chart.y = 50
+    chart.width = CHART_WIDTH - 80
+    chart.height = CHART_HEIGHT - 90
+    chart.data = [list(values)]
+    chart.bars[0].fillColor = colors.HexColor('#2563EB')
+    chart.bars[0].strokeColor = colors.black
+    chart.valueAxis.valueMin = 0
+    if not any(values):
+        chart.valueAxis.valueMax = 1
+    chart.valueAxis.labelTextFormat = lambda v: f'R$ {v:,.0f}'.replace(',', '.')
+    chart.valueAxis.labels.fontSize = 8
+    chart.valueAxis.visibleGrid = True
+    chart.valueAxis.gridStrokeColor = colors.lightgrey
+    chart.categoryAxis.categoryNames = list(labels)
+    chart.categoryAxis.labels.fontSize = 8
+    if len(labels) > 12:
+        chart.categoryAxis.labels.angle = 90
+        chart.categoryAxis.labels.boxAnchor = 'e'
+        chart.categoryAxis.labels.fontSize = 6
+    else:
+        chart.barLabelFormat = lambda v: f'R$ {v:,.0f}'.replace(',', '.')
+        chart.barLabels.fontSize = 7
+        chart.barLabels.nudge = 7
+    drawing.add(chart)
+    return drawing
+
+
+def draw_products_chart(product_percentages):
+    """Gráfico de pizza vetorial (reportlab.graphics)"""
+    drawing = Drawing(CHART_WIDTH, CHART_HEIGHT)
+    drawing.add(String(CHART_WIDTH / 2, CHART_HEIGHT - 16, 'Participação por Produto',
+                       fontName='Helvetica-Bold', fontSize=12, textAnchor='middle'))
+
+    pie = Pie()
+    size = CHART_HEIGHT - 80
+    pie.x = (CHART_WIDTH - size) / 2
+    pie.y = 25
+    pie.width = pie.height = size
+    pie.data = [p['percentage'] for p in product_percentages]
+    pie.labels = [f"{p['name']} ({p['percentage']:.1f}%)" for p in product_percentages]
+    pie.startAngle = 90
+    pie.direction = 'anticlockwise'
+    pie.simpleLabels = 0
+    pie.slices.fontSize = 8
+    pie.slices.strokeColor = colors.white
+    for i in range(len(product_percentages)):
+        pie.slices[i].fillColor = colors.HexColor(CHART_COLORS[i % len(CHART_COLORS)])
+    drawing.add(pie)
+    return drawing
+
+
+def _chart_flowable(chart):
+    """PNG assíncrono (matplotlib) vira Image; Drawing já é um flowable"""
+    if isinstance(chart, Future):
+        return Image(chart.result(), width=CHART_WIDTH, height=CHART_HEIGHT)
+    return chart
+
+
+def build_report_pdf(data, start_date, end_date, chart_backend=None):
+    """Monta o PDF do relatório a partir de _get_report_data e retorna os bytes"""
+    product_percentages = data['product_percentages']
+    most_sold_product = data['most_sold_product']
+    chart_backend = chart_backend or getattr(settings, 'REPORT_CHART_BACKEND', 'matplotlib')
+    if chart_backend not in CHART_BACKENDS:
+        raise ValueError(f"Backend de gráficos inválido: {chart_backend}")
+
+    series_chart = products_chart = None
+    show_products_chart = sum(p['percentage'] for p in product_percentages) > 0
+    if chart_backend == 'reportlab':
+        if data['has_data']:
+            series_chart = draw_series_chart(
+                data['series_title'], data['series_labels'], data['series_values']
+            )
+        if show_products_chart:
+            products_chart = draw_products_chart(product_percentages)
+    else:
+        # Gráficos desenhados em paralelo enquanto o restante do documento é montado
+        if data['has_data']:
+            series_chart = _chart_executor.submit(
+                render_series_chart, data['series_title'], data['series_labels'], data['series_values']
+            )
+        if show_products_chart:
+            products_chart = _chart_executor.submit(render_products_chart, product_percentages)
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=30, leftMargin=30,
+                            topMargin=30, bottomMargin=30)
+    story = []
+
+    # Título
+    story.append(Paragraph("Relatório Financeiro", TITLE_STYLE))
+    story.append(Spacer(1, 0.2*inch))
+
+    # Período
+    period_text = f"Período: {start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}"
+    story.append(Paragraph(period_text, STYLES['Normal']))
+    story.append(Spacer(1, 0.3*inch))
+
+    # Estatísticas gerais
+    story.append(Paragraph("Estatísticas Gerais", HEADING_STYLE))
+    stats_data = [
+        ['Total de Vendas', _format_currency(data['total_vendas'])],
+        ['Total de Produtos Vendidos', f"{data['total_produtos_vendidos']} unidades"],
+        ['Produtos em Falta', f"{data['out_of_stock']} produtos"],
+    ]
+
+    if most_sold_product:
+        stats_data.append(['Produto Mais Vendido', f"{most_sold_product['name']} ({most_sold_product['quantity']} unidades)"])
+
+    # Mensagem se não houver dados
+    if not data['has_data']:
+        story.append(Paragraph("Não há vendas no período selecionado.", STYLES['Normal']))
+        story.append(Spacer(1, 0.2*inch))
+
+    stats_table = Table(stats_data, colWidths=[4*inch, 2.5*inch])
+    stats_table.setStyle(STATS_TABLE_STYLE)
+    story.append(stats_table)
+    story.append(Spacer(1, 0.3*inch))
+
+    # Gráfico de vendas por período
+    if series_chart:
+        story.append(Paragraph(data['series_title'], HEADING_STYLE))
+        story.append(_chart_flowable(series_chart))
+        story.append(Spacer(1, 0.3*inch))
+
+    # Participação por produto
+    if product_percentages:
+        story.append(Paragraph("Participação por Produto", HEADING_STYLE))
+
+        product_data = [['Produto', 'Participação', 'Total Vendido']]
+        for product in product_percentages:
+            product_data.append([
+                product['name'],
+                f"{product['percentage']:.1f}%",
+                _format_currency(product['total'])
+            ])
+
+        product_table = Table(product_data, colWidths=[2.5*inch, 2*inch, 2*inch])
+        product_table.setStyle(PRODUCT_TABLE_STYLE)
+        story.append(product_table)
+        story.append(Spacer(1, 0.3*inch))
+        if products_chart:
+            story.append(_chart_flowable(products_chart))
+
+    # Rodapé
+    story.append(Spacer(1, 0.3*inch))
+    footer_text = f"Relatório gerado em {timezone.localtime().strftime('%d/%m/%Y às %H:%M')}"
+    story.append(Paragraph(footer_text, FOOTER_STYLE))
+
+    doc.build(story)
+    return buffer.getvalue()
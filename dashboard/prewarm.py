@@ -0,0 +1,33 @@
+"""Pre-warm opcional das dependências pesadas dos relatórios.
+
+matplotlib, reportlab e numpy não são importados no boot (ver
+dashboard.views); quem gera o primeiro PDF paga o custo. Com
+REPORT_PREWARM ligado, o worker WSGI faz isso em segundo plano logo
+depois de subir, sem atrasar o boot.
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def _warm():
+    try:
+        import numpy  # noqa: F401
+
+        from . import pdf
+
+        # Desenha um gráfico mínimo para carregar fontes e caches do matplotlib
+        pdf.render_products_chart([{'name': '-', 'percentage': 100.0, 'total': 1.0, 'quantity': 1}])
+        logger.info("Dependências dos relatórios pré-carregadas")
+    except Exception:
+        logger.exception("Falha no pre-warm dos relatórios")
+
+
+def prewarm_reports(background=True):
+    if not background:
+        _warm()
+        return None
+    thread = threading.Thread(target=_warm, name='report-prewarm', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,84 @@
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from products.models import Product
+from sales.archive import rollups_between
+from sales.models import Sale, SaleItem
+
+GROUPINGS = ('product', 'category', 'month')
+
+
+def build_profitability_report(start_date, end_date, group_by='product'):
+    """Receita, custo e margem das vendas finalizadas, agrupados no banco.
+
+    `group_by` aceita 'product', 'category' ou 'month'. O custo vem do
+    snapshot SaleItem.cost_price, então a margem histórica não muda quando
+    o custo do produto é alterado. Vendas arquivadas entram via SaleRollup.
+    """
+    if group_by not in GROUPINGS:
+        raise ValueError(f"Agrupamento inválido: {group_by}")
+
+    money = DecimalField(max_digits=14, decimal_places=2)
+    items = SaleItem.objects.filter(
+        sale__status=Sale.STATUS_FINALIZED,
+        sale__created_at__gte=start_date,
+        sale__created_at__lte=end_date,
+    )
+
+    rollups = rollups_between(start_date, end_date)
+
+    if group_by == 'product':
+        items = items.values(key=F('product__name'))
+        rollups = rollups.values(key=F('product_name'))
+    elif group_by == 'category':
+        items = items.values(key=F('product__category'))
+        rollups = rollups.values(key=F('category'))
+    else:
+        items = items.annotate(
+            key=TruncMonth('sale__created_at', tzinfo=timezone.get_current_timezone())
+        ).values('key')
+        rollups = rollups.annotate(key=TruncMonth('day')).values('key')
+
+    rows = {}
+    for row in items.annotate(
+        units=Sum('quantity'),
+        revenue=Sum(F('price') * F('quantity'), output_field=money),
+        cost=Sum(F('cost_price') * F('quantity'), output_field=money),
+    ):
+        key = row['key'].date() if group_by == 'month' else row['key']
+        rows[key] = row
+    for row in rollups.annotate(units=Sum('units'), revenue=Sum('revenue'), cost=Sum('cost')):
+        current = rows.setdefault(row['key'], {'units': 0, 'revenue': None, 'cost': None})
+        current['units'] = (current['units'] or 0) + row['units']
+        current['revenue'] = (current['revenue'] or 0) + row['revenue']
+        current['cost'] = (current['cost'] or 0) + row['cost']
+
+    if group_by == 'month':
+        ordered = sorted(rows.items())
+    else:
+        ordered = sorted(rows.items(), key=lambda kv: kv[1]['revenue'] or 0, reverse=True)
+
+    categories = dict(Product.Category.choices)
+    report = []
+    for key, row in ordered:
+        revenue = row['revenue'] or Decimal('0.00')
+        cost = row['cost'] or Decimal('0.00')
+        margin = revenue - cost
+        if group_by == 'category':
+            label = categories.get(key, key)
+        elif group_by == 'month':
+            label = key.strftime('%m/%Y')
+        else:
+            label = key
+        report.append({
+            'label': label,
+            'units': row['units'] or 0,
+            'revenue': float(revenue),
+            'cost': float(cost),
+            'margin': float(margin),
+            'margin_percentage': float(margin / revenue * 100) if revenue else 0.0,
+        })
+    return report
@@ -0,0 +1,116 @@
+"""Leituras de relatório no banco 'reporting' (réplica ou cópia do SQLite).
+
+Dentro de `reporting_reads()` (context manager ou decorator) as leituras
+de vendas, produtos e clientes vão para o alias devolvido por
+reporting_db(); as escritas continuam no primário. reporting_db() só
+escolhe a réplica se ela estiver configurada, acessível e com atraso
+(medido pela ReplicaHeartbeat) de até REPORTING_MAX_LAG segundos; caso
+contrário os relatórios leem do primário. A decisão fica em cache por
+REPORTING_CHECK_INTERVAL segundos neste processo.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+REPORTING_ALIAS = 'reporting'
+REPORTING_CHECK_INTERVAL = 10
+# Só estes apps leem da réplica; sessão, usuários, cache em banco e fila ficam no primário
+REPORTING_APPS = {'clients', 'products', 'sales', 'dashboard'}
+
+_read_alias = contextvars.ContextVar('reporting_read_alias', default=None)
+_choice = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def replica_lag(alias=REPORTING_ALIAS):
+    """Atraso da réplica em segundos, ou None se não for possível medir."""
+    from .models import ReplicaHeartbeat
+
+    connection = connections[alias]
+    if connection.vendor == 'sqlite' and not connection.is_in_memory_db():
+        # Conectar num arquivo inexistente criaria um banco vazio no lugar da cópia
+        if not os.path.exists(connection.settings_dict['NAME']):
+            return None
+    beat = ReplicaHeartbeat.objects.using(alias).values_list('beat_at', flat=True).first()
+    if beat is None:
+        return None
+    return max((timezone.now() - beat).total_seconds(), 0.0)
+
+
+def reporting_db():
+    """Alias para leituras de relatório: a réplica se estiver em dia, senão o primário."""
+    global _choice, _checked_at
+    if REPORTING_ALIAS not in connections.databases:
+        return DEFAULT_DB_ALIAS
+    with _lock:
+        if _choice is not None and time.monotonic() - _checked_at < REPORTING_CHECK_INTERVAL:
+            return _choice
+
+    max_lag = getattr(settings, 'REPORTING_MAX_LAG', 300)
+    try:
+        lag = replica_lag()
+    except DatabaseError:
+        logger.warning("Banco de relatórios indisponível; lendo do primário", exc_info=True)
+        lag = None
+    if lag is not None and lag <= max_lag:
+        choice = REPORTING_ALIAS
+    else:
+        if lag is not None:
+            logger.warning("Banco de relatórios %.0fs atrasado; lendo do primário", lag)
+        choice = DEFAULT_DB_ALIAS
+    with _lock:
+        _choice, _checked_at = choice, time.monotonic()
+    return choice
+
+
+@contextmanager
+def reporting_reads():
+    """Envia as leituras do bloco (ou da view decorada) para reporting_db()."""
+    token = _read_alias.set(reporting_db())
+    try:
+        yield _read_alias.get()
+    finally:
+        _read_alias.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """Leituras do bloco vão para o primário, mesmo dentro de reporting_reads().
+
+    Para dados guardados em cache sob a geração atual (core.cache): lidos
+    de uma réplica atrasada, ficariam em cache sem as vendas que acabaram
+    de invalidar a geração.
+    """
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReportingRouter:
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is not None and model._meta.app_label in REPORTING_APPS:
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # A réplica recebe o esquema do primário (replicação ou cópia do arquivo)
+        return db != REPORTING_ALIAS
@@ -1,3 +1,603 @@
-from django.test import TestCase
+import gc
+import os
+import shutil
+import re
+import tempfile
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.db import OperationalError, connections
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from clients.models import Client
+from products.models import Product
+from sales.archive import archive_sales
+from sales.models import Payment, Sale, SaleHourRollup, SaleRollup
+from tasks.models import Task
+from tasks.queue import run_pending
+from . import replica
+from .aging import build_debt_aging
+from .forecast import build_reorder_report
+from .heatmap import build_sales_heatmap
+from .models import ReplicaHeartbeat
+from .pdf import build_report_pdf
+from .profitability import build_profitability_report
+from .replica import REPORTING_ALIAS, ReportingRouter, replica_lag, reporting_db, reporting_reads
+from .views import MAX_BUCKETS, MAX_PERIOD, _get_heatmap, _get_period, _resolve_granularity
+
+
+def _report_data():
+    return {
+        'granularity': 'month',
+        'series_title': 'Vendas por Mês',
+        'series_labels': ['Jan/2025', 'Fev/2025', 'Mar/2025'],
+        'series_values': [1200.0, 950.5, 1430.25],
+        'product_percentages': [
+            {'name': 'Cerveja', 'percentage': 60.0, 'total': 2100.0, 'quantity': 300},
+            {'name': 'Refrigerante', 'percentage': 25.0, 'total': 875.0, 'quantity': 175},
+            {'name': 'Outros', 'percentage': 15.0, 'total': 525.0, 'quantity': 60},
+        ],
+        'total_vendas': 3580.75,
+        'total_produtos_vendidos': 535,
+        'out_of_stock': 2,
+        'most_sold_product': {'name': 'Cerveja', 'quantity': 300},
+        'least_sold_product': {'name': 'Outros', 'quantity': 60},
+        'has_data': True,
+    }
+
+
+class ConcurrentReportPdfTests(SimpleTestCase):
+    REQUESTS = 8
+    WORKERS = 4
+
+    def _render_batch(self, datasets=None):
+        datasets = datasets or [_report_data()] * self.REQUESTS
+        start = timezone.make_aware(datetime(2025, 1, 1))
+        end = timezone.make_aware(datetime(2025, 3, 31, 23, 59))
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            futures = [pool.submit(build_report_pdf, data, start, end) for data in datasets]
+            return [future.result() for future in futures]
+
+    def _distinct_data(self, index):
+        data = _report_data()
+        data['series_title'] = f'Vendas do Lote {index}'
+        data['series_values'] = [value + index for value in data['series_values']]
+        data['product_percentages'] = [
+            {**product, 'name': f"{product['name']} {index}"}
+            for product in data['product_percentages']
+        ]
+        return data
+
+    def test_concurrent_generation_matches_serial_output(self):
+        datasets = [self._distinct_data(i) for i in range(self.REQUESTS)]
+        # Saída determinística (sem data nem ID aleatório) para comparar byte a byte;
+        # o rodapé traz a hora da geração, congelada para não virar o minuto no meio
+        self.enterContext(mock.patch('reportlab.rl_config.invariant', 1))
+        generated_at = timezone.make_aware(datetime(2025, 4, 1, 9, 30))
+        self.enterContext(mock.patch('dashboard.pdf.timezone.localtime', return_value=generated_at))
+        expected = [self._render_batch([data])[0] for data in datasets]
+        self.assertEqual(len(set(expected)), self.REQUESTS)
+
+        pdfs = self._render_batch(datasets)
+
+        # Cada PDF tem exatamente os gráficos dos seus dados: nada de outra thread
+        for index, (pdf, reference) in enumerate(zip(pdfs, expected)):
+            with self.subTest(request=index):
+                self.assertTrue(pdf.startswith(b'%PDF'))
+                self.assertEqual(len(re.findall(rb'/Type /Page\b', pdf)), 2)
+                self.assertEqual(pdf, reference)
+
+    def test_concurrent_generation_does_not_leak_memory(self):
+        self._render_batch()
+        tracemalloc.start()
+        try:
+            self._render_batch()
+            gc.collect()
+            after_first, _ = tracemalloc.get_traced_memory()
+            self._render_batch()
+            gc.collect()
+            after_second, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertLess(after_second - after_first, 1024 * 1024)
+
+
+class ReportlabChartBackendTests(SimpleTestCase):
+    def test_charts_are_drawn_as_vectors(self):
+        now = timezone.now()
+        pdf = build_report_pdf(_report_data(), now, now, chart_backend='reportlab')
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        self.assertNotIn(b'/Subtype /Image', pdf)
+
+    def test_unknown_backend_is_rejected(self):
+        now = timezone.now()
+        with self.assertRaises(ValueError):
+            build_report_pdf(_report_data(), now, now, chart_backend='svg')
+
+
+def _finalized_sale(product, quantity, when):
+    sale = Sale.objects.create()
+    sale.add_item(product, quantity)
+    Sale.objects.filter(pk=sale.pk).update(status=Sale.STATUS_FINALIZED, created_at=when)
+    return sale
+
+
+class ComparisonReportTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('gerente', password='x'))
+        self.product = Product.objects.create(
+            name='Cerveja', sale_price=10, cost_price=4, quantity=100
+        )
+
+    def test_overlapping_periods_are_counted_independently(self):
+        # Com um ano inteiro, 'previous' e 'year_ago' cobrem praticamente o mesmo intervalo
+        _finalized_sale(self.product, 3, timezone.make_aware(datetime(2025, 3, 10, 20)))
+        _finalized_sale(self.product, 2, timezone.make_aware(datetime(2024, 6, 15, 20)))
+        SaleRollup.objects.create(
+            day=datetime(2024, 7, 1).date(), product_name='Cerveja', category='CE',
+            units=4, revenue=40, cost=16,
+        )
+
+        response = self.client.get('/dashboard/dados-relatorio/', {
+            'start_date': '2025-01-01', 'end_date': '2025-12-31', 'compare': 'previous,year_ago',
+        })
+        comparison = response.json()['comparison']
+
+        self.assertEqual(comparison['periods']['current']['total_vendas'], 30.0)
+        for name in ('previous', 'year_ago'):
+            period = comparison['periods'][name]
+            self.assertEqual(period['total_vendas'], 60.0, name)
+            self.assertEqual(period['total_produtos_vendidos'], 6, name)
+            self.assertEqual(period['delta_vendas'], -30.0, name)
+        product = comparison['top_products'][0]
+        self.assertEqual(product['name'], 'Cerveja')
+        self.assertEqual(product['year_ago']['quantity'], 6)
+        self.assertEqual(product['previous']['quantity'], 6)
+
+
+class ProfitabilityReportTests(TestCase):
+    def setUp(self):
+        beer = Product.objects.create(name='Cerveja', category='CE', sale_price=10, cost_price=4, quantity=100)
+        soda = Product.objects.create(name='Guaraná', category='RE', sale_price=6, cost_price=3, quantity=100)
+        _finalized_sale(beer, 3, timezone.make_aware(datetime(2025, 1, 10, 20)))
+        _finalized_sale(soda, 2, timezone.make_aware(datetime(2025, 2, 3, 20)))
+        _finalized_sale(beer, 5, timezone.make_aware(datetime(2025, 3, 3, 20)))  # fora do período
+        Sale.objects.create().add_item(beer, 7)  # aberta
+        SaleRollup.objects.create(
+            day=datetime(2025, 2, 20).date(), product=beer, product_name='Cerveja',
+            category='CE', units=1, revenue=10, cost=4,
+        )
+        # A margem usa o custo gravado no item, não o atual
+        Product.objects.filter(pk=beer.pk).update(cost_price=9)
+
+    def _report(self, group_by):
+        return build_profitability_report(
+            timezone.make_aware(datetime(2025, 1, 1)), timezone.make_aware(datetime(2025, 2, 28, 23, 59)), group_by,
+        )
+
+    def test_by_product_merges_rollups_and_sorts_by_revenue(self):
+        self.assertEqual(self._report('product'), [
+            {'label': 'Cerveja', 'units': 4, 'revenue': 40.0, 'cost': 16.0, 'margin': 24.0, 'margin_percentage': 60.0},
+            {'label': 'Guaraná', 'units': 2, 'revenue': 12.0, 'cost': 6.0, 'margin': 6.0, 'margin_percentage': 50.0},
+        ])
+
+    def test_by_category_uses_the_category_labels(self):
+        self.assertEqual([(r['label'], r['revenue']) for r in self._report('category')],
+                         [('Cerveja', 40.0), ('Refrigerante', 12.0)])
+
+    def test_by_month_is_chronological(self):
+        self.assertEqual([(r['label'], r['units'], r['revenue']) for r in self._report('month')],
+                         [('01/2025', 3, 30.0), ('02/2025', 3, 22.0)])
+
+    def test_unknown_grouping_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self._report('client')
+
+
+class SalesHeatmapTests(TestCase):
+    def setUp(self):
+        beer = Product.objects.create(name='Cerveja', sale_price=10, cost_price=4, quantity=100)
+        soda = Product.objects.create(name='Guaraná', sale_price=6, cost_price=2, quantity=100)
+        # 05/03/2025 é quarta-feira; 09/03, domingo
+        _finalized_sale(beer, 3, timezone.make_aware(datetime(2025, 3, 5, 21, 30)))
+        _finalized_sale(soda, 2, timezone.make_aware(datetime(2025, 3, 5, 21, 10)))
+        _finalized_sale(beer, 1, timezone.make_aware(datetime(2025, 3, 9, 1, 45)))
+        cancelled = _finalized_sale(beer, 5, timezone.make_aware(datetime(2025, 3, 5, 21)))
+        Sale.objects.filter(pk=cancelled.pk).update(status=Sale.STATUS_CANCELLED)
+        Sale.objects.create().add_item(beer, 2)  # aberta
+        SaleHourRollup.objects.create(day=datetime(2025, 3, 12).date(), hour=21, sales=1, revenue=10)
+        SaleHourRollup.objects.create(day=datetime(2025, 3, 8).date(), hour=22, sales=2, revenue='15.50')
+        SaleHourRollup.objects.create(day=datetime(2025, 4, 2).date(), hour=21, sales=9, revenue=90)
+
+    def test_buckets_by_local_weekday_and_hour(self):
+        heatmap = build_sales_heatmap(
+            timezone.make_aware(datetime(2025, 3, 1)), timezone.make_aware(datetime(2025, 3, 31, 23, 59)),
+        )
+
+        wednesday, sunday, saturday = 3, 0, 6
+        self.assertEqual(heatmap['weekdays'][wednesday], 'Qua')
+        self.assertEqual(heatmap['counts'][wednesday][21], 3)
+        self.assertEqual(heatmap['revenue'][wednesday][21], 52.0)
+        # Hora local, não UTC (seria 4h)
+        self.assertEqual(heatmap['counts'][sunday][1], 1)
+        self.assertEqual(heatmap['revenue'][sunday][1], 10.0)
+        self.assertEqual(heatmap['counts'][saturday][22], 2)
+        self.assertEqual(heatmap['revenue'][saturday][22], 15.5)
+        self.assertEqual(sum(map(sum, heatmap['counts'])), 6)
+
+    def test_json_endpoint_returns_the_matrix(self):
+        self.client.force_login(User.objects.create_user('gerente', password='x'))
+        data = self.client.get(
+            '/dashboard/dados-movimento/', {'start_date': '2025-03-01', 'end_date': '2025-03-31'}
+        ).json()
+        self.assertEqual(len(data['counts']), 7)
+        self.assertEqual({len(row) for row in data['counts']}, {24})
+        self.assertEqual(data['counts'][3][21], 3)
+
+
+class ReorderReportTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.beer = Product.objects.create(name='Cerveja', category='CE', sale_price=10, cost_price=4, quantity=100)
+        self.soda = Product.objects.create(name='Refrigerante', category='RE', sale_price=6, cost_price=2, quantity=100)
+        self.water = Product.objects.create(name='Água', category='SC', sale_price=3, cost_price=1, quantity=0)
+
+        for product, quantity, days_ago in (
+            (self.beer, 10, 8), (self.beer, 3, 1), (self.beer, 3, 0),
+            (self.beer, 50, 15),  # fora da janela
+            (self.soda, 6, 1),
+        ):
+            _finalized_sale(product, quantity, self._noon(days_ago))
+        cancelled = _finalized_sale(self.beer, 40, self._noon(0))
+        Sale.objects.filter(pk=cancelled.pk).update(status=Sale.STATUS_CANCELLED)
+        SaleRollup.objects.create(
+            day=self.today - timedelta(days=2), product=self.beer, product_name='Cerveja',
+            category='CE', units=4, revenue=40, cost=16,
+        )
+        Product.objects.filter(pk=self.beer.pk).update(quantity=10)
+        Product.objects.filter(pk=self.soda.pk).update(quantity=3)
+
+    def _noon(self, days_ago):
+        day = self.today - timedelta(days=days_ago)
+        return timezone.make_aware(datetime(day.year, day.month, day.day, 12))
+
+    def test_forecast_uses_the_faster_of_velocity_and_moving_average(self):
+        report = build_reorder_report(window_days=10, lead_time_days=2, ma_days=3, today=self.today)
+
+        self.assertEqual([row['name'] for row in report], ['Refrigerante', 'Cerveja', 'Água'])
+        soda, beer, water = report
+        # Refrigerante: 6 un. em 10 dias, mas 6 nos últimos 3
+        self.assertEqual((soda['velocity'], soda['moving_avg']), (0.6, 2.0))
+        self.assertEqual(soda['days_until_stockout'], 1.5)
+        self.assertEqual(soda['suggested_order'], 5)
+        self.assertTrue(soda['needs_reorder'])
+        # Cerveja: vendas + rollup arquivado; a cancelada e a de 15 dias não contam
+        self.assertEqual((beer['velocity'], beer['moving_avg']), (2.0, 3.33))
+        self.assertEqual(beer['days_until_stockout'], 3.0)
+        self.assertEqual(beer['suggested_order'], 4)
+        self.assertFalse(beer['needs_reorder'])
+        self.assertEqual(beer['category'], 'Cerveja')
+        # Sem vendas e sem estoque
+        self.assertIsNone(water['days_until_stockout'])
+        self.assertEqual(water['suggested_order'], 0)
+        self.assertTrue(water['needs_reorder'])
+
+    def test_no_products_is_an_empty_report(self):
+        Sale.objects.all().delete()
+        Product.objects.all().delete()
+        self.assertEqual(build_reorder_report(today=self.today), [])
+
+
+class ReportPeriodTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('gerente', password='x'))
+
+    def _period(self, **params):
+        return _get_period(RequestFactory().get('/', params))
+
+    def test_out_of_range_dates_are_ignored(self):
+        start, end = self._period(start_date='0001-01-01', end_date='9999-12-31')
+        self.assertEqual(end.date(), timezone.now().date())
+        self.assertEqual(end - start, timedelta(days=30))
+
+    def test_long_periods_are_clamped(self):
+        start, end = self._period(start_date='2000-01-01', end_date='2025-06-30')
+        self.assertEqual(timezone.localtime(end).date(), datetime(2025, 6, 30).date())
+        self.assertEqual(end - start, MAX_PERIOD)
+
+    def test_extreme_dates_do_not_break_the_reports(self):
+        for params in (
+            {'start_date': '0001-01-01', 'end_date': '9999-12-31', 'granularity': 'day',
+             'compare': 'previous,year_ago'},
+            {'start_date': '2000-01-01', 'end_date': '2100-12-31', 'granularity': 'day'},
+        ):
+            for url in ('/dashboard/dados-relatorio/', '/dashboard/dados-lucratividade/',
+                        '/dashboard/dados-movimento/'):
+                with self.subTest(url=url, params=params):
+                    self.assertEqual(self.client.get(url, params).status_code, 200)
+        series = self.client.get('/dashboard/dados-relatorio/', params).json()['series']
+        self.assertLessEqual(len(series['labels']), MAX_BUCKETS)
+
+
+class DebtAgingTests(TestCase):
+    def setUp(self):
+        self.now = timezone.make_aware(datetime(2025, 6, 30, 12))
+        self.beer = Product.objects.create(name='Cerveja', sale_price=10, cost_price=4, quantity=100)
+        self.ana = Client.objects.create(name='Ana', phone_number='1')
+        self.bruno = Client.objects.create(name='Bruno', phone_number='2')
+        carla = Client.objects.create(name='Carla', phone_number='3')
+
+        recent = self._tab(self.ana, 3, days_ago=10)
+        Payment.objects.create(sale=recent, amount=10)
+        self._tab(self.ana, 1, days_ago=30)
+        self._tab(self.ana, 1, days_ago=45)
+        self._tab(self.bruno, 1, days_ago=100)
+        finalized = self._tab(self.bruno, 5, days_ago=5)
+        Sale.objects.filter(pk=finalized.pk).update(status=Sale.STATUS_FINALIZED)
+        paid = self._tab(carla, 2, days_ago=70)
+        Payment.objects.create(sale=paid, amount=20)
+        self._tab(None, 4, days_ago=120)  # avulsa
+
+    def _tab(self, client, quantity, days_ago):
+        sale = Sale.objects.create(client=client)
+        sale.add_item(self.beer, quantity)
+        Sale.objects.filter(pk=sale.pk).update(created_at=self.now - timedelta(days=days_ago))
+        return sale
+
+    def test_balances_are_bucketed_by_sale_age(self):
+        report = build_debt_aging(now=self.now)
+
+        self.assertEqual(report, [
+            {
+                'client_id': self.bruno.pk, 'name': 'Bruno',
+                'buckets': {'0_30': 0.0, '31_60': 0.0, '61_90': 0.0, '90_plus': 10.0},
+                'total': 10.0, 'oldest_sale': '22/03/2025', 'days_outstanding': 100,
+            },
+            {
+                'client_id': self.ana.pk, 'name': 'Ana',
+                'buckets': {'0_30': 30.0, '31_60': 10.0, '61_90': 0.0, '90_plus': 0.0},
+                'total': 40.0, 'oldest_sale': '16/05/2025', 'days_outstanding': 45,
+            },
+        ])
+
+    def test_bucket_edges(self):
+        self._tab(self.ana, 1, days_ago=31)
+        self._tab(self.ana, 1, days_ago=90)
+        self._tab(self.ana, 1, days_ago=91)
+        ana = next(row for row in build_debt_aging(now=self.now) if row['name'] == 'Ana')
+        self.assertEqual(ana['buckets'], {'0_30': 30.0, '31_60': 20.0, '61_90': 10.0, '90_plus': 10.0})
+
+
+class ReportGranularityTests(TestCase):
+    def _resolve(self, start, end, granularity):
+        return _resolve_granularity(
+            timezone.make_aware(datetime(*start)), timezone.make_aware(datetime(*end)), granularity,
+        )
+
+    def test_requested_granularity_is_kept_when_it_fits(self):
+        granularity, buckets = self._resolve((2025, 3, 1), (2025, 3, 10, 23), 'day')
+        self.assertEqual(granularity, 'day')
+        self.assertEqual(len(buckets), 10)
+
+    def test_falls_back_to_the_next_coarser_granularity(self):
+        self.assertEqual(self._resolve((2024, 1, 1), (2024, 12, 31), 'day')[0], 'week')
+        self.assertEqual(self._resolve((2020, 1, 1), (2024, 12, 31), 'week')[0], 'month')
+        self.assertEqual(self._resolve((2010, 1, 1), (2024, 12, 31), 'month')[0], 'year')
+        self.assertEqual(self._resolve((2024, 1, 1), (2024, 12, 31), 'hora')[0], 'month')
+
+    def test_buckets_start_on_monday_and_first_of_month(self):
+        _, weeks = self._resolve((2025, 3, 5), (2025, 3, 16), 'week')
+        self.assertEqual(weeks, [datetime(2025, 3, 3).date(), datetime(2025, 3, 10).date()])
+        _, months = self._resolve((2025, 1, 15), (2025, 3, 2), 'month')
+        self.assertEqual([m.day for m in months], [1, 1, 1])
+
+    def test_series_merges_rollups_and_zeroes_empty_buckets(self):
+        self.client.force_login(User.objects.create_user('gerente', password='x'))
+        beer = Product.objects.create(name='Cerveja', sale_price=10, cost_price=4, quantity=100)
+        _finalized_sale(beer, 3, timezone.make_aware(datetime(2025, 3, 5, 20)))
+        SaleRollup.objects.create(
+            day=datetime(2025, 3, 7).date(), product=beer, product_name='Cerveja',
+            category='CE', units=1, revenue=10, cost=4,
+        )
+
+        series = self.client.get('/dashboard/dados-relatorio/', {
+            'start_date': '2025-03-01', 'end_date': '2025-03-16', 'granularity': 'week',
+        }).json()['series']
+
+        self.assertEqual(series['granularity'], 'week')
+        self.assertEqual(series['labels'], ['Sem. 24/02/2025', 'Sem. 03/03/2025', 'Sem. 10/03/2025'])
+        self.assertEqual(series['values'], [0.0, 40.0, 0.0])
+
+
+@override_settings(TASKS_ASYNC=True)
+class QueuedReportPdfTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media))
+        self.client.force_login(User.objects.create_user('gerente', password='x'))
+
+    def test_pdf_is_built_by_the_worker_and_removed_after_download(self):
+        job = self.client.get('/dashboard/gerar-relatorio/').json()
+        self.assertEqual(self.client.get(job['status_url']).json()['status'], 'Pendente')
+
+        run_pending()
+        status = self.client.get(job['status_url']).json()
+        path = Task.objects.get(pk=job['task_id']).args[3]
+        self.assertTrue(default_storage.exists(path))
+
+        response = self.client.get(status['download_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        self.assertFalse(default_storage.exists(path))
+        self.assertFalse(Task.objects.filter(pk=job['task_id']).exists())
+        self.assertEqual(self.client.get(status['download_url']).status_code, 404)
+
+    def test_pdf_that_is_never_downloaded_expires(self):
+        job = self.client.get('/dashboard/gerar-relatorio/').json()
+        run_pending()
+        path = Task.objects.get(pk=job['task_id']).args[3]
+
+        cleanup = Task.objects.get(name='dashboard.jobs.delete_report_pdf')
+        self.assertEqual(cleanup.args, [path])
+        Task.objects.filter(pk=cleanup.pk).update(run_at=timezone.now())
+        run_pending()
+        self.assertFalse(default_storage.exists(path))
+
+
+class ArchivedReportsTests(TestCase):
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir, ignore_errors=True)
+        self.enterContext(override_settings(SALES_ARCHIVE_DIR=self.archive_dir))
+        self.client.force_login(User.objects.create_user('gerente', password='x'))
+        self.beer = beer = Product.objects.create(name='Cerveja', category='CE', sale_price=10, cost_price=4, quantity=200)
+        soda = Product.objects.create(name='Refrigerante', category='RE', sale_price=6, cost_price=2, quantity=200)
+
+        _finalized_sale(beer, 3, timezone.make_aware(datetime(2024, 3, 5, 21, 30)))
+        _finalized_sale(soda, 2, timezone.make_aware(datetime(2024, 3, 5, 23, 10)))
+        _finalized_sale(beer, 1, timezone.make_aware(datetime(2024, 3, 9, 1, 45)))
+        cancelled = Sale.objects.create()
+        cancelled.add_item(soda, 5)
+        Sale.objects.filter(pk=cancelled.pk).update(
+            status=Sale.STATUS_CANCELLED, created_at=timezone.make_aware(datetime(2024, 3, 6, 20))
+        )
+        # Vendas recentes, para a previsão de reposição
+        for days_ago, quantity in ((2, 4), (5, 6)):
+            _finalized_sale(beer, quantity, timezone.now() - timedelta(days=days_ago))
+
+    def _reports(self):
+        period = {'start_date': '2024-03-01', 'end_date': '2024-03-31'}
+        report = self.client.get('/dashboard/dados-relatorio/', {**period, 'compare': 'previous'}).json()
+        return {
+            'report': {key: report[key] for key in ('series', 'products', 'stats', 'comparison')},
+            'profitability': self.client.get(
+                '/dashboard/dados-lucratividade/', {**period, 'group_by': 'product'}
+            ).json(),
+            'heatmap': self.client.get('/dashboard/dados-movimento/', period).json(),
+            'reorder': build_reorder_report(),
+        }
+
+    def test_reports_are_unchanged_after_archiving(self):
+        before = self._reports()
+        self.assertEqual(before['report']['stats']['total_vendas'], 52.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            archived = archive_sales(older_than_days=0)
+
+        self.assertEqual(archived, 6)
+        self.assertFalse(Sale.objects.exists())
+        # Os relatórios leem só os rollups: nenhum arquivo é aberto
+        shutil.rmtree(self.archive_dir)
+        self.assertEqual(self._reports(), before)
+
+    def test_products_with_the_same_name_keep_separate_rollups(self):
+        twin = Product.objects.create(name='Cerveja', category='CE', sale_price=12, cost_price=5, quantity=50)
+        _finalized_sale(twin, 2, timezone.make_aware(datetime(2024, 3, 5, 22)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            archive_sales(older_than_days=0)
+
+        rollups = SaleRollup.objects.filter(day=datetime(2024, 3, 5).date(), product_name='Cerveja')
+        self.assertEqual(
+            dict(rollups.values_list('product', 'units')), {self.beer.pk: 3, twin.pk: 2}
+        )
+
+
+class ReportingDbTests(TestCase):
+    def setUp(self):
+        # A escolha fica em cache no módulo; cada teste começa sem ela
+        self.enterContext(mock.patch.object(replica, '_choice', None))
+        self.enterContext(mock.patch.object(replica, '_checked_at', 0.0))
+
+    def _with_alias(self, **overrides):
+        """Declara o alias 'reporting' como uma cópia da configuração do primário."""
+        self.enterContext(mock.patch.dict(
+            connections.databases, {REPORTING_ALIAS: {**connections['default'].settings_dict, **overrides}}
+        ))
+        self.addCleanup(self._drop_connection)
+
+    def _drop_connection(self):
+        # Sem isso a próxima declaração do alias reaproveitaria a conexão antiga
+        if hasattr(connections._connections, REPORTING_ALIAS):
+            del connections[REPORTING_ALIAS]
+
+    def test_missing_alias_reads_from_primary(self):
+        self.enterContext(mock.patch.dict(connections.databases))
+        connections.databases.pop(REPORTING_ALIAS, None)
+        with mock.patch.object(replica, 'replica_lag') as lag:
+            self.assertEqual(reporting_db(), 'default')
+        lag.assert_not_called()
+
+    def test_unreachable_replica_reads_from_primary(self):
+        self._with_alias()
+        with mock.patch.object(replica, 'replica_lag', side_effect=OperationalError('recusada')), \
+                self.assertLogs('dashboard.replica', 'WARNING'):
+            self.assertEqual(reporting_db(), 'default')
+
+    def test_replica_without_heartbeat_reads_from_primary(self):
+        self._with_alias()
+        with mock.patch.object(replica, 'replica_lag', return_value=None):
+            self.assertEqual(reporting_db(), 'default')
+
+    @override_settings(REPORTING_MAX_LAG=60)
+    def test_lagging_replica_reads_from_primary(self):
+        self._with_alias()
+        with mock.patch.object(replica, 'replica_lag', return_value=61.0), \
+                self.assertLogs('dashboard.replica', 'WARNING'):
+            self.assertEqual(reporting_db(), 'default')
+
+    @override_settings(REPORTING_MAX_LAG=60)
+    def test_fresh_replica_is_used_and_choice_is_cached(self):
+        self._with_alias()
+        with mock.patch.object(replica, 'replica_lag', return_value=5.0) as lag:
+            self.assertEqual(reporting_db(), REPORTING_ALIAS)
+            self.assertEqual(reporting_db(), REPORTING_ALIAS)
+        self.assertEqual(lag.call_count, 1)
+
+    def test_replica_lag_reads_the_heartbeat(self):
+        self.assertIsNone(replica_lag('default'))
+        ReplicaHeartbeat.objects.create(beat_at=timezone.now() - timedelta(minutes=10))
+        self.assertAlmostEqual(replica_lag('default'), 600, delta=5)
+
+    def test_replica_lag_does_not_create_missing_sqlite_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = f'{directory}/reporting.sqlite3'
+        self._with_alias(NAME=path)
+
+        self.assertIsNone(replica_lag())
+        self.assertEqual(reporting_db(), 'default')
+        self.assertFalse(os.path.exists(path))
+
+    def test_cached_heatmap_is_built_from_the_primary(self):
+        # O alias existe mas não está liberado neste TestCase: uma leitura nele falharia
+        self._with_alias()
+        with mock.patch.object(replica, 'reporting_db', return_value=REPORTING_ALIAS):
+            with reporting_reads():
+                heatmap = _get_heatmap(
+                    timezone.make_aware(datetime(2023, 2, 1)), timezone.make_aware(datetime(2023, 2, 7))
+                )
+        self.assertEqual(len(heatmap['counts']), 7)
+
+    def test_writes_inside_reporting_reads_go_to_primary(self):
+        self._with_alias()
+        router = ReportingRouter()
+        with mock.patch.object(replica, 'reporting_db', return_value=REPORTING_ALIAS):
+            with reporting_reads() as alias:
+                self.assertEqual(alias, REPORTING_ALIAS)
+                self.assertEqual(router.db_for_read(Product), REPORTING_ALIAS)
+                self.assertIsNone(router.db_for_read(User))
+                self.assertEqual(router.db_for_write(Product), 'default')
+                product = Product.objects.create(name='Cerveja', sale_price=10, cost_price=4)
+            self.assertIsNone(router.db_for_read(Product))
+
+        self.assertTrue(Product.objects.using('default').filter(pk=product.pk).exists())
+        self.assertFalse(router.allow_migrate(REPORTING_ALIAS, 'sales'))
+        self.assertTrue(router.allow_migrate('default', 'sales'))
@@ -4,5 +4,15 @@ from . import views
 urlpatterns = [
     path('', views.dashboard_view, name='dashboard'),
     path('dados-relatorio/', views.generate_report_data, name='generate_report_data'),
+    path('dados-reposicao/', views.reorder_report_data, name='reorder_report_data'),
+    path('dados-dividas/', views.debt_aging_data, name='debt_aging_data'),
+    path('dados-lucratividade/', views.profitability_report_data, name='profitability_report_data'),
+    path('dados-movimento/', views.sales_heatmap_data, name='sales_heatmap_data'),
+    path('grafico-movimento/', views.sales_heatmap_chart, name='sales_heatmap_chart'),
+    path('dados-fechamento/', views.daily_closing_data, name='daily_closing_data'),
+    path('dados-fechamentos/', views.daily_closings_data, name='daily_closings_data'),
+    path('fechar-caixa/', views.close_day, name='close_day'),
     path('gerar-relatorio/', views.generate_report_pdf, name='generate_report_pdf'),
+    path('relatorio/<int:task_id>/status/', views.report_pdf_status, name='report_pdf_status'),
+    path('relatorio/<int:task_id>/baixar/', views.download_report_pdf, name='download_report_pdf'),
 ]
@@ -1,112 +1,235 @@
+import uuid
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import render
-from django.http import HttpResponse, JsonResponse
+from django.core.files.storage import default_storage
+from django.shortcuts import get_object_or_404, render
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_POST
+from django.db import IntegrityError
 from django.utils import timezone
+from django.core.cache import cache
+from core.cache import SALES, versioned_key
 from datetime import datetime, timedelta
+from itertools import chain
 from decimal import Decimal
-from sales.models import Sale, SaleItem
+from sales.archive import rollups_between
+from sales.models import DailyClosing, Sale, SaleItem, SaleRollup
+from .aging import AGING_BUCKETS, build_debt_aging
+from .forecast import build_reorder_report
+from .heatmap import build_sales_heatmap, render_heatmap_png
+from .jobs import REPORTS_DIR, render_report_pdf
+from .replica import primary_reads, reporting_reads
+from .profitability import GROUPINGS, build_profitability_report
 from products.models import Product
-from django.db.models import Sum, Count, F, Q
-from collections import defaultdict
-from io import BytesIO
-import json
-
-# Configurar matplotlib antes de importar
-import matplotlib  # type: ignore
-matplotlib.use('Agg')  # Backend não-interativo
-import matplotlib.pyplot as plt  # type: ignore
-import matplotlib.patches as mpatches  # type: ignore
-from matplotlib.backends.backend_agg import FigureCanvasAgg  # type: ignore
-
-# Imports do reportlab
-from reportlab.lib.pagesizes import letter, A4  # type: ignore  # noqa: F401
-from reportlab.lib import colors  # type: ignore
-from reportlab.lib.units import inch  # type: ignore
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image  # type: ignore
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle  # type: ignore
-from reportlab.lib.enums import TA_CENTER, TA_LEFT  # type: ignore
-
-
-def _get_report_data(start_date, end_date):
-    """Função auxiliar para calcular dados do relatório"""
-    # Filtrar vendas finalizadas no período
-    sales = Sale.objects.filter(
-        status=Sale.STATUS_FINALIZED,
-        created_at__gte=start_date,
-        created_at__lte=end_date
+from tasks.models import Task
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek, TruncYear
+
+
+# Datas fora deste intervalo são ignoradas e o período é limitado a MAX_PERIOD:
+# evita estourar datetime nos buckets e montar centenas de milhares deles
+MIN_REPORT_YEAR = 2000
+MAX_REPORT_YEAR = 2100
+MAX_PERIOD = timedelta(days=366 * 10)
+
+
+def _parse_date(value):
+    try:
+        naive_date = datetime.strptime(value, '%Y-%m-%d')
+    except (ValueError, TypeError):
+        return None
+    if not MIN_REPORT_YEAR <= naive_date.year <= MAX_REPORT_YEAR:
+        return None
+    return naive_date
+
+
+def _get_period(request):
+    """Lê start_date/end_date (YYYY-MM-DD) do GET; padrão: últimos 30 dias"""
+    end_date = timezone.now()
+    start_date = end_date - timedelta(days=30)
+
+    naive_date = _parse_date(request.GET.get('start_date'))
+    if naive_date:
+        start_date = timezone.make_aware(naive_date.replace(hour=0, minute=0, second=0, microsecond=0))
+
+    naive_date = _parse_date(request.GET.get('end_date'))
+    if naive_date:
+        end_date = timezone.make_aware(naive_date.replace(hour=23, minute=59, second=59, microsecond=999999))
+
+    if end_date - start_date > MAX_PERIOD:
+        start_date = end_date - MAX_PERIOD
+    return start_date, end_date
+
+
+MONTHS_PT = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
+
+# granularidade -> (função de truncamento, título do gráfico)
+GRANULARITIES = {
+    'day': (TruncDay, 'Vendas por Dia'),
+    'week': (TruncWeek, 'Vendas por Semana'),
+    'month': (TruncMonth, 'Vendas por Mês'),
+    'year': (TruncYear, 'Vendas por Ano'),
+}
+GRANULARITY_ORDER = ['day', 'week', 'month', 'year']
+MAX_BUCKETS = 120
+
+
+def _bucket_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    if granularity == 'year':
+        return day.replace(month=1, day=1)
+    return day
+
+
+def _next_bucket(day, granularity):
+    if granularity == 'day':
+        return day + timedelta(days=1)
+    if granularity == 'week':
+        return day + timedelta(days=7)
+    if granularity == 'month':
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day.replace(year=day.year + 1)
+
+
+def _bucket_label(day, granularity):
+    if granularity == 'day':
+        return day.strftime('%d/%m/%Y')
+    if granularity == 'week':
+        return f"Sem. {day.strftime('%d/%m/%Y')}"
+    if granularity == 'month':
+        return f"{MONTHS_PT[day.month - 1]}/{day.year}"
+    return str(day.year)
+
+
+def _series_buckets(start_date, end_date, granularity):
+    """Lista (em datas locais) dos inícios de cada bucket no intervalo"""
+    day = _bucket_start(timezone.localtime(start_date).date(), granularity)
+    last = timezone.localtime(end_date).date()
+    buckets = []
+    while day <= last:
+        buckets.append(day)
+        day = _next_bucket(day, granularity)
+    return buckets
+
+
+def _resolve_granularity(start_date, end_date, granularity):
+    """Usa a granularidade pedida, ou a próxima mais grossa que caiba em MAX_BUCKETS"""
+    if granularity not in GRANULARITIES:
+        granularity = 'month'
+    for candidate in GRANULARITY_ORDER[GRANULARITY_ORDER.index(granularity):]:
+        buckets = _series_buckets(start_date, end_date, candidate)
+        if len(buckets) <= MAX_BUCKETS:
+            return candidate, buckets
+    return candidate, buckets
+
+
+def _finalized_items(start_date, end_date):
+    return SaleItem.objects.filter(
+        sale__status=Sale.STATUS_FINALIZED,
+        sale__created_at__gte=start_date,
+        sale__created_at__lte=end_date,
     )
-    
-    # Preparar dados para o relatório
-    # 1. Vendas por mês
-    sales_by_month = defaultdict(Decimal)
-    for sale in sales:
-        month_key = sale.created_at.strftime('%Y-%m')
-        sales_by_month[month_key] += sale.total
-    
-    # Ordenar por mês
-    months_data = sorted(sales_by_month.items())
-    months_pt = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
-    months_labels = [months_pt[int(m.split('-')[1]) - 1] for m, _ in months_data]
-    months_values = [float(v) for _, v in months_data]
-    
-    # 2. Participação por produto
-    product_sales = defaultdict(lambda: {'quantity': 0, 'total': Decimal('0.00')})
-    for sale in sales:
-        for item in sale.items.all():
-            product_sales[item.product.name]['quantity'] += item.quantity
-            product_sales[item.product.name]['total'] += item.price * item.quantity
-    
-    # Ordenar produtos por total vendido
-    sorted_products = sorted(product_sales.items(), key=lambda x: x[1]['total'], reverse=True)
-    
+
+
+def _item_total(**extra):
+    return Sum(F('price') * F('quantity'), **extra)
+
+
+def _merge_product_rows(rows, archived):
+    """Soma às linhas por produto os totais já arquivados em SaleRollup"""
+    merged = {row['product__name']: row for row in rows}
+    for row in archived:
+        current = merged.setdefault(
+            row['product_name'],
+            {'product__name': row['product_name'], 'units': 0, 'total': Decimal('0.00')},
+        )
+        current['units'] += row['units']
+        current['total'] += row['total']
+    return list(merged.values())
+
+
+def _get_report_data(start_date, end_date, granularity='month'):
+    """Calcula os dados do relatório com consultas agrupadas no banco.
+
+    Vendas já arquivadas (ver sales.archive) entram pelos totais diários de
+    SaleRollup, então períodos antigos continuam aparecendo no relatório.
+    """
+    items = _finalized_items(start_date, end_date)
+    rollups = rollups_between(start_date, end_date)
+
+    # 1. Vendas por dia/semana/mês/ano (timezone local), com buckets vazios zerados
+    granularity, buckets = _resolve_granularity(start_date, end_date, granularity)
+    tz = timezone.get_current_timezone()
+    trunc, series_title = GRANULARITIES[granularity]
+    totals_by_bucket = {
+        timezone.localtime(row['bucket'], tz).date(): row['total']
+        for row in items.annotate(bucket=trunc('sale__created_at', tzinfo=tz))
+        .values('bucket').annotate(total=_item_total()).order_by('bucket')
+    }
+    for row in rollups.values('day').annotate(total=Sum('revenue')):
+        bucket = _bucket_start(row['day'], granularity)
+        totals_by_bucket[bucket] = totals_by_bucket.get(bucket, 0) + row['total']
+    series_labels = [_bucket_label(day, granularity) for day in buckets]
+    series_values = [float(totals_by_bucket.get(day, 0)) for day in buckets]
+
+    # 2. Participação por produto, ordenada por total vendido
+    sorted_products = _merge_product_rows(
+        items.values('product__name').annotate(units=Sum('quantity'), total=_item_total()),
+        rollups.values('product_name').annotate(units=Sum('units'), total=Sum('revenue')),
+    )
+    sorted_products.sort(key=lambda p: (-p['total'], p['product__name']))
+
     # Pegar top 4 produtos e agrupar o resto em "Outros"
     top_products = sorted_products[:4]
-    others_total = sum(p[1]['total'] for p in sorted_products[4:])
-    others_quantity = sum(p[1]['quantity'] for p in sorted_products[4:])
-    
+    others_total = sum(p['total'] for p in sorted_products[4:])
+    others_units = sum(p['units'] for p in sorted_products[4:])
+
     if others_total > 0:
-        top_products.append(('Outros', {'quantity': others_quantity, 'total': others_total}))
-    
-    # Calcular percentuais
-    total_sales = sum(p[1]['total'] for p in product_sales.values())
+        top_products.append({'product__name': 'Outros', 'units': others_units, 'total': others_total})
+
+    # 3. Estatísticas gerais
+    total_vendas = sum((p['total'] for p in sorted_products), Decimal('0.00'))
+    total_produtos_vendidos = sum(p['units'] for p in sorted_products)
+
     product_percentages = []
-    for name, data in top_products:
-        percentage = (data['total'] / total_sales * 100) if total_sales > 0 else 0
+    for product in top_products:
+        percentage = (product['total'] / total_vendas * 100) if total_vendas > 0 else 0
         product_percentages.append({
-            'name': name,
-            'percentage': percentage,
-            'total': float(data['total']),
-            'quantity': data['quantity']
+            'name': product['product__name'],
+            'percentage': float(percentage),
+            'total': float(product['total']),
+            'quantity': product['units']
         })
-    
-    # 3. Estatísticas gerais
-    total_vendas = sales.aggregate(total=Sum(F('items__price') * F('items__quantity')))['total'] or Decimal('0.00')
-    total_produtos_vendidos = SaleItem.objects.filter(
-        sale__in=sales
-    ).aggregate(total=Sum('quantity'))['total'] or 0
-    
+
     # Produto mais vendido
     most_sold_product = None
     if sorted_products:
         most_sold_product = {
-            'name': sorted_products[0][0],
-            'quantity': sorted_products[0][1]['quantity']
+            'name': sorted_products[0]['product__name'],
+            'quantity': sorted_products[0]['units']
         }
-    
+
     # Produto menos vendido (dos que foram vendidos)
     least_sold_product = None
-    if sorted_products and len(sorted_products) > 1:
+    if len(sorted_products) > 1:
         least_sold_product = {
-            'name': sorted_products[-1][0],
-            'quantity': sorted_products[-1][1]['quantity']
+            'name': sorted_products[-1]['product__name'],
+            'quantity': sorted_products[-1]['units']
         }
-    
+
     # Produtos em falta (quantidade = 0)
     out_of_stock = Product.objects.filter(quantity=0).count()
-    
+
     return {
-        'months_labels': months_labels,
-        'months_values': months_values,
+        'granularity': granularity,
+        'series_title': series_title,
+        'series_labels': series_labels,
+        'series_values': series_values,
         'product_percentages': product_percentages,
         'total_vendas': float(total_vendas),
         'total_produtos_vendidos': total_produtos_vendidos,
@@ -115,414 +238,411 @@ def _get_report_data(start_date, end_date):
         'least_sold_product': least_sold_product,
         'start_date': start_date.strftime('%d/%m/%Y'),
         'end_date': end_date.strftime('%d/%m/%Y'),
-        'has_data': sales.exists()
+        'has_data': bool(sorted_products)
     }
 
 
+COMPARISON_PERIODS = ('previous', 'year_ago')
+
+
+def _shift_years(moment, years):
+    try:
+        return moment.replace(year=moment.year + years)
+    except ValueError:
+        # 29/02 em ano não bissexto
+        return moment.replace(year=moment.year + years, day=28)
+
+
+def _comparison_ranges(start_date, end_date, periods):
+    ranges = {'current': (start_date, end_date)}
+    if 'previous' in periods:
+        previous_end = start_date - timedelta(microseconds=1)
+        ranges['previous'] = (previous_end - (end_date - start_date), previous_end)
+    if 'year_ago' in periods:
+        ranges['year_ago'] = (_shift_years(start_date, -1), _shift_years(end_date, -1))
+    return ranges
+
+
+def _delta(current, other):
+    delta = current - other
+    percentage = float(delta / other * 100) if other else None
+    return delta, percentage
+
+
+def _get_comparison_data(start_date, end_date, periods, top=5):
+    """Compara o período com os períodos pedidos em uma única query agrupada.
+
+    Filtra a união dos intervalos e soma cada período separadamente
+    (Sum com filter=), agrupando por produto. Os intervalos podem se
+    sobrepor (ano anterior x período anterior em intervalos longos), então
+    um mesmo item pode contar em mais de um período.
+    """
+    ranges = _comparison_ranges(start_date, end_date, periods)
+    in_any_range = Q()
+    sums = {}
+    for name, (start, end) in ranges.items():
+        in_range = Q(sale__created_at__range=(start, end))
+        in_any_range |= in_range
+        sums[f'units_{name}'] = Sum('quantity', filter=in_range)
+        sums[f'total_{name}'] = _item_total(filter=in_range)
+
+    rows = SaleItem.objects.filter(sale__status=Sale.STATUS_FINALIZED).filter(in_any_range)\
+        .values(product_name=F('product__name'))\
+        .annotate(**sums)
+
+    # Mesma consulta sobre os totais diários das vendas arquivadas
+    archived_range = Q()
+    archived_sums = {}
+    for name, (start, end) in ranges.items():
+        in_range = Q(day__range=(timezone.localtime(start).date(), timezone.localtime(end).date()))
+        archived_range |= in_range
+        archived_sums[f'units_{name}'] = Sum('units', filter=in_range)
+        archived_sums[f'total_{name}'] = Sum('revenue', filter=in_range)
+    archived_rows = SaleRollup.objects.filter(archived_range)\
+        .values('product_name')\
+        .annotate(**archived_sums)
+
+    totals = {name: {'total': Decimal('0.00'), 'quantity': 0} for name in ranges}
+    by_product = {name: {} for name in ranges}
+    for row in chain(rows, archived_rows):
+        for name in ranges:
+            units = row[f'units_{name}']
+            if units is None:
+                continue  # produto sem vendas neste período
+            total = row[f'total_{name}'] or Decimal('0.00')
+            totals[name]['total'] += total
+            totals[name]['quantity'] += units
+            product = by_product[name].setdefault(
+                row['product_name'], {'units': 0, 'total': Decimal('0.00')}
+            )
+            product['units'] += units
+            product['total'] += total
+
+    current = totals['current']
+    result = {'periods': {}, 'top_products': []}
+    for name, (start, end) in ranges.items():
+        period = {
+            'start_date': start.strftime('%d/%m/%Y'),
+            'end_date': end.strftime('%d/%m/%Y'),
+            'total_vendas': float(totals[name]['total']),
+            'total_produtos_vendidos': totals[name]['quantity'],
+        }
+        if name != 'current':
+            delta, percentage = _delta(current['total'], totals[name]['total'])
+            period['delta_vendas'] = float(delta)
+            period['delta_vendas_percentage'] = percentage
+            period['delta_produtos_vendidos'] = current['quantity'] - totals[name]['quantity']
+        result['periods'][name] = period
+
+    top_names = sorted(
+        by_product['current'], key=lambda n: by_product['current'][n]['total'], reverse=True
+    )[:top]
+    for product_name in top_names:
+        row = by_product['current'][product_name]
+        entry = {
+            'name': product_name,
+            'current': {'quantity': row['units'], 'total': float(row['total'])},
+        }
+        for name in ranges:
+            if name == 'current':
+                continue
+            other = by_product[name].get(product_name, {'units': 0, 'total': Decimal('0.00')})
+            delta, percentage = _delta(row['total'], other['total'])
+            entry[name] = {
+                'quantity': other['units'],
+                'total': float(other['total']),
+                'delta_quantity': row['units'] - other['units'],
+                'delta_total': float(delta),
+                'delta_total_percentage': percentage,
+            }
+        result['top_products'].append(entry)
+    return result
+
+
 @login_required
 def dashboard_view(request):
     """View principal do dashboard"""
     context = {
         'section_name': 'Dashboard',
+        'pdf_async': settings.TASKS_ASYNC,
     }
     return render(request, 'dashboard/dashboard.html', context)
 
 
 @login_required
+@reporting_reads()
 def generate_report_data(request):
     """Retorna dados do relatório em JSON para exibição na página"""
-    # Obter parâmetros de período (padrão: último mês)
-    end_date = timezone.now()
-    start_date = end_date - timedelta(days=30)
-    
-    if request.GET.get('start_date'):
-        try:
-            date_str = request.GET.get('start_date')
-            naive_date = datetime.strptime(date_str, '%Y-%m-%d')
-            start_date = timezone.make_aware(naive_date.replace(hour=0, minute=0, second=0, microsecond=0))
-        except (ValueError, TypeError):
-            pass
-    
-    if request.GET.get('end_date'):
-        try:
-            date_str = request.GET.get('end_date')
-            naive_date = datetime.strptime(date_str, '%Y-%m-%d')
-            end_date = timezone.make_aware(naive_date.replace(hour=23, minute=59, second=59, microsecond=999999))
-        except (ValueError, TypeError):
-            pass
-    
-    # Filtrar vendas finalizadas no período
-    sales = Sale.objects.filter(
-        status=Sale.STATUS_FINALIZED,
-        created_at__gte=start_date,
-        created_at__lte=end_date
-    )
-    
-    # Preparar dados para o relatório
-    # 1. Vendas por mês
-    sales_by_month = defaultdict(Decimal)
-    for sale in sales:
-        month_key = sale.created_at.strftime('%Y-%m')
-        sales_by_month[month_key] += sale.total
-    
-    # Ordenar por mês
-    months_data = sorted(sales_by_month.items())
-    months_pt = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
-    months_labels = [months_pt[int(m.split('-')[1]) - 1] for m, _ in months_data]
-    months_values = [float(v) for _, v in months_data]
-    
-    # 2. Participação por produto
-    product_sales = defaultdict(lambda: {'quantity': 0, 'total': Decimal('0.00')})
-    for sale in sales:
-        for item in sale.items.all():
-            product_sales[item.product.name]['quantity'] += item.quantity
-            product_sales[item.product.name]['total'] += item.price * item.quantity
-    
-    # Ordenar produtos por total vendido
-    sorted_products = sorted(product_sales.items(), key=lambda x: x[1]['total'], reverse=True)
-    
-    # Pegar top 4 produtos e agrupar o resto em "Outros"
-    top_products = sorted_products[:4]
-    others_total = sum(p[1]['total'] for p in sorted_products[4:])
-    others_quantity = sum(p[1]['quantity'] for p in sorted_products[4:])
-    
-    if others_total > 0:
-        top_products.append(('Outros', {'quantity': others_quantity, 'total': others_total}))
-    
-    # Calcular percentuais
-    total_sales = sum(p[1]['total'] for p in product_sales.values())
-    product_percentages = []
-    product_labels = []
-    product_values = []
-    product_quantities = []
-    
-    for name, data in top_products:
-        percentage = (data['total'] / total_sales * 100) if total_sales > 0 else 0
-        product_percentages.append({
-            'name': name,
-            'percentage': float(percentage),
-            'total': float(data['total']),
-            'quantity': data['quantity']
-        })
-        product_labels.append(name)
-        product_values.append(float(data['total']))
-        product_quantities.append(data['quantity'])
-    
-    # 3. Estatísticas gerais
-    total_vendas = sales.aggregate(total=Sum(F('items__price') * F('items__quantity')))['total'] or Decimal('0.00')
-    total_produtos_vendidos = SaleItem.objects.filter(
-        sale__in=sales
-    ).aggregate(total=Sum('quantity'))['total'] or 0
-    
-    # Produto mais vendido
-    most_sold_product = None
-    if sorted_products:
-        most_sold_product = {
-            'name': sorted_products[0][0],
-            'quantity': sorted_products[0][1]['quantity']
-        }
-    
-    # Produto menos vendido (dos que foram vendidos)
-    least_sold_product = None
-    if sorted_products and len(sorted_products) > 1:
-        least_sold_product = {
-            'name': sorted_products[-1][0],
-            'quantity': sorted_products[-1][1]['quantity']
-        }
-    
-    # Produtos em falta (quantidade = 0)
-    out_of_stock = Product.objects.filter(quantity=0).count()
-    
+    start_date, end_date = _get_period(request)
+    data = _get_report_data(start_date, end_date, request.GET.get('granularity', 'month'))
+    products = data['product_percentages']
+    periods = [p for p in request.GET.get('compare', '').split(',') if p in COMPARISON_PERIODS]
+
     # Retornar JSON
-    return JsonResponse({
-        'start_date': start_date.strftime('%d/%m/%Y'),
-        'end_date': end_date.strftime('%d/%m/%Y'),
-        'months': {
-            'labels': months_labels,
-            'values': months_values
+    response = {
+        'start_date': data['start_date'],
+        'end_date': data['end_date'],
+        'series': {
+            'granularity': data['granularity'],
+            'title': data['series_title'],
+            'labels': data['series_labels'],
+            'values': data['series_values']
         },
         'products': {
-            'labels': product_labels,
-            'values': product_values,
-            'quantities': product_quantities,
-            'percentages': product_percentages
+            'labels': [p['name'] for p in products],
+            'values': [p['total'] for p in products],
+            'quantities': [p['quantity'] for p in products],
+            'percentages': products
         },
         'stats': {
-            'total_vendas': float(total_vendas),
-            'total_produtos_vendidos': total_produtos_vendidos,
-            'out_of_stock': out_of_stock,
-            'most_sold_product': most_sold_product,
-            'least_sold_product': least_sold_product
+            'total_vendas': data['total_vendas'],
+            'total_produtos_vendidos': data['total_produtos_vendidos'],
+            'out_of_stock': data['out_of_stock'],
+            'most_sold_product': data['most_sold_product'],
+            'least_sold_product': data['least_sold_product']
         }
+    }
+    if periods:
+        response['comparison'] = _get_comparison_data(start_date, end_date, periods)
+    return JsonResponse(response)
+
+
+@login_required
+@reporting_reads()
+def reorder_report_data(request):
+    """Retorna a previsão de reposição de estoque em JSON"""
+    try:
+        window_days = min(max(int(request.GET.get('window', 30)), 7), 365)
+    except (ValueError, TypeError):
+        window_days = 30
+    try:
+        lead_time_days = min(max(int(request.GET.get('lead_time', 7)), 1), 60)
+    except (ValueError, TypeError):
+        lead_time_days = 7
+
+    products = build_reorder_report(window_days=window_days, lead_time_days=lead_time_days)
+    return JsonResponse({
+        'window_days': window_days,
+        'lead_time_days': lead_time_days,
+        'products': products,
     })
 
 
 @login_required
-def generate_report_pdf(request):
-    """Gera relatório financeiro em PDF"""
-    # Obter parâmetros de período (padrão: último mês)
-    end_date = timezone.now()
-    start_date = end_date - timedelta(days=30)
-    
-    if request.GET.get('start_date'):
-        try:
-            date_str = request.GET.get('start_date')
-            naive_date = datetime.strptime(date_str, '%Y-%m-%d')
-            # Converter para início do dia no timezone local
-            start_date = timezone.make_aware(naive_date.replace(hour=0, minute=0, second=0, microsecond=0))
-        except (ValueError, TypeError):
-            # Se houver erro, manter a data padrão
-            pass
-    
-    if request.GET.get('end_date'):
+@reporting_reads()
+def debt_aging_data(request):
+    """Retorna o saldo em aberto de cada cliente por idade (0–30/31–60/61–90/90+ dias) em JSON"""
+    clients = build_debt_aging()
+    totals = {key: sum(c['buckets'][key] for c in clients) for key, *_ in AGING_BUCKETS}
+    return JsonResponse({
+        'buckets': [{'key': key, 'label': label} for key, label, *_ in AGING_BUCKETS],
+        'clients': clients,
+        'totals': totals,
+        'total': sum(totals.values()),
+    })
+
+
+@login_required
+@reporting_reads()
+def profitability_report_data(request):
+    """Retorna receita, custo e margem por produto, categoria ou mês em JSON"""
+    start_date, end_date = _get_period(request)
+    group_by = request.GET.get('group_by', 'product')
+    if group_by not in GROUPINGS:
+        group_by = 'product'
+
+    rows = build_profitability_report(start_date, end_date, group_by=group_by)
+    revenue = sum(row['revenue'] for row in rows)
+    cost = sum(row['cost'] for row in rows)
+    return JsonResponse({
+        'start_date': start_date.strftime('%d/%m/%Y'),
+        'end_date': end_date.strftime('%d/%m/%Y'),
+        'group_by': group_by,
+        'rows': rows,
+        'totals': {
+            'revenue': revenue,
+            'cost': cost,
+            'margin': revenue - cost,
+            'margin_percentage': (revenue - cost) / revenue * 100 if revenue else 0.0,
+        },
+    })
+
+
+HEATMAP_CACHE_SECONDS = 300
+
+
+def _get_heatmap(start_date, end_date):
+    key = versioned_key(SALES, 'heatmap', f'{start_date:%Y%m%d%H%M}', f'{end_date:%Y%m%d%H%M}')
+    heatmap = cache.get(key)
+    if heatmap is None:
+        with primary_reads():
+            heatmap = build_sales_heatmap(start_date, end_date)
+        cache.set(key, heatmap, HEATMAP_CACHE_SECONDS)
+    return heatmap
+
+
+@login_required
+def sales_heatmap_data(request):
+    """Retorna a matriz 7x24 (dia da semana x hora) das vendas em JSON"""
+    start_date, end_date = _get_period(request)
+    heatmap = _get_heatmap(start_date, end_date)
+    return JsonResponse({
+        'start_date': start_date.strftime('%d/%m/%Y'),
+        'end_date': end_date.strftime('%d/%m/%Y'),
+        **heatmap,
+    })
+
+
+@login_required
+def sales_heatmap_chart(request):
+    """Retorna o heatmap de vendas como PNG (em cache por período)"""
+    start_date, end_date = _get_period(request)
+    key = versioned_key(SALES, 'heatmap-png', f'{start_date:%Y%m%d%H%M}', f'{end_date:%Y%m%d%H%M}')
+    png = cache.get(key)
+    if png is None:
+        png = render_heatmap_png(_get_heatmap(start_date, end_date))
+        cache.set(key, png, HEATMAP_CACHE_SECONDS)
+    response = HttpResponse(png, content_type='image/png')
+    response['Cache-Control'] = f'private, max-age={HEATMAP_CACHE_SECONDS}'
+    return response
+
+
+def _closing_to_dict(closing, closed):
+    if isinstance(closing, DailyClosing):
+        closing = {
+            'business_date': closing.business_date,
+            'payments_total': closing.payments_total,
+            'payments_by_method': closing.payments_by_method,
+            'sales_count': closing.sales_count,
+            'revenue': closing.revenue,
+            'units_sold': closing.units_sold,
+            'open_sales_count': closing.open_sales_count,
+            'open_balance': closing.open_balance,
+            'cancelled_count': closing.cancelled_count,
+            'cancelled_total': closing.cancelled_total,
+        }
+    return {
+        'closed': closed,
+        'business_date': closing['business_date'].strftime('%d/%m/%Y'),
+        'payments_total': float(closing['payments_total']),
+        'payments_by_method': {
+            method: {'total': float(values['total']), 'count': values['count']}
+            for method, values in closing['payments_by_method'].items()
+        },
+        'sales_count': closing['sales_count'],
+        'revenue': float(closing['revenue']),
+        'units_sold': closing['units_sold'],
+        'open_sales_count': closing['open_sales_count'],
+        'open_balance': float(closing['open_balance']),
+        'cancelled_count': closing['cancelled_count'],
+        'cancelled_total': float(closing['cancelled_total']),
+    }
+
+
+def _get_business_date(value):
+    if value:
         try:
-            date_str = request.GET.get('end_date')
-            naive_date = datetime.strptime(date_str, '%Y-%m-%d')
-            # Converter para fim do dia no timezone local
-            end_date = timezone.make_aware(naive_date.replace(hour=23, minute=59, second=59, microsecond=999999))
+            return datetime.strptime(value, '%Y-%m-%d').date()
         except (ValueError, TypeError):
-            # Se houver erro, manter a data padrão
             pass
+    return DailyClosing.current_business_date()
+
+
+@login_required
+def daily_closing_data(request):
+    """Fechamento do dia: o snapshot gravado, ou uma prévia calculada na hora"""
+    business_date = _get_business_date(request.GET.get('date'))
+    closing = DailyClosing.objects.filter(business_date=business_date).first()
+    if closing:
+        return JsonResponse(_closing_to_dict(closing, closed=True))
+    return JsonResponse(_closing_to_dict(DailyClosing.compute(business_date), closed=False))
+
+
+@login_required
+@require_POST
+def close_day(request):
+    """Grava o fechamento de caixa do dia (uma única vez por dia)"""
+    business_date = _get_business_date(request.POST.get('date'))
+    try:
+        closing = DailyClosing.close(business_date, user=request.user)
+    except IntegrityError:
+        return HttpResponseBadRequest("O caixa deste dia já foi fechado.")
+    return JsonResponse(_closing_to_dict(closing, closed=True))
+
+
+@login_required
+def daily_closings_data(request):
+    """Últimos fechamentos gravados, para o gráfico do dashboard"""
+    try:
+        days = min(max(int(request.GET.get('days', 30)), 1), 366)
+    except (ValueError, TypeError):
+        days = 30
+    closings = reversed(DailyClosing.objects.all()[:days])
+    return JsonResponse({'closings': [_closing_to_dict(c, closed=True) for c in closings]})
+
+
+@login_required
+@reporting_reads()
+def generate_report_pdf(request):
+    """Gera relatório financeiro em PDF"""
+    # matplotlib/reportlab só são carregados no primeiro PDF (ou no pre-warm)
+    from .pdf import build_report_pdf
+
+    start_date, end_date = _get_period(request)
+    granularity = request.GET.get('granularity', 'month')
+    if settings.TASKS_ASYNC:
+        # Gera no worker; a página consulta report_pdf_status até o arquivo ficar pronto
+        task = render_report_pdf.enqueue(
+            start_date.isoformat(), end_date.isoformat(), granularity,
+            f'{REPORTS_DIR}/{uuid.uuid4().hex}.pdf',
+        )
+        return JsonResponse({
+            'task_id': task.pk,
+            'status_url': reverse('report_pdf_status', args=[task.pk]),
+        }, status=202)
+
+    data = _get_report_data(start_date, end_date, granularity)
+
+    response = HttpResponse(build_report_pdf(data, start_date, end_date), content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{_report_filename(start_date, end_date)}"'
     
-    # Filtrar vendas finalizadas no período
-    sales = Sale.objects.filter(
-        status=Sale.STATUS_FINALIZED,
-        created_at__gte=start_date,
-        created_at__lte=end_date
-    )
-    
-    # Preparar dados para o relatório
-    # 1. Vendas por mês
-    sales_by_month = defaultdict(Decimal)
-    for sale in sales:
-        month_key = sale.created_at.strftime('%Y-%m')
-        sales_by_month[month_key] += sale.total
-    
-    # Ordenar por mês
-    months_data = sorted(sales_by_month.items())
-    months_pt = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
-    months_labels = [months_pt[int(m.split('-')[1]) - 1] for m, _ in months_data]
-    months_values = [float(v) for _, v in months_data]
-    
-    # 2. Participação por produto
-    product_sales = defaultdict(lambda: {'quantity': 0, 'total': Decimal('0.00')})
-    for sale in sales:
-        for item in sale.items.all():
-            product_sales[item.product.name]['quantity'] += item.quantity
-            product_sales[item.product.name]['total'] += item.price * item.quantity
-    
-    # Ordenar produtos por total vendido
-    sorted_products = sorted(product_sales.items(), key=lambda x: x[1]['total'], reverse=True)
-    
-    # Pegar top 4 produtos e agrupar o resto em "Outros"
-    top_products = sorted_products[:4]
-    others_total = sum(p[1]['total'] for p in sorted_products[4:])
-    others_quantity = sum(p[1]['quantity'] for p in sorted_products[4:])
-    
-    if others_total > 0:
-        top_products.append(('Outros', {'quantity': others_quantity, 'total': others_total}))
-    
-    # Calcular percentuais
-    total_sales = sum(p[1]['total'] for p in product_sales.values())
-    product_percentages = []
-    for name, data in top_products:
-        percentage = (data['total'] / total_sales * 100) if total_sales > 0 else 0
-        product_percentages.append({
-            'name': name,
-            'percentage': percentage,
-            'total': data['total']
-        })
-    
-    # 3. Estatísticas gerais
-    total_vendas = sales.aggregate(total=Sum(F('items__price') * F('items__quantity')))['total'] or Decimal('0.00')
-    total_produtos_vendidos = SaleItem.objects.filter(
-        sale__in=sales
-    ).aggregate(total=Sum('quantity'))['total'] or 0
-    
-    # Produto mais vendido
-    most_sold_product = None
-    if sorted_products:
-        most_sold_product = sorted_products[0]
-    
-    # Produto menos vendido (dos que foram vendidos)
-    least_sold_product = None
-    if sorted_products:
-        least_sold_product = sorted_products[-1] if len(sorted_products) > 1 else None
-    
-    # Produtos em falta (quantidade = 0)
-    out_of_stock = Product.objects.filter(quantity=0).count()
-    
-    # Criar o PDF
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=30, leftMargin=30,
-                           topMargin=30, bottomMargin=30)
-    
-    # Container para os elementos do PDF
-    story = []
-    
-    # Estilos
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#B91C1C'),  # Vermelho similar ao tema
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.HexColor('#B91C1C'),
-        spaceAfter=12,
-        spaceBefore=12
-    )
-    
-    # Título
-    story.append(Paragraph("Relatório Financeiro", title_style))
-    story.append(Spacer(1, 0.2*inch))
-    
-    # Período
-    period_text = f"Período: {start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}"
-    story.append(Paragraph(period_text, styles['Normal']))
-    story.append(Spacer(1, 0.3*inch))
-    
-    # Estatísticas gerais
-    story.append(Paragraph("Estatísticas Gerais", heading_style))
-    stats_data = [
-        ['Total de Vendas', f"R$ {float(total_vendas):,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')],
-        ['Total de Produtos Vendidos', f"{total_produtos_vendidos} unidades"],
-        ['Produtos em Falta', f"{out_of_stock} produtos"],
-    ]
-    
-    if most_sold_product:
-        stats_data.append(['Produto Mais Vendido', f"{most_sold_product[0]} ({most_sold_product[1]['quantity']} unidades)"])
-    
-    # Mensagem se não houver dados
-    if not sales.exists():
-        story.append(Paragraph("Não há vendas no período selecionado.", styles['Normal']))
-        story.append(Spacer(1, 0.2*inch))
-    
-    stats_table = Table(stats_data, colWidths=[4*inch, 2.5*inch])
-    stats_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#FEE2E2')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('TOPPADDING', (0, 0), (-1, -1), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-    ]))
-    story.append(stats_table)
-    story.append(Spacer(1, 0.3*inch))
-    
-    # Gráfico de vendas por mês
-    if months_data and len(months_data) > 0:
-        story.append(Paragraph("Vendas por Mês", heading_style))
-        
-        # Criar gráfico
-        fig, ax = plt.subplots(figsize=(6, 4))
-        bars = ax.bar(months_labels, months_values, color='#2563EB', edgecolor='black')
-        ax.set_ylabel('Valor (R$)', fontsize=10)
-        ax.set_xlabel('Mês', fontsize=10)
-        ax.set_title('Vendas por Mês', fontsize=12, fontweight='bold')
-        ax.grid(axis='y', alpha=0.3)
-        
-        # Adicionar valores nas barras
-        for bar in bars:
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height,
-                   f'R$ {height:,.0f}'.replace(',', '.'),
-                   ha='center', va='bottom', fontsize=8)
-        
-        plt.tight_layout()
-        
-        # Converter gráfico para imagem
-        canvas = FigureCanvasAgg(fig)
-        img_buffer = BytesIO()
-        canvas.print_png(img_buffer)
-        img_buffer.seek(0)
-        plt.close(fig)
-        
-        # Adicionar imagem ao PDF
-        img_buffer.seek(0)
-        img = Image(img_buffer, width=5.5*inch, height=3.7*inch)
-        story.append(img)
-        story.append(Spacer(1, 0.3*inch))
-    
-    # Participação por produto
-    if product_percentages and len(product_percentages) > 0:
-        story.append(Paragraph("Participação por Produto", heading_style))
-        
-        # Tabela de participação
-        product_data = [['Produto', 'Participação', 'Total Vendido']]
-        colors_list = ['#2563EB', '#F97316', '#10B981', '#06B6D4', '#8B5CF6']
-        
-        for i, product in enumerate(product_percentages):
-            color = colors_list[i % len(colors_list)]
-            product_data.append([
-                product['name'],
-                f"{product['percentage']:.1f}%",
-                f"R$ {float(product['total']):,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-            ])
-        
-        product_table = Table(product_data, colWidths=[2.5*inch, 2*inch, 2*inch])
-        product_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#B91C1C')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-        ]))
-        story.append(product_table)
-        story.append(Spacer(1, 0.3*inch))
-        
-        # Gráfico de pizza
-        fig, ax = plt.subplots(figsize=(6, 4))
-        labels = [p['name'] for p in product_percentages]
-        sizes = [p['percentage'] for p in product_percentages]
-        # Converter cores hex para matplotlib
-        import matplotlib.colors as mcolors
-        pie_colors = [mcolors.to_rgba(c) for c in colors_list[:len(product_percentages)]]
-        
-        wedges, texts, autotexts = ax.pie(sizes, labels=labels, colors=pie_colors, autopct='%1.1f%%',
-                                          startangle=90, textprops={'fontsize': 9})
-        
-        ax.set_title('Participação por Produto', fontsize=12, fontweight='bold')
-        
-        plt.tight_layout()
-        
-        # Converter gráfico para imagem
-        canvas = FigureCanvasAgg(fig)
-        img_buffer2 = BytesIO()
-        canvas.print_png(img_buffer2)
-        img_buffer2.seek(0)
-        plt.close(fig)
-        
-        # Adicionar imagem ao PDF
-        img2 = Image(img_buffer2, width=5.5*inch, height=3.7*inch)
-        story.append(img2)
-    
-    # Rodapé
-    story.append(Spacer(1, 0.3*inch))
-    footer_text = f"Relatório gerado em {timezone.now().strftime('%d/%m/%Y às %H:%M')}"
-    story.append(Paragraph(footer_text, ParagraphStyle('Footer', parent=styles['Normal'], 
-                                                        alignment=TA_CENTER, fontSize=9,
-                                                        textColor=colors.grey)))
-    
-    # Construir PDF
-    doc.build(story)
-    
-    # Retornar resposta
-    buffer.seek(0)
-    response = HttpResponse(buffer.read(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="relatorio_{start_date.strftime("%Y%m%d")}_{end_date.strftime("%Y%m%d")}.pdf"'
-    
+    return response
+
+
+def _report_filename(start_date, end_date):
+    return f'relatorio_{start_date.strftime("%Y%m%d")}_{end_date.strftime("%Y%m%d")}.pdf'
+
+
+def _report_task(task_id):
+    return get_object_or_404(Task, pk=task_id, name=render_report_pdf.task_name)
+
+
+@login_required
+def report_pdf_status(request, task_id):
+    """Situação do PDF enfileirado por generate_report_pdf"""
+    task = _report_task(task_id)
+    data = {'status': task.get_status_display()}
+    if task.status == Task.Status.DONE:
+        data['download_url'] = reverse('download_report_pdf', args=[task.pk])
+    elif task.status == Task.Status.FAILED:
+        data['error'] = 'Não foi possível gerar o relatório.'
+    return JsonResponse(data)
+
+
+@login_required
+def download_report_pdf(request, task_id):
+    task = _report_task(task_id)
+    if task.status != Task.Status.DONE:
+        return HttpResponseBadRequest("Relatório ainda não está pronto.")
+    start_date, end_date, _, path = task.args
+    if not default_storage.exists(path):
+        return HttpResponseBadRequest("Relatório expirado; gere novamente.")
+    with default_storage.open(path, 'rb') as f:
+        pdf = f.read()
+    # Download único: o arquivo e a tarefa saem daqui
+    default_storage.delete(path)
+    task.delete()
+    response = HttpResponse(pdf, content_type='application/pdf')
+    filename = _report_filename(datetime.fromisoformat(start_date), datetime.fromisoformat(end_date))
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response
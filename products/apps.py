@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from . import codes
+        from .models import Product
+
+        def _invalidate(sender, **kwargs):
+            codes.invalidate()
+
+        post_save.connect(_invalidate, sender=Product, dispatch_uid='products_code_index_save')
+        post_delete.connect(_invalidate, sender=Product, dispatch_uid='products_code_index_delete')
@@ -0,0 +1,200 @@
+"""Importação e exportação do catálogo de produtos em CSV.
+
+A exportação é gerada linha a linha (StreamingHttpResponse). A importação
+acontece em dois passos: plan_import() lê o arquivo em streaming, valida
+cada linha com as regras do ProductForm e monta o diff contra o banco;
+apply_import() grava o plano com bulk_create/bulk_update em lotes, numa
+única transação.
+"""
+import csv
+import io
+
+from django.db import transaction
+from django.db.models import F
+
+from . import codes
+from .forms import ProductForm
+from .models import Product, StockMovement
+
+CSV_FIELDS = ('code', 'name', 'category', 'sale_price', 'cost_price', 'quantity')
+UPDATE_FIELDS = ('code', 'name', 'category', 'sale_price', 'cost_price', 'quantity')
+CHUNK_SIZE = 500
+# CSV do Excel em português no Windows sai em cp1252, não em UTF-8
+ENCODINGS = ('utf-8-sig', 'cp1252')
+
+
+class _Echo:
+    """Writer de csv que só devolve a linha, para o StreamingHttpResponse."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(using=None):
+    """Gera as linhas do CSV do catálogo, uma por produto."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_FIELDS)
+    products = Product.objects.using(using).order_by('name').values_list(*CSV_FIELDS)
+    for row in products.iterator(chunk_size=2000):
+        yield writer.writerow(['' if value is None else value for value in row])
+
+
+class ProductImportForm(ProductForm):
+    """ProductForm sem a checagem de unicidade por linha.
+
+    Códigos repetidos são conferidos em memória contra o arquivo inteiro e
+    o catálogo já carregado, em vez de uma consulta por linha.
+    """
+
+    class Meta(ProductForm.Meta):
+        fields = CSV_FIELDS
+
+    def validate_unique(self):
+        pass
+
+
+class ImportPlan:
+    def __init__(self):
+        self.creates = []
+        self.updates = []  # (produto, {campo: (antes, depois)})
+        self.unchanged = 0
+        self.errors = []  # (linha, mensagem)
+
+    @property
+    def is_valid(self):
+        return not self.errors
+
+    @property
+    def summary(self):
+        return {
+            'created': len(self.creates),
+            'updated': len(self.updates),
+            'unchanged': self.unchanged,
+            'errors': len(self.errors),
+        }
+
+
+def _normalize(row):
+    data = {field: (row.get(field) or '').strip() for field in CSV_FIELDS}
+    # Aceita a categoria pelo código ('CE') ou pelo nome ('Cerveja')
+    labels = {label.lower(): value for value, label in Product.Category.choices}
+    data['category'] = labels.get(data['category'].lower(), data['category']) or Product.Category.SEM_CATEGORIA
+    for field in ('sale_price', 'cost_price'):
+        data[field] = data[field].replace(',', '.')
+    return data
+
+
+def plan_import(file):
+    """Valida o CSV (bytes ou texto) e calcula o diff contra o catálogo.
+
+    Arquivo em bytes é lido como UTF-8 e, se não decodificar, como cp1252.
+    """
+    if not isinstance(file, io.TextIOBase):
+        for encoding in ENCODINGS:
+            file.seek(0)
+            text = io.TextIOWrapper(file, encoding=encoding, newline='')
+            try:
+                return plan_import(text)
+            except UnicodeDecodeError:
+                continue
+            finally:
+                text.detach()  # não fecha o arquivo do chamador
+        plan = ImportPlan()
+        plan.errors.append((1, "Codificação do arquivo não reconhecida; salve como CSV UTF-8."))
+        return plan
+    reader = csv.DictReader(file)
+    plan = ImportPlan()
+    try:
+        _plan_rows(reader, plan)
+    except csv.Error as e:
+        plan.errors.append((reader.line_num, f"Arquivo CSV inválido: {e}."))
+    return plan
+
+
+def _plan_rows(reader, plan):
+    missing = set(('name', 'sale_price', 'cost_price')) - set(reader.fieldnames or ())
+    if missing:
+        plan.errors.append((1, f"Colunas obrigatórias ausentes: {', '.join(sorted(missing))}."))
+        return
+
+    products = list(Product.objects.only(*UPDATE_FIELDS))
+    by_code = {p.code: p for p in products if p.code}
+    by_name = {p.name.strip().lower(): p for p in products}
+    seen_codes = {}
+    seen_products = set()
+    seen_new_names = set()
+
+    for line, row in enumerate(reader, start=2):
+        data = _normalize(row)
+        match = by_code.get(data['code']) if data['code'] else None
+        if match is None:
+            match = by_name.get(data['name'].lower())
+        if match is not None:
+            if match.pk in seen_products:
+                plan.errors.append((line, f"Produto '{match.name}' aparece mais de uma vez no arquivo."))
+                continue
+            seen_products.add(match.pk)
+        if data['code']:
+            owner = by_code.get(data['code'])
+            if data['code'] in seen_codes or (owner is not None and owner is not match):
+                plan.errors.append((line, f"Código {data['code']} já pertence a outro produto."))
+                continue
+            seen_codes[data['code']] = line
+        if not data['quantity']:
+            data['quantity'] = str(match.quantity if match else 0)
+
+        form = ProductImportForm(data=data, instance=Product(pk=match.pk) if match else None)
+        if not form.is_valid():
+            messages = '; '.join(
+                f"{form.fields[field].label if field in form.fields else field}: {' '.join(errors)}"
+                for field, errors in form.errors.items()
+            )
+            plan.errors.append((line, messages))
+            continue
+
+        cleaned = form.cleaned_data
+        if match is None:
+            if data['name'].lower() in seen_new_names:
+                plan.errors.append((line, f"Produto '{data['name']}' aparece mais de uma vez no arquivo."))
+                continue
+            seen_new_names.add(data['name'].lower())
+            plan.creates.append(Product(**{field: cleaned[field] for field in CSV_FIELDS}))
+            continue
+        changes = {
+            field: (getattr(match, field), cleaned[field])
+            for field in UPDATE_FIELDS
+            if getattr(match, field) != cleaned[field]
+        }
+        if changes:
+            plan.updates.append((match, changes))
+        else:
+            plan.unchanged += 1
+
+
+def apply_import(plan, chunk_size=CHUNK_SIZE):
+    """Grava um plano válido; tudo ou nada."""
+    if not plan.is_valid:
+        raise ValueError("O arquivo tem erros; corrija antes de importar.")
+    adjustments = []
+    with transaction.atomic():
+        created = Product.objects.bulk_create(plan.creates, batch_size=chunk_size)
+        adjustments.extend((product, product.quantity) for product in created)
+
+        to_update = []
+        for product, changes in plan.updates:
+            for field, (_, new) in changes.items():
+                setattr(product, field, new)
+            if 'quantity' in changes:
+                # Aplica a diferença, sem apagar vendas feitas depois da leitura
+                old, new = changes['quantity']
+                product.quantity = F('quantity') + (new - old)
+                adjustments.append((product, new - old))
+            else:
+                product.quantity = F('quantity')
+            to_update.append(product)
+        Product.objects.bulk_update(to_update, UPDATE_FIELDS, batch_size=chunk_size)
+
+        StockMovement.record(adjustments, StockMovement.Reason.ADJUSTMENT)
+    # bulk_create/bulk_update não disparam sinais
+    codes.invalidate()
+    return plan.summary
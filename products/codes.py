@@ -0,0 +1,61 @@
+"""Índice em memória código -> produto para lançamento rápido de itens.
+
+O índice é montado sob demanda com uma única consulta e guarda a geração
+'products' do cache compartilhado (core.cache) em que foi montado. Salvar
+ou excluir um produto em qualquer worker avança a geração (sinais em
+products.apps) e os demais remontam o índice na próxima consulta; a
+expiração em PRODUCT_CODE_INDEX_TIMEOUT segundos fica como salvaguarda.
+"""
+import copy
+import re
+import threading
+import time
+
+from django.conf import settings
+
+from core.cache import PRODUCTS, bump_on_commit, generation
+from .models import Product
+
+QUICK_ENTRY_RE = re.compile(r'^\s*(\d+)\s*(?:[x*]\s*(\d+))?\s*$', re.IGNORECASE)
+INDEX_FIELDS = ('product_id', 'code', 'name', 'category', 'sale_price', 'cost_price')
+
+_index = None
+_generation = None
+_expires_at = 0.0
+_lock = threading.Lock()
+
+
+def invalidate():
+    """Descarta o índice neste processo e, após o commit, nos demais."""
+    global _index
+    with _lock:
+        _index = None
+    bump_on_commit(PRODUCTS)
+
+
+def _get_index():
+    global _index, _generation, _expires_at
+    current = generation(PRODUCTS)
+    with _lock:
+        if _index is not None and _generation == current and _expires_at > time.monotonic():
+            return _index
+    index = {p.code: p for p in Product.objects.exclude(code=None).only(*INDEX_FIELDS)}
+    with _lock:
+        _index = index
+        _generation = current
+        _expires_at = time.monotonic() + getattr(settings, 'PRODUCT_CODE_INDEX_TIMEOUT', 300)
+    return index
+
+
+def get_by_code(code):
+    """Produto com o código, ou None. Cópia: o chamador pode alterá-la à vontade."""
+    product = _get_index().get(str(code).strip())
+    return copy.copy(product) if product is not None else None
+
+
+def parse_quick_entry(entry):
+    """'12 x3' -> ('12', 3); '12' -> ('12', 1). ValueError se o formato for inválido."""
+    match = QUICK_ENTRY_RE.match(entry or '')
+    if not match:
+        raise ValueError("Use o formato código ou código x quantidade (ex.: 12 x3).")
+    return match.group(1), int(match.group(2) or 1)
@@ -11,3 +11,13 @@ class ProductForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         for field in self.fields.values():
             field.widget.attrs.update({'class': 'input input-bordered w-full'})
+
+
+class StockReceiptLineForm(forms.Form):
+    """Quantidade e custo de uma linha de entrada, dentro dos limites das colunas."""
+
+    # Uma entrada por linha; acima disso é erro de digitação, não mercadoria
+    MAX_QUANTITY = 100_000
+
+    quantity = forms.IntegerField(min_value=1, max_value=MAX_QUANTITY)
+    unit_cost = forms.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from products.catalog import apply_import, plan_import
+
+
+class Command(BaseCommand):
+    help = 'Importa o catálogo de produtos de um CSV. Sem --apply, só mostra o diff.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--apply', action='store_true', help='Grava as alterações.')
+
+    def handle(self, *args, **options):
+        with open(options['path'], 'rb') as f:
+            plan = plan_import(f)
+
+        for line, message in plan.errors:
+            self.stdout.write(self.style.ERROR(f"linha {line}: {message}"))
+        for product in plan.creates:
+            self.stdout.write(f"+ {product.name}")
+        for product, changes in plan.updates:
+            diff = ', '.join(f"{field}: {old} -> {new}" for field, (old, new) in changes.items())
+            self.stdout.write(f"~ {product.name}: {diff}")
+        self.stdout.write(
+            f"{len(plan.creates)} novos, {len(plan.updates)} alterados, "
+            f"{plan.unchanged} sem alteração, {len(plan.errors)} erros"
+        )
+
+        if not plan.is_valid:
+            raise CommandError('Arquivo com erros; nada foi importado.')
+        if options['apply']:
+            apply_import(plan)
+            self.stdout.write(self.style.SUCCESS('Importação concluída.'))
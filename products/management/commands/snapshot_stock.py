@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from products.models import StockSnapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Registra um snapshot do estoque de todos os produtos. '
+        'Agende periodicamente (ex.: cron diário) para limitar a '
+        'quantidade de movimentações lidas em consultas históricas.'
+    )
+
+    def handle(self, *args, **options):
+        snapshots = StockSnapshot.take()
+        self.stdout.write(
+            self.style.SUCCESS(f'{len(snapshots)} snapshots de estoque registrados.')
+        )
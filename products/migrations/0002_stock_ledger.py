@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:33
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+        ('sales', '0005_sale_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(verbose_name='Variação')),
+                ('reason', models.CharField(choices=[('SI', 'Item de venda'), ('SR', 'Item removido da venda'), ('SF', 'Venda finalizada'), ('SC', 'Venda cancelada'), ('SO', 'Venda reaberta'), ('SD', 'Venda excluída'), ('AJ', 'Ajuste manual')], max_length=2, verbose_name='Motivo')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data da Movimentação')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='products.product', verbose_name='Produto')),
+                ('sale', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='sales.sale', verbose_name='Venda')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'created_at'], name='stockmove_product_date_idx'), models.Index(fields=['created_at'], name='stockmove_date_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(verbose_name='Quantidade')),
+                ('taken_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data do Snapshot')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='products.product', verbose_name='Produto')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'taken_at'], name='stocksnap_product_date_idx')],
+            },
+        ),
+    ]
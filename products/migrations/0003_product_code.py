@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:56
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='code',
+            field=models.CharField(blank=True, max_length=14, null=True, unique=True, validators=[django.core.validators.RegexValidator('^\\d+$', 'Use apenas números (código curto ou EAN).')], verbose_name='Código'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:02
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_code'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='reason',
+            field=models.CharField(choices=[('SI', 'Item de venda'), ('SR', 'Item removido da venda'), ('SF', 'Venda finalizada'), ('SC', 'Venda cancelada'), ('SO', 'Venda reaberta'), ('SD', 'Venda excluída'), ('AJ', 'Ajuste manual'), ('RC', 'Entrada de mercadoria')], max_length=2, verbose_name='Motivo'),
+        ),
+        migrations.CreateModel(
+            name='StockReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('supplier', models.CharField(blank=True, max_length=255, verbose_name='Fornecedor')),
+                ('note', models.CharField(blank=True, max_length=255, verbose_name='Observação')),
+                ('total_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Custo Total')),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Recebido em')),
+                ('received_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Recebido por')),
+            ],
+            options={
+                'ordering': ['-received_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockReceiptLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Quantidade')),
+                ('unit_cost', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Custo Unitário')),
+                ('previous_cost', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Custo Anterior')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='receipt_lines', to='products.product', verbose_name='Produto')),
+                ('receipt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='products.stockreceipt', verbose_name='Entrada')),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_stock_receipt'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['quantity', 'product_id'], name='product_quantity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['sale_price', 'product_id'], name='product_sale_price_idx'),
+        ),
+    ]
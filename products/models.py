@@ -1,4 +1,10 @@
-from django.db import models
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.validators import RegexValidator
+from django.db import models, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
 
 
 class Product(models.Model):
@@ -16,6 +22,14 @@ class Product(models.Model):
 
     product_id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=255, blank=False, verbose_name='Nome')
+    code = models.CharField(
+        max_length=14,
+        unique=True,
+        null=True,
+        blank=True,
+        validators=[RegexValidator(r'^\d+$', 'Use apenas números (código curto ou EAN).')],
+        verbose_name='Código',
+    )
     category = models.CharField(
         max_length=20,
         choices=Category.choices,
@@ -44,5 +58,308 @@ class Product(models.Model):
         auto_now=True, verbose_name='Data de Atualização'
     )
 
+    class Meta:
+        indexes = [
+            # Ordenações da tabela de produtos (ver products.views.TABLE_ORDERINGS)
+            models.Index(fields=['quantity', 'product_id'], name='product_quantity_idx'),
+            models.Index(fields=['sale_price', 'product_id'], name='product_sale_price_idx'),
+        ]
+
     def __str__(self):
         return self.name
+
+    def add_stock(self, quantity):
+        """Soma ao estoque com um UPDATE atômico, sem ler-modificar-gravar."""
+        Product.objects.filter(pk=self.pk).update(quantity=F('quantity') + quantity)
+        self.refresh_from_db(fields=['quantity'])
+
+    def take_stock(self, quantity, partial=False):
+        """Baixa `quantity` do estoque sem travar a linha; retorna quanto saiu.
+
+        Com estoque insuficiente levanta ValueError, ou com `partial=True`
+        baixa o que houver (compare-and-swap na quantidade lida).
+        """
+        while True:
+            if Product.objects.filter(pk=self.pk, quantity__gte=quantity)\
+                    .update(quantity=F('quantity') - quantity):
+                taken = quantity
+                break
+            available = Product.objects.filter(pk=self.pk).values_list('quantity', flat=True).get()
+            if available >= quantity:
+                continue
+            if not partial:
+                raise ValueError(
+                    f"Estoque insuficiente para {self.name} "
+                    f"({available} disponível, {quantity} solicitado)."
+                )
+            if available <= 0:
+                taken = 0
+                break
+            if Product.objects.filter(pk=self.pk, quantity=available).update(quantity=0):
+                taken = available
+                break
+        self.refresh_from_db(fields=['quantity'])
+        return taken
+
+    def stock_at(self, when):
+        """Estoque do produto em `when`: um snapshot + fatia de movimentos."""
+        before = self.stock_snapshots.filter(taken_at__lte=when)\
+            .order_by('-taken_at').first()
+        if before:
+            moved = self.stock_movements.filter(
+                created_at__gt=before.taken_at, created_at__lte=when
+            ).aggregate(total=Sum('quantity'))['total'] or 0
+            return before.quantity + moved
+
+        after = self.stock_snapshots.filter(taken_at__gt=when)\
+            .order_by('taken_at').first()
+        base, upper = (after.quantity, after.taken_at) if after else (self.quantity, None)
+        later = self.stock_movements.filter(created_at__gt=when)
+        if upper:
+            later = later.filter(created_at__lte=upper)
+        return base - (later.aggregate(total=Sum('quantity'))['total'] or 0)
+
+
+class StockMovementQuerySet(models.QuerySet):
+    def between(self, start, end):
+        return self.filter(created_at__gt=start, created_at__lte=end)
+
+    def net_by_product(self, start, end):
+        """{product_id: variação líquida} no intervalo (start, end]."""
+        rows = self.between(start, end).values('product')\
+            .annotate(total=Sum('quantity')).values_list('product', 'total')
+        return dict(rows)
+
+
+class StockMovement(models.Model):
+    """Registro imutável (append-only) de cada alteração em Product.quantity."""
+
+    class Reason(models.TextChoices):
+        SALE_ITEM = 'SI', 'Item de venda'
+        SALE_ITEM_REMOVED = 'SR', 'Item removido da venda'
+        SALE_FINALIZED = 'SF', 'Venda finalizada'
+        SALE_CANCELLED = 'SC', 'Venda cancelada'
+        SALE_REOPENED = 'SO', 'Venda reaberta'
+        SALE_DELETED = 'SD', 'Venda excluída'
+        ADJUSTMENT = 'AJ', 'Ajuste manual'
+        RECEIPT = 'RC', 'Entrada de mercadoria'
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_movements',
+        verbose_name='Produto',
+    )
+    quantity = models.IntegerField(verbose_name='Variação')
+    reason = models.CharField(
+        max_length=2, choices=Reason.choices, verbose_name='Motivo'
+    )
+    # Sem constraint: o histórico sobrevive à exclusão da venda.
+    sale = models.ForeignKey(
+        'sales.Sale',
+        null=True,
+        blank=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        verbose_name='Venda',
+    )
+    created_at = models.DateTimeField(
+        default=timezone.now, verbose_name='Data da Movimentação'
+    )
+
+    objects = StockMovementQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['product', 'created_at'], name='stockmove_product_date_idx'
+            ),
+            models.Index(fields=['created_at'], name='stockmove_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id}: {self.quantity:+d} ({self.get_reason_display()})'
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError('Movimentações de estoque não podem ser alteradas.')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError('Movimentações de estoque não podem ser excluídas.')
+
+    @classmethod
+    def record(cls, entries, reason, sale_id=None):
+        """Grava em lote. `entries` é um iterável de (product, variação)."""
+        now = timezone.now()
+        movements = [
+            cls(product=product, quantity=delta, reason=reason,
+                sale_id=sale_id, created_at=now)
+            for product, delta in entries
+            if delta
+        ]
+        return cls.objects.bulk_create(movements)
+
+
+class StockSnapshot(models.Model):
+    """Foto periódica do estoque de cada produto (ver snapshot_stock)."""
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_snapshots',
+        verbose_name='Produto',
+    )
+    quantity = models.IntegerField(verbose_name='Quantidade')
+    taken_at = models.DateTimeField(
+        default=timezone.now, verbose_name='Data do Snapshot'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['product', 'taken_at'], name='stocksnap_product_date_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id}: {self.quantity} em {self.taken_at:%d/%m/%Y %H:%M}'
+
+    @classmethod
+    def take(cls):
+        """Registra o estoque atual de todos os produtos em uma única query."""
+        now = timezone.now()
+        return cls.objects.bulk_create(
+            cls(product_id=pk, quantity=quantity, taken_at=now)
+            for pk, quantity in Product.objects.values_list('pk', 'quantity')
+        )
+
+
+# total_cost tem max_digits=14 e 2 casas decimais
+TOTAL_COST_LIMIT = Decimal('1e12')
+
+
+class StockReceipt(models.Model):
+    """Entrada de mercadoria: várias linhas aplicadas de uma vez ao estoque."""
+
+    supplier = models.CharField(max_length=255, blank=True, verbose_name='Fornecedor')
+    note = models.CharField(max_length=255, blank=True, verbose_name='Observação')
+    total_cost = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, verbose_name='Custo Total'
+    )
+    received_at = models.DateTimeField(default=timezone.now, verbose_name='Recebido em')
+    received_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        verbose_name='Recebido por',
+    )
+
+    class Meta:
+        ordering = ['-received_at']
+
+    def __str__(self):
+        return f'Entrada #{self.pk} - {self.received_at:%d/%m/%Y %H:%M}'
+
+    @staticmethod
+    def clean_line(product, quantity, unit_cost):
+        """Valida quantidade e custo (texto ou número) contra os limites das colunas."""
+        from .forms import StockReceiptLineForm
+
+        form = StockReceiptLineForm({'quantity': quantity, 'unit_cost': unit_cost})
+        if not form.is_valid():
+            if 'quantity' in form.errors:
+                raise ValueError(f"Quantidade inválida para {product.name}.")
+            raise ValueError(f"Custo inválido para {product.name}.")
+        return form.cleaned_data['quantity'], form.cleaned_data['unit_cost']
+
+    @classmethod
+    def parse_lines(cls, product_ids, quantities, costs):
+        """Converte listas paralelas (formulário ou JSON) em (produto, quantidade, custo ou None)."""
+        products = Product.objects.in_bulk([pid for pid in product_ids if str(pid).isdigit()])
+        lines = []
+        for product_id, quantity, cost in zip(product_ids, quantities, costs):
+            if not product_id and not quantity:
+                continue  # linha em branco
+            product = products.get(int(product_id)) if str(product_id).isdigit() else None
+            if product is None:
+                raise ValueError("Produto inválido.")
+            cost = str(cost if cost is not None else '').strip().replace(',', '.')
+            lines.append((product, *cls.clean_line(product, quantity, cost)))
+        return lines
+
+    @classmethod
+    def receive(cls, lines, user=None, supplier='', note=''):
+        """Aplica as linhas (produto, quantidade, novo custo ou None) ao estoque.
+
+        Tudo numa transação: o estoque sobe com F('quantity') + n (sem
+        sobrescrever baixas de vendas concorrentes), o custo é trocado
+        quando informado, e a entrada fica registrada com as linhas e as
+        movimentações do ledger. Quantidades e custos são validados antes
+        de qualquer escrita.
+        """
+        merged = {}
+        for product, quantity, unit_cost in lines:
+            quantity, unit_cost = cls.clean_line(product, quantity, unit_cost)
+            entry = merged.setdefault(product.pk, [product, 0, None])
+            entry[1] += quantity
+            if unit_cost is not None:
+                entry[2] = unit_cost
+        if not merged:
+            raise ValueError("Informe ao menos um produto.")
+        total_cost = Decimal('0.00')
+        for product, quantity, unit_cost in merged.values():
+            cls.clean_line(product, quantity, unit_cost)  # linhas repetidas somadas
+            total_cost += (unit_cost if unit_cost is not None else product.cost_price) * quantity
+        if total_cost >= TOTAL_COST_LIMIT:
+            raise ValueError("Custo total da entrada acima do limite.")
+
+        with transaction.atomic():
+            receipt = cls.objects.create(supplier=supplier, note=note, received_by=user)
+            receipt_lines = []
+            for product, quantity, unit_cost in merged.values():
+                receipt_lines.append(StockReceiptLine(
+                    receipt=receipt,
+                    product=product,
+                    quantity=quantity,
+                    unit_cost=unit_cost if unit_cost is not None else product.cost_price,
+                    previous_cost=product.cost_price,
+                ))
+                product.quantity = F('quantity') + quantity
+                product.cost_price = unit_cost if unit_cost is not None else F('cost_price')
+            StockReceiptLine.objects.bulk_create(receipt_lines)
+            products = [product for product, _, _ in merged.values()]
+            Product.objects.bulk_update(products, ['quantity', 'cost_price'])
+            StockMovement.record(
+                ((product, quantity) for product, quantity, _ in merged.values()),
+                StockMovement.Reason.RECEIPT,
+            )
+            receipt.total_cost = total_cost
+            receipt.save(update_fields=['total_cost'])
+
+        for product in products:
+            product.refresh_from_db(fields=['quantity', 'cost_price'])
+        # bulk_update não dispara sinais; o índice de códigos guarda o custo
+        from .codes import invalidate
+        invalidate()
+        return receipt
+
+
+class StockReceiptLine(models.Model):
+    receipt = models.ForeignKey(
+        StockReceipt, on_delete=models.CASCADE, related_name='lines', verbose_name='Entrada'
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.PROTECT, related_name='receipt_lines', verbose_name='Produto'
+    )
+    quantity = models.PositiveIntegerField(verbose_name='Quantidade')
+    unit_cost = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Custo Unitário')
+    previous_cost = models.DecimalField(
+        max_digits=10, decimal_places=2, verbose_name='Custo Anterior'
+    )
+
+    def __str__(self):
+        return f'{self.product} +{self.quantity}'
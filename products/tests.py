@@ -1,3 +1,372 @@
-from django.test import TestCase
+import io
+import os
+import re
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.cache import PRODUCTS, bump, generation
+from .catalog import apply_import, plan_import
+from .codes import get_by_code, parse_quick_entry
+from .models import Product, StockMovement, StockReceipt, StockSnapshot
+from .views import IMPORT_DIR, IMPORT_FILE_TTL, MAX_TABLE_PAGE, TABLE_PAGE_SIZE
+
+
+class StockReceiptParseTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name='Cerveja', sale_price=10, cost_price=4)
+
+    def test_cost_accepts_decimal_comma(self):
+        [(product, quantity, cost)] = StockReceipt.parse_lines([str(self.product.pk)], ['12'], ['3,50'])
+        self.assertEqual((product, quantity, str(cost)), (self.product, 12, '3.50'))
+
+    def test_non_finite_cost_is_rejected(self):
+        for cost in ('NaN', 'sNaN', 'Infinity', '-inf'):
+            with self.subTest(cost=cost), self.assertRaisesMessage(ValueError, 'Custo inválido para Cerveja.'):
+                StockReceipt.parse_lines([str(self.product.pk)], ['1'], [cost])
+
+    def test_values_outside_the_column_limits_are_rejected(self):
+        pk = str(self.product.pk)
+        with self.assertRaisesMessage(ValueError, 'Custo inválido para Cerveja.'):
+            StockReceipt.parse_lines([pk], ['1'], ['1e15'])
+        for quantity in ('0', '-3', str(10 ** 19), '2.5'):
+            with self.subTest(quantity=quantity), \
+                    self.assertRaisesMessage(ValueError, 'Quantidade inválida para Cerveja.'):
+                StockReceipt.parse_lines([pk], [quantity], [''])
+
+
+class StockReceiptReceiveTests(TestCase):
+    def setUp(self):
+        self.beer = Product.objects.create(name='Cerveja', sale_price=10, cost_price=4, quantity=5)
+        self.soda = Product.objects.create(name='Refrigerante', sale_price=6, cost_price=2, quantity=0)
+
+    def test_receive_updates_stock_cost_and_ledger(self):
+        receipt = StockReceipt.receive([
+            (self.beer, 10, Decimal('4.50')),
+            (self.soda, 6, None),
+            (self.beer, 2, None),  # linha repetida soma na mesma entrada
+        ], supplier='Distribuidora')
+
+        self.assertEqual((self.beer.quantity, self.beer.cost_price), (17, Decimal('4.50')))
+        self.assertEqual((self.soda.quantity, self.soda.cost_price), (6, Decimal('2.00')))
+        self.assertEqual(receipt.total_cost, Decimal('66.00'))
+        line = receipt.lines.get(product=self.beer)
+        self.assertEqual((line.quantity, line.previous_cost), (12, Decimal('4.00')))
+        self.assertEqual(
+            dict(StockMovement.objects.filter(reason=StockMovement.Reason.RECEIPT)
+                 .values_list('product', 'quantity')),
+            {self.beer.pk: 12, self.soda.pk: 6},
+        )
+
+    def test_invalid_lines_write_nothing(self):
+        for lines in (
+            [(self.soda, 1, Decimal('2')), (self.beer, 10 ** 19, None)],
+            [(self.soda, 1, Decimal('2')), (self.beer, 1, Decimal('1e15'))],
+            [(self.beer, 1, Decimal('NaN'))],
+            [(self.beer, 60_000, None), (self.beer, 60_000, None)],
+            [(self.beer, 100_000, Decimal('99999999.99')), (self.soda, 100_000, Decimal('99999999.99'))],
+        ):
+            with self.subTest(lines=lines), self.assertRaises(ValueError):
+                StockReceipt.receive(lines)
+
+        self.assertFalse(StockReceipt.objects.exists())
+        self.assertFalse(StockMovement.objects.exists())
+        self.beer.refresh_from_db()
+        self.assertEqual((self.beer.quantity, self.beer.cost_price), (5, Decimal('4.00')))
+
+
+class StockHistoryTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now().replace(microsecond=0)
+        # Snapshot de 10 em `now`; depois -3 e +5, chegando aos 12 atuais
+        self.beer = Product.objects.create(name='Cerveja', sale_price=5, cost_price=3, quantity=12)
+        StockSnapshot.objects.create(product=self.beer, quantity=10, taken_at=self.now)
+        self._move(self.beer, 5, hours=-2)
+        self._move(self.beer, -3, hours=1)
+        self._move(self.beer, 5, hours=2)
+        # Sem snapshot: reconstruído para trás a partir do estoque atual
+        self.soda = Product.objects.create(name='Guaraná', sale_price=6, cost_price=2, quantity=4)
+        self._move(self.soda, 6, hours=-1)
+        self._move(self.soda, -2, hours=1)
+
+    def _move(self, product, quantity, hours):
+        StockMovement.objects.create(
+            product=product, quantity=quantity, reason=StockMovement.Reason.ADJUSTMENT,
+            created_at=self.now + timedelta(hours=hours),
+        )
+
+    def test_forward_from_the_last_snapshot(self):
+        self.assertEqual(self.beer.stock_at(self.now), 10)
+        self.assertEqual(self.beer.stock_at(self.now + timedelta(minutes=90)), 7)
+        self.assertEqual(self.beer.stock_at(self.now + timedelta(hours=3)), 12)
+
+    def test_backward_from_the_next_snapshot(self):
+        self.assertEqual(self.beer.stock_at(self.now - timedelta(hours=1)), 10)
+        self.assertEqual(self.beer.stock_at(self.now - timedelta(hours=3)), 5)
+
+    def test_backward_from_current_stock_without_snapshots(self):
+        self.assertEqual(self.soda.stock_at(self.now), 6)
+        self.assertEqual(self.soda.stock_at(self.now - timedelta(hours=2)), 0)
+        self.assertEqual(self.soda.stock_at(self.now + timedelta(hours=2)), 4)
+
+    def test_net_by_product_excludes_start_and_includes_end(self):
+        net = StockMovement.objects.net_by_product
+        self.assertEqual(
+            net(self.now - timedelta(hours=3), self.now + timedelta(hours=2)),
+            {self.beer.pk: 7, self.soda.pk: 4},
+        )
+        self.assertEqual(
+            net(self.now - timedelta(hours=2), self.now + timedelta(hours=1)),
+            {self.beer.pk: -3, self.soda.pk: 4},
+        )
+        self.assertEqual(net(self.now + timedelta(hours=2), self.now + timedelta(hours=3)), {})
+
+    def test_snapshot_records_current_stock_of_every_product(self):
+        snapshots = StockSnapshot.take()
+        self.assertEqual({(s.product_id, s.quantity) for s in snapshots}, {(self.beer.pk, 12), (self.soda.pk, 4)})
+        self.assertEqual(self.soda.stock_at(timezone.now()), 4)
+
+
+class ProductCacheGenerationTests(TestCase):
+    def test_save_bumps_generation_after_commit(self):
+        before = generation(PRODUCTS)
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name='Cerveja', sale_price=10, cost_price=4)
+            self.assertEqual(generation(PRODUCTS), before)
+        self.assertGreater(generation(PRODUCTS), before)
+
+    def test_bump_writes_a_new_generation_without_incr(self):
+        before = generation(PRODUCTS)
+        with patch.object(cache, 'incr', side_effect=AssertionError('incr não é atômico')), \
+                patch('core.cache.time.time_ns', return_value=0):
+            bump(PRODUCTS)
+            bump(PRODUCTS)
+        self.assertEqual(generation(PRODUCTS), before + 2)
+
+    def test_bump_uses_the_clock_when_it_is_ahead(self):
+        before = generation(PRODUCTS)
+        with patch('core.cache.time.time_ns', return_value=(before + 1000) * 1000):
+            bump(PRODUCTS)
+        self.assertEqual(generation(PRODUCTS), before + 1000)
+
+    def test_tests_run_on_a_local_memory_cache(self):
+        self.assertEqual(settings.CACHES['default']['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+
+
+class QuickEntryTests(TestCase):
+    def test_code_with_quantity(self):
+        self.assertEqual(parse_quick_entry('12 x3'), ('12', 3))
+        self.assertEqual(parse_quick_entry('12*3'), ('12', 3))
+        self.assertEqual(parse_quick_entry(' 12 X 3 '), ('12', 3))
+
+    def test_code_alone_is_one_unit(self):
+        self.assertEqual(parse_quick_entry('12'), ('12', 1))
+
+    def test_garbage_is_rejected(self):
+        for entry in ('', None, 'cerveja', '12 x', 'x3', '12 x3 x4', '12 x-1'):
+            with self.subTest(entry=entry), self.assertRaises(ValueError):
+                parse_quick_entry(entry)
+
+
+class ProductCodeIndexTests(TestCase):
+    def setUp(self):
+        self.beer = Product.objects.create(name='Cerveja', code='12', sale_price=5, cost_price=3)
+
+    def test_lookup_returns_a_copy(self):
+        product = get_by_code(' 12 ')
+        self.assertEqual(product.pk, self.beer.pk)
+        product.name = 'Alterado'
+        self.assertEqual(get_by_code('12').name, 'Cerveja')
+        self.assertIsNone(get_by_code('99'))
+
+    def test_saving_a_product_rebuilds_the_index(self):
+        self.assertIsNotNone(get_by_code('12'))
+        self.beer.code = '13'
+        self.beer.save()
+
+        self.assertIsNone(get_by_code('12'))
+        self.assertEqual(get_by_code('13').pk, self.beer.pk)
+
+    def test_generation_bump_from_another_worker_rebuilds_the_index(self):
+        self.assertIsNotNone(get_by_code('12'))
+        # update() não dispara sinais: só a geração compartilhada avisa o índice
+        Product.objects.filter(pk=self.beer.pk).update(code='13')
+        self.assertIsNotNone(get_by_code('12'))
+
+        bump(PRODUCTS)
+        self.assertIsNone(get_by_code('12'))
+        self.assertEqual(get_by_code('13').pk, self.beer.pk)
+
+
+def _csv(*rows, encoding='utf-8'):
+    header = 'code,name,category,sale_price,cost_price,quantity'
+    return io.BytesIO('\n'.join([header, *rows]).encode(encoding))
+
+
+class CatalogImportTests(TestCase):
+    def setUp(self):
+        self.beer = Product.objects.create(
+            name='Cerveja Lata', code='12', category='CE', sale_price=5, cost_price=3, quantity=10
+        )
+        self.soda = Product.objects.create(name='Guaraná', sale_price=6, cost_price=2, quantity=4)
+
+    def test_plan_matches_by_code_then_name(self):
+        plan = plan_import(_csv(
+            '12,Cerveja Long Neck,Cerveja,5,3,10',   # pelo código, renomeada
+            ',Guaraná,RE,"6,50",2,',                  # pelo nome; quantidade vazia mantém o estoque
+            '30,Amendoim,Petiscos,4,1,20',           # novo
+        ))
+
+        self.assertTrue(plan.is_valid)
+        self.assertEqual(plan.summary, {'created': 1, 'updated': 2, 'unchanged': 0, 'errors': 0})
+        updates = dict(plan.updates)
+        self.assertEqual(updates[self.beer], {'name': ('Cerveja Lata', 'Cerveja Long Neck')})
+        self.assertEqual(
+            updates[self.soda],
+            {'sale_price': (Decimal('6.00'), Decimal('6.50')), 'category': ('SC', 'RE')},
+        )
+        self.assertEqual(plan.creates[0].category, 'PE')
+
+    def test_duplicates_and_taken_codes_are_errors(self):
+        plan = plan_import(_csv(
+            '12,Cerveja Lata,CE,5,3,10',
+            '12,Outra Cerveja,CE,5,3,10',     # código repetido no arquivo
+            ',Cerveja Lata,CE,5,3,10',        # mesmo produto pelo nome
+            '12,Guaraná,RE,6,2,4',            # código de outro produto
+            '40,Pipoca,PE,3,1,1',
+            '41,pipoca,PE,3,1,1',             # produto novo repetido
+            ',Sem preço,PE,,1,1',
+        ))
+
+        self.assertEqual([line for line, _ in plan.errors], [3, 4, 5, 7, 8])
+        with self.assertRaises(ValueError):
+            apply_import(plan)
+
+    def test_apply_adds_stock_delta_over_concurrent_sales(self):
+        plan = plan_import(_csv('12,Cerveja Lata,CE,5,3,25'))
+        # Venda depois da leitura do arquivo: a importação soma a diferença (+15)
+        Product.objects.filter(pk=self.beer.pk).update(quantity=8)
+
+        self.assertEqual(apply_import(plan)['updated'], 1)
+        self.beer.refresh_from_db()
+        self.assertEqual(self.beer.quantity, 23)
+        self.assertEqual(
+            list(StockMovement.objects.values_list('product', 'quantity', 'reason')),
+            [(self.beer.pk, 15, StockMovement.Reason.ADJUSTMENT)],
+        )
+
+    def test_cp1252_file_is_decoded(self):
+        plan = plan_import(_csv(',Pão de Queijo,Alimentos,"7,50",3,5', encoding='cp1252'))
+        self.assertTrue(plan.is_valid)
+        self.assertEqual(plan.creates[0].name, 'Pão de Queijo')
+
+    def test_unreadable_files_are_plan_errors(self):
+        self.assertFalse(plan_import(io.BytesIO(b'name,sale_price,cost_price\n\x81\x8d,1,1\n')).is_valid)
+        plan = plan_import(_csv(f',{"x" * 200_000},CE,5,3,10'))  # campo acima do limite do csv
+        self.assertFalse(plan.is_valid)
+        self.assertIn('CSV inválido', plan.errors[0][1])
+
+
+class ProductImportViewTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.client.force_login(User.objects.create_user('gerente', password='x'))
+
+    def test_upload_then_confirm(self):
+        upload = SimpleUploadedFile('catalogo.csv', _csv(',Água,SC,3,1,12').getvalue())
+        response = self.client.post('/products/import/', {'file': upload})
+        token = response.context['token']
+        self.assertFalse(Product.objects.exists())
+
+        self.client.post('/products/import/', {'token': token})
+        self.assertEqual(Product.objects.get().quantity, 12)
+        self.assertFalse(default_storage.exists(f'{IMPORT_DIR}/{token}.csv'))
+
+    def test_unconfirmed_uploads_are_pruned(self):
+        stale = default_storage.save(f'{IMPORT_DIR}/{"a" * 32}.csv', ContentFile(b'x'))
+        fresh = default_storage.save(f'{IMPORT_DIR}/{"b" * 32}.csv', ContentFile(b'x'))
+        old = (timezone.now() - IMPORT_FILE_TTL - timedelta(minutes=1)).timestamp()
+        os.utime(default_storage.path(stale), (old, old))
+
+        upload = SimpleUploadedFile('catalogo.csv', _csv(',Água,SC,3,1,12').getvalue())
+        self.client.post('/products/import/', {'file': upload})
+
+        self.assertFalse(default_storage.exists(stale))
+        self.assertTrue(default_storage.exists(fresh))
+
+
+class ProductTableViewTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('gerente', password='x'))
+
+    def _rows(self, response):
+        return [int(pk) for pk in re.findall(r'id="product-row-(\d+)"', response.content.decode())]
+
+    def test_pages_have_fixed_size_and_a_next_page_sentinel(self):
+        Product.objects.bulk_create(
+            Product(name=f'Produto {i}', sale_price=5, cost_price=3) for i in range(TABLE_PAGE_SIZE + 1)
+        )
+        first = self.client.get('/products/search/')
+        self.assertTemplateUsed(first, 'partials/_product_table.html')
+        self.assertEqual(len(self._rows(first)), TABLE_PAGE_SIZE)
+        self.assertEqual(first.context['next_page'], 2)
+        self.assertContains(first, 'page=2')
+
+        second = self.client.get('/products/search/', {'page': 2})
+        self.assertTemplateUsed(second, 'partials/_product_rows.html')
+        self.assertEqual(len(self._rows(second)), 1)
+        self.assertIsNone(second.context['next_page'])
+        self.assertNotContains(second, 'hx-trigger="revealed"')
+
+    def test_huge_or_invalid_pages_are_empty(self):
+        Product.objects.create(name='Cerveja', sale_price=5, cost_price=3)
+        for page in ('99999999999999999999', str(MAX_TABLE_PAGE + 1)):
+            with self.subTest(page=page):
+                response = self.client.get('/products/search/', {'page': page})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(self._rows(response), [])
+                self.assertIsNone(response.context['next_page'])
+        self.assertEqual(len(self._rows(self.client.get('/products/search/', {'page': 'x'}))), 1)
+
+    def test_filters_order_by_column_then_pk(self):
+        a = Product.objects.create(name='A', sale_price=8, cost_price=3, quantity=5)
+        b = Product.objects.create(name='B', sale_price=4, cost_price=3, quantity=5)
+        c = Product.objects.create(name='C', sale_price=6, cost_price=3, quantity=1)
+        expected = {
+            '': [a.pk, b.pk, c.pk],
+            'estoque_baixo': [c.pk, a.pk, b.pk],
+            'estoque_alto': [b.pk, a.pk, c.pk],
+            'maior_preco': [a.pk, c.pk, b.pk],
+            'menor_preco': [b.pk, c.pk, a.pk],
+            'desconhecido': [a.pk, b.pk, c.pk],
+        }
+        for name, pks in expected.items():
+            with self.subTest(filter=name):
+                self.assertEqual(self._rows(self.client.get('/products/search/', {'filter': name})), pks)
+
+    def test_htmx_delete_replaces_only_the_row(self):
+        product = Product.objects.create(name='Cerveja', sale_price=5, cost_price=3)
+        response = self.client.post(f'/products/delete/{product.pk}/', HTTP_HX_REQUEST='true')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'product-row')
+        self.assertContains(response, 'hx-swap-oob="true"')
+        self.assertFalse(Product.objects.exists())
+
+    def test_plain_delete_redirects(self):
+        product = Product.objects.create(name='Cerveja', sale_price=5, cost_price=3)
+        response = self.client.post(f'/products/delete/{product.pk}/')
+        self.assertRedirects(response, '/products/', fetch_redirect_response=False)
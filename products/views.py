@@ -1,10 +1,38 @@
+import re
+import uuid
+from datetime import timedelta
+
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.views.generic import ListView, CreateView, DeleteView, UpdateView
-from products.models import Product
+from products.models import Product, StockMovement, StockReceipt
 from products.forms import ProductForm
-from django.http import HttpRequest
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.http import HttpRequest, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils import timezone
+from products.catalog import apply_import, export_rows, plan_import
+from dashboard.replica import reporting_db
+
+IMPORT_DIR = 'product_imports'
+IMPORT_TOKEN_RE = re.compile(r'^[0-9a-f]{32}$')
+# Arquivo enviado e não confirmado é apagado no próximo envio depois deste tempo
+IMPORT_FILE_TTL = timedelta(hours=1)
+
+# Tabela de produtos: páginas de tamanho fixo e só as colunas exibidas
+TABLE_PAGE_SIZE = 50
+# Teto da paginação: páginas além disso voltam vazias (e o OFFSET não estoura)
+MAX_TABLE_PAGE = 10_000
+TABLE_FIELDS = ('product_id', 'code', 'name', 'sale_price', 'category', 'quantity')
+# Cada filtro ordena por (coluna, pk), coberto por um índice em Product.Meta
+TABLE_ORDERINGS = {
+    '': ('product_id',),
+    'estoque_baixo': ('quantity', 'product_id'),
+    'estoque_alto': ('-quantity', '-product_id'),
+    'maior_preco': ('-sale_price', '-product_id'),
+    'menor_preco': ('sale_price', 'product_id'),
+}
 
 
 class ProductListView(LoginRequiredMixin, ListView):
@@ -24,6 +52,14 @@ class ProductCreateView(LoginRequiredMixin, CreateView):
     template_name = 'product_form.html'
     success_url = '/products/'
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        StockMovement.record(
+            [(self.object, self.object.quantity)],
+            StockMovement.Reason.ADJUSTMENT,
+        )
+        return response
+
 
 class ProductUpdateView(LoginRequiredMixin, UpdateView):
     model = Product
@@ -31,6 +67,15 @@ class ProductUpdateView(LoginRequiredMixin, UpdateView):
     template_name = 'product_update.html'
     success_url = '/products/'
 
+    def form_valid(self, form):
+        previous = form.initial.get('quantity') or 0
+        response = super().form_valid(form)
+        StockMovement.record(
+            [(self.object, self.object.quantity - previous)],
+            StockMovement.Reason.ADJUSTMENT,
+        )
+        return response
+
 
 class ProductDeleteView(LoginRequiredMixin, DeleteView):
     model = Product
@@ -42,32 +87,118 @@ class ProductDeleteView(LoginRequiredMixin, DeleteView):
         self.object = self.get_object()
         return render(request, self.template_name, {'object': self.object})
 
-    def delete(self, request, *args, **kwargs):
-        """Exclui e atualiza a tabela via HTMX"""
-        self.object = self.get_object()
+    def form_valid(self, form):
+        """Via HTMX remove só a linha do produto (a resposta vazia substitui o <tr>)"""
+        if not self.request.headers.get('HX-Request'):
+            return super().form_valid(form)
         self.object.delete()
-        products = Product.objects.all()
-        return render(request, 'partials/_product_table.html', {'products': products})
+        return HttpResponse('<div id="modal-container" hx-swap-oob="true"></div>')
+
 
 @login_required
 def search_products(request: HttpRequest):
+    """Uma página da tabela; páginas seguintes trazem só as linhas (scroll infinito)"""
     search = request.GET.get('search', '')
-    filter_option = request.GET.get('filter', '')
-
-    products = Product.objects.all()
+    ordering = TABLE_ORDERINGS.get(request.GET.get('filter', ''), TABLE_ORDERINGS[''])
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
 
+    products = Product.objects.only(*TABLE_FIELDS).order_by(*ordering)
     if search:
-        products = products.filter(name__icontains=search)
+        products = products.filter(Q(name__icontains=search) | Q(code=search))
 
-    if filter_option == 'estoque_baixo':
-        products = products.order_by('quantity')
-    elif filter_option == 'estoque_alto':
-        products = products.order_by('-quantity')
-    elif filter_option == 'maior_preco':
-        products = products.order_by('-sale_price')
-    elif filter_option == 'menor_preco':
-        products = products.order_by('sale_price')
+    # Uma linha a mais diz se há próxima página, sem COUNT(*)
+    offset = (page - 1) * TABLE_PAGE_SIZE
+    rows = list(products[offset:offset + TABLE_PAGE_SIZE + 1]) if page <= MAX_TABLE_PAGE else []
+    context = {
+        'products': rows[:TABLE_PAGE_SIZE],
+        'page': page,
+        'next_page': page + 1 if len(rows) > TABLE_PAGE_SIZE and page < MAX_TABLE_PAGE else None,
+    }
+    template = 'partials/_product_rows.html' if page > 1 else 'partials/_product_table.html'
+    return render(request, template, context)
 
-    context = {'products': products}
 
-    return render(request, 'partials/_product_table.html', context)
+@login_required
+def product_export(request: HttpRequest):
+    """Exporta o catálogo em CSV, gerado em streaming"""
+    # O gerador roda depois que a view retorna, então o alias vai explícito
+    response = StreamingHttpResponse(export_rows(using=reporting_db()), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="produtos_{timezone.localdate():%Y%m%d}.csv"'
+    return response
+
+
+def _prune_import_files():
+    """Apaga os CSVs de importações que nunca foram confirmadas."""
+    if not default_storage.exists(IMPORT_DIR):
+        return
+    cutoff = timezone.now() - IMPORT_FILE_TTL
+    for name in default_storage.listdir(IMPORT_DIR)[1]:
+        path = f'{IMPORT_DIR}/{name}'
+        if default_storage.get_modified_time(path) < cutoff:
+            default_storage.delete(path)
+
+
+@login_required
+def product_import(request: HttpRequest):
+    """Importação em dois passos: envio do CSV mostra o diff; 'apply' grava"""
+    context = {'section_name': 'Importar Produtos'}
+    if request.method != 'POST':
+        return render(request, 'product_import.html', context)
+
+    token = request.POST.get('token', '')
+    if token:
+        # Segundo passo: recalcula o plano com o arquivo guardado e aplica
+        path = f'{IMPORT_DIR}/{token}.csv'
+        if not IMPORT_TOKEN_RE.match(token) or not default_storage.exists(path):
+            return HttpResponseBadRequest("Importação expirada; envie o arquivo novamente.")
+        with default_storage.open(path, 'rb') as f:
+            plan = plan_import(f)
+        if plan.is_valid:
+            context['applied'] = apply_import(plan)
+            default_storage.delete(path)
+        context['plan'] = plan
+        return render(request, 'product_import.html', context)
+
+    upload = request.FILES.get('file')
+    if upload is None:
+        context['error'] = 'Selecione um arquivo CSV.'
+        return render(request, 'product_import.html', context)
+    _prune_import_files()
+    plan = plan_import(upload.file)
+    context['plan'] = plan
+    if plan.is_valid and (plan.creates or plan.updates):
+        upload.seek(0)
+        context['token'] = uuid.uuid4().hex
+        default_storage.save(f"{IMPORT_DIR}/{context['token']}.csv", upload)
+    return render(request, 'product_import.html', context)
+
+
+@login_required
+def stock_receive(request: HttpRequest):
+    """Entrada de mercadoria: várias linhas aplicadas ao estoque de uma vez"""
+    context = {
+        'section_name': 'Entrada de Mercadoria',
+        'products': Product.objects.order_by('name').only('product_id', 'name', 'code', 'cost_price'),
+        'receipts': StockReceipt.objects.select_related('received_by')[:10],
+    }
+    if request.method == 'POST':
+        try:
+            lines = StockReceipt.parse_lines(
+                request.POST.getlist('product_id'),
+                request.POST.getlist('quantity'),
+                request.POST.getlist('unit_cost'),
+            )
+            receipt = StockReceipt.receive(
+                lines,
+                user=request.user,
+                supplier=request.POST.get('supplier', '').strip(),
+                note=request.POST.get('note', '').strip(),
+            )
+        except ValueError as e:
+            context['error'] = str(e)
+            return render(request, 'stock_receive.html', context, status=400)
+        context['receipt'] = receipt
+    return render(request, 'stock_receive.html', context)
@@ -1,10 +1,15 @@
+from decimal import Decimal
 from django.contrib import admin
-from .models import Sale, SaleItem, Payment
+from .models import DailyClosing, Sale, SaleHourRollup, SaleItem, SaleRollup, Payment
 
 class SaleItemInline(admin.TabularInline):
     model = SaleItem
     extra = 0
-    readonly_fields = ('price',)
+    readonly_fields = ('price', 'cost_price')
+    raw_id_fields = ('product',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
 
 class PaymentInline(admin.TabularInline):
     model = Payment
@@ -13,10 +18,62 @@ class PaymentInline(admin.TabularInline):
 
 @admin.register(Sale)
 class SaleAdmin(admin.ModelAdmin):
-    list_display = ('id', 'get_client', 'status', 'total', 'paid_amount', 'balance', 'created_at')
+    list_display = ('id', 'get_client', 'status', 'get_total', 'get_paid_amount', 'get_balance', 'created_at')
+    list_select_related = ('client',)
+    list_filter = ('status',)
+    date_hierarchy = 'created_at'
     inlines = [SaleItemInline, PaymentInline]
     readonly_fields = ('created_at', 'updated_at')
+    raw_id_fields = ('client',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_totals()
 
     def get_client(self, obj):
         return obj.get_client_display()
     get_client.short_description = 'Cliente'
+
+    def get_total(self, obj):
+        return obj.total_amount
+    get_total.short_description = 'Total'
+    get_total.admin_order_field = 'total_amount'
+
+    def get_paid_amount(self, obj):
+        return obj.paid_total
+    get_paid_amount.short_description = 'Pago'
+    get_paid_amount.admin_order_field = 'paid_total'
+
+    def get_balance(self, obj):
+        return (obj.total_amount - obj.paid_total).quantize(Decimal('0.01'))
+    get_balance.short_description = 'Saldo'
+
+
+@admin.register(DailyClosing)
+class DailyClosingAdmin(admin.ModelAdmin):
+    list_display = ('business_date', 'payments_total', 'revenue', 'units_sold', 'open_balance', 'cancelled_count', 'closed_by')
+    date_hierarchy = 'business_date'
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SaleRollup)
+class SaleRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'product_name', 'category', 'units', 'revenue', 'cost')
+    list_filter = ('category',)
+    date_hierarchy = 'day'
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SaleHourRollup)
+class SaleHourRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'hour', 'sales', 'revenue')
+    date_hierarchy = 'day'
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class SalesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'sales'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from core.cache import SALES, bump_on_commit
+        from .models import Payment, Sale, SaleItem
+
+        def _invalidate(sender, **kwargs):
+            bump_on_commit(SALES)
+
+        for model in (Sale, SaleItem, Payment):
+            name = model._meta.model_name
+            post_save.connect(_invalidate, sender=model, dispatch_uid=f'sales_cache_{name}_save')
+            post_delete.connect(_invalidate, sender=model, dispatch_uid=f'sales_cache_{name}_delete')
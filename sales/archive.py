@@ -0,0 +1,169 @@
+"""Arquivamento de vendas fechadas em arquivos JSONL comprimidos.
+
+Vendas finalizadas ou canceladas mais antigas que o horizonte configurado
+saem das tabelas quentes e vão para arquivos particionados por dia em
+SALES_ARCHIVE_DIR/sales/AAAA/MM/AAAA-MM-DD-<lote>.jsonl.gz. As vendas
+finalizadas também são somadas nos rollups que os relatórios leem para os
+períodos arquivados, sem abrir os arquivos:
+
+- relatório de vendas, comparação de períodos, lucratividade e previsão de
+  reposição: SaleRollup (totais por dia e produto);
+- heatmap: SaleHourRollup (vendas e receita por dia e hora local).
+
+O fechamento de caixa (DailyClosing.compute) lê só as tabelas quentes: o
+relatório Z é gravado quando o dia é fechado, muito antes do arquivamento.
+"""
+import gzip
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Sale, SaleHourRollup, SaleRollup
+
+
+def archive_root():
+    return Path(settings.SALES_ARCHIVE_DIR) / 'sales'
+
+
+def _partition_path(day, batch):
+    return archive_root() / f'{day:%Y}' / f'{day:%m}' / f'{day:%Y-%m-%d}-{batch}.jsonl.gz'
+
+
+def _sale_record(sale):
+    return {
+        'id': sale.pk,
+        'status': sale.status,
+        'client_id': sale.client_id,
+        'client_name': sale.get_client_display(),
+        'created_at': sale.created_at.isoformat(),
+        'updated_at': sale.updated_at.isoformat(),
+        'items': [
+            {
+                'product_id': item.product_id,
+                'product_name': item.product.name,
+                'category': item.product.category,
+                'quantity': item.quantity,
+                'price': str(item.price),
+                'cost_price': str(item.cost_price),
+            }
+            for item in sale.items.all()
+        ],
+        'payments': [
+            {
+                'amount': str(payment.amount),
+                'method': payment.method,
+                'note': payment.note,
+                'created_at': payment.created_at.isoformat(),
+            }
+            for payment in sale.payments.all()
+        ],
+    }
+
+
+def _add_rollups(records):
+    totals = defaultdict(lambda: {'units': 0, 'revenue': Decimal('0'), 'cost': Decimal('0')})
+    hours = defaultdict(lambda: {'sales': 0, 'revenue': Decimal('0')})
+    for day, record in records:
+        if record['status'] != Sale.STATUS_FINALIZED:
+            continue
+        hour = hours[(day, timezone.localtime(datetime.fromisoformat(record['created_at'])).hour)]
+        hour['sales'] += 1
+        for item in record['items']:
+            key = (day, item['product_id'])
+            totals[key]['product_name'] = item['product_name']
+            totals[key]['category'] = item['category']
+            totals[key]['units'] += item['quantity']
+            totals[key]['revenue'] += Decimal(item['price']) * item['quantity']
+            totals[key]['cost'] += Decimal(item['cost_price']) * item['quantity']
+            hour['revenue'] += Decimal(item['price']) * item['quantity']
+
+    for (day, product_id), values in totals.items():
+        updated = SaleRollup.objects.filter(day=day, product_id=product_id).update(
+            units=F('units') + values['units'],
+            revenue=F('revenue') + values['revenue'],
+            cost=F('cost') + values['cost'],
+        )
+        if not updated:
+            SaleRollup.objects.create(day=day, product_id=product_id, **values)
+
+    for (day, hour), values in hours.items():
+        updated = SaleHourRollup.objects.filter(day=day, hour=hour).update(
+            sales=F('sales') + values['sales'],
+            revenue=F('revenue') + values['revenue'],
+        )
+        if not updated:
+            SaleHourRollup.objects.create(day=day, hour=hour, **values)
+
+
+def _write_partitions(records, batch):
+    """Grava em arquivos .tmp; só viram definitivos depois do commit."""
+    by_day = defaultdict(list)
+    for day, record in records:
+        by_day[day].append(record)
+    written = []
+    for day, day_records in by_day.items():
+        path = _partition_path(day, batch)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            for record in day_records:
+                f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        written.append((tmp_path, path))
+    return written
+
+
+def archive_sales(older_than_days=None, chunk_size=500, dry_run=False):
+    """Move vendas fechadas antigas para o arquivo frio. Retorna quantas foram movidas."""
+    if older_than_days is None:
+        older_than_days = settings.SALES_ARCHIVE_AFTER_DAYS
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    closed = Sale.objects.filter(
+        status__in=[Sale.STATUS_FINALIZED, Sale.STATUS_CANCELLED],
+        created_at__lt=cutoff,
+    )
+    if dry_run:
+        return closed.count()
+
+    batch = timezone.now().strftime('%Y%m%d%H%M%S%f')
+    archived = 0
+    while True:
+        with transaction.atomic():
+            sales = list(
+                closed.select_related('client')
+                .prefetch_related('items__product', 'payments')
+                .order_by('pk')[:chunk_size]
+            )
+            if not sales:
+                break
+            records = [
+                (timezone.localtime(sale.created_at).date(), _sale_record(sale))
+                for sale in sales
+            ]
+            written = _write_partitions(records, f'{batch}-{archived}')
+            transaction.on_commit(lambda w=written: [os.replace(tmp, final) for tmp, final in w])
+            try:
+                _add_rollups(records)
+                Sale.objects.filter(pk__in=[sale.pk for sale in sales]).delete()
+            except Exception:
+                for tmp_path, _ in written:
+                    tmp_path.unlink(missing_ok=True)
+                raise
+        archived += len(sales)
+    return archived
+
+
+def rollups_between(start_date, end_date):
+    """SaleRollup dos dias locais cobertos pelo intervalo [start_date, end_date]."""
+    return SaleRollup.objects.filter(
+        day__gte=timezone.localtime(start_date).date(),
+        day__lte=timezone.localtime(end_date).date(),
+    )
+
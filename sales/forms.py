@@ -1,13 +1,11 @@
+from decimal import Decimal
+
 from django import forms
-from .models import Sale, SaleItem
-
-class SaleForm(forms.ModelForm):
-    class Meta:
-        model = Sale
-        fields = ['subtotal']  
-
-    
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        for field in self.fields.values():
-            field.widget.attrs.update({'class': 'input'})
\ No newline at end of file
+
+
+class PaymentForm(forms.Form):
+    """Pagamento recebido pela API ou pela sincronização, nos limites de Payment."""
+
+    amount = forms.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.01'))
+    method = forms.CharField(max_length=50, required=False)
+    note = forms.CharField(max_length=255, required=False)
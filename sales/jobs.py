@@ -0,0 +1,16 @@
+from decimal import Decimal
+
+from django.db.models import F, Sum
+
+from clients.models import Client
+from tasks.queue import task
+from .models import Sale
+
+
+@task(priority=10)
+def refresh_client_debt(client_id):
+    """Recalcula client_debts a partir das comandas abertas do cliente."""
+    open_sales = Sale.objects.filter(client_id=client_id, status=Sale.STATUS_OPEN)
+    debt = open_sales.aggregate(total=Sum(F('items__price') * F('items__quantity')))['total'] or Decimal('0.00')
+    paid = open_sales.aggregate(paid=Sum('payments__amount'))['paid'] or Decimal('0.00')
+    Client.objects.filter(pk=client_id).update(client_debts=(debt - paid).quantize(Decimal('0.01')))
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from sales.archive import archive_sales
+
+
+class Command(BaseCommand):
+    help = (
+        'Move vendas finalizadas e canceladas mais antigas que o horizonte '
+        'para arquivos JSONL comprimidos e soma as finalizadas em SaleRollup.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.SALES_ARCHIVE_AFTER_DAYS,
+            help='Arquivar vendas criadas há mais de N dias.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        count = archive_sales(
+            older_than_days=options['days'],
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+        )
+        if options['dry_run']:
+            self.stdout.write(f'{count} vendas seriam arquivadas.')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{count} vendas arquivadas.'))
@@ -0,0 +1,326 @@
+import json
+import logging
+import random
+import secrets
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+from django.db import connection
+from django.db.models import Sum
+from django.test import Client as TestClient
+
+from clients.models import Client
+from products.models import Product
+from sales.models import Sale
+
+DEFAULT_MIX = 'create=1,add=6,remove=1,pay=2,cancel=0.3'
+OPERATIONS = ('create', 'add', 'remove', 'pay', 'cancel')
+
+
+def _parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise CommandError(f"Operação desconhecida no --mix: {name}")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise CommandError(f"Peso inválido no --mix: {part}")
+    return mix
+
+
+def _percentile(values, p):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class _ServerErrors(logging.Handler):
+    """Conta as exceções que o Django registrou em django.request (respostas 500)."""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def emit(self, record):
+        if not record.exc_info:
+            return
+        exc = record.exc_info[1]
+        kind = 'lock' if 'locked' in str(exc).lower() else type(exc).__name__
+        with self.lock:
+            self.counts[kind] += 1
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.timeouts = Counter()
+
+    def record(self, endpoint, status, elapsed):
+        with self.lock:
+            self.latencies[endpoint].append(elapsed)
+            self.statuses[endpoint][status] += 1
+
+    def timeout(self, endpoint):
+        with self.lock:
+            self.timeouts[endpoint] += 1
+
+
+class Waiter(threading.Thread):
+    """Um garçom simulado: sorteia operações do mix sobre as comandas compartilhadas."""
+
+    def __init__(self, harness, seed):
+        super().__init__(daemon=True)
+        self.harness = harness
+        self.random = random.Random(seed)
+
+    def request(self, endpoint, method, path, payload=None):
+        h = self.harness
+        data = json.dumps(payload).encode() if payload is not None else None
+        req = urllib.request.Request(h.base_url + path, data=data, method=method, headers={
+            'Content-Type': 'application/json',
+            'Cookie': h.cookie,
+            'X-CSRFToken': h.csrf_token,
+        })
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=h.timeout) as response:
+                status, body = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, body = e.code, e.read()
+        except (socket.timeout, TimeoutError, urllib.error.URLError):
+            h.stats.timeout(endpoint)
+            return None, None
+        h.stats.record(endpoint, status, (time.perf_counter() - started) * 1000)
+        if status < 300 and body:
+            try:
+                return status, json.loads(body)
+            except ValueError:
+                return status, None
+        return status, None
+
+    def run(self):
+        h = self.harness
+        operations, weights = zip(*h.mix.items())
+        while time.monotonic() < h.deadline:
+            operation = self.random.choices(operations, weights)[0]
+            sale_id = h.pick_sale(self.random)
+            if operation == 'create' or sale_id is None:
+                client = self.random.choice(h.client_ids) if h.client_ids and self.random.random() < 0.5 else None
+                status, sale = self.request('create', 'POST', '/api/sales/', {'client_id': client, 'client_name': 'Mesa'})
+                if sale:
+                    h.add_sale(sale['id'])
+            elif operation == 'add':
+                self.request('add', 'POST', f'/api/sales/{sale_id}/items/', {
+                    'product_id': self.random.choice(h.product_ids),
+                    'quantity': self.random.randint(1, 3),
+                })
+            elif operation == 'remove':
+                status, sale = self.request('detail', 'GET', f'/api/sales/{sale_id}/?fields=id,items')
+                if sale and sale['items']:
+                    item = self.random.choice(sale['items'])
+                    self.request('remove', 'DELETE', f"/api/sales/{sale_id}/items/{item['id']}/")
+            elif operation == 'pay':
+                status, sale = self.request('detail', 'GET', f'/api/sales/{sale_id}/?fields=id,status,balance')
+                if sale and sale['status'] != Sale.STATUS_OPEN:
+                    h.drop_sale(sale_id)
+                elif sale and Decimal(sale['balance']) > 0:
+                    # Metade das vezes quita a comanda, senão paga uma parte
+                    balance = Decimal(sale['balance'])
+                    amount = balance if self.random.random() < 0.5 else (balance / 2).quantize(Decimal('0.01'))
+                    self.request('pay', 'POST', f'/api/sales/{sale_id}/payments/', {
+                        'amount': str(max(amount, Decimal('0.01'))), 'method': 'pix',
+                    })
+            elif operation == 'cancel':
+                self.request('cancel', 'POST', f'/sales/{sale_id}/cancel/', {})
+                h.drop_sale(sale_id)
+
+
+class Command(BaseCommand):
+    help = (
+        'Teste de carga local: sobe o app num servidor de teste com banco próprio, '
+        'simula garçons concorrentes sobre poucas comandas e relata vazão, latências '
+        'por endpoint, erros de lock/timeout e a consistência de estoque e dívidas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--waiters', type=int, default=5)
+        parser.add_argument('--duration', type=float, default=20, help='Segundos de carga.')
+        parser.add_argument('--hot-sales', type=int, default=4,
+                            help='Quantas comandas abertas os garçons disputam ao mesmo tempo.')
+        parser.add_argument('--products', type=int, default=20)
+        parser.add_argument('--clients', type=int, default=5)
+        parser.add_argument('--mix', default=DEFAULT_MIX,
+                            help=f'Pesos das operações (padrão: {DEFAULT_MIX}).')
+        parser.add_argument('--timeout', type=float, default=5, help='Timeout por requisição (s).')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.mix = _parse_mix(options['mix'])
+        self.timeout = options['timeout']
+        self.hot_sales = options['hot_sales']
+        self.stats = Stats()
+        self.sales_lock = threading.Lock()
+        self.open_sales = []
+        seed = options['seed'] if options['seed'] is not None else random.randrange(2 ** 32)
+
+        # Banco de teste em arquivo, para as threads do servidor disputarem locks de verdade
+        tmpdir = tempfile.mkdtemp(prefix='load_test_')
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = str(Path(tmpdir) / 'load_test.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        old_allowed_hosts = settings.ALLOWED_HOSTS
+        settings.ALLOWED_HOSTS = ['127.0.0.1']
+        server_errors = _ServerErrors()
+        request_logger = logging.getLogger('django.request')
+        old_propagate = request_logger.propagate
+        server = None
+        try:
+            initial_stock = self._seed(options['products'], options['clients'])
+            self.product_ids = list(initial_stock)
+            self.client_ids = list(Client.objects.values_list('pk', flat=True))
+            self._login()
+
+            server = ThreadedWSGIServer(('127.0.0.1', 0), _QuietHandler, allow_reuse_address=False)
+            server.daemon_threads = True
+            # Carregar o WSGI reconfigura o logging; só depois trocamos o log de 500 pela contagem
+            server.set_app(get_internal_wsgi_application())
+            request_logger.addHandler(server_errors)
+            request_logger.propagate = False
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.base_url = f'http://127.0.0.1:{server.server_port}'
+
+            self.stdout.write(
+                f"{options['waiters']} garçons, {self.hot_sales} comandas quentes, "
+                f"{options['duration']:.0f}s, seed {seed}"
+            )
+            started = time.monotonic()
+            self.deadline = started + options['duration']
+            waiters = [Waiter(self, seed + i) for i in range(options['waiters'])]
+            for waiter in waiters:
+                waiter.start()
+            for waiter in waiters:
+                waiter.join()
+            elapsed = time.monotonic() - started
+
+            self._report(elapsed, server_errors.counts)
+            self._check_consistency(initial_stock)
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+            request_logger.removeHandler(server_errors)
+            request_logger.propagate = old_propagate
+            settings.ALLOWED_HOSTS = old_allowed_hosts
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    def _seed(self, products, clients):
+        Product.objects.bulk_create([
+            Product(
+                name=f'Produto {i:03d}',
+                category=Product.Category.choices[i % len(Product.Category.choices)][0],
+                sale_price=Decimal(5 + i % 20),
+                cost_price=Decimal(2 + i % 10),
+                quantity=100000,
+            )
+            for i in range(products)
+        ])
+        Client.objects.bulk_create([
+            Client(name=f'Cliente {i}', phone_number='0000-0000') for i in range(clients)
+        ])
+        return dict(Product.objects.values_list('pk', 'quantity'))
+
+    def _login(self):
+        user = get_user_model().objects.create_user('load-test', password=secrets.token_urlsafe())
+        client = TestClient()
+        client.force_login(user)
+        self.csrf_token = secrets.token_hex(16)
+        self.cookie = (
+            f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}; "
+            f"{settings.CSRF_COOKIE_NAME}={self.csrf_token}"
+        )
+
+    def pick_sale(self, rng):
+        with self.sales_lock:
+            return rng.choice(self.open_sales) if len(self.open_sales) >= self.hot_sales else None
+
+    def add_sale(self, sale_id):
+        with self.sales_lock:
+            self.open_sales.append(sale_id)
+
+    def drop_sale(self, sale_id):
+        with self.sales_lock:
+            if sale_id in self.open_sales:
+                self.open_sales.remove(sale_id)
+
+    def _report(self, elapsed, server_errors):
+        stats = self.stats
+        total = sum(len(v) for v in stats.latencies.values())
+        self.stdout.write(f"\n{total} requisições em {elapsed:.1f}s ({total / elapsed:.1f} req/s)\n")
+        self.stdout.write(f"{'endpoint':<8} {'n':>6} {'p50':>8} {'p95':>8} {'p99':>8}  status")
+        for endpoint in sorted(stats.latencies):
+            values = stats.latencies[endpoint]
+            statuses = ' '.join(f'{code}:{n}' for code, n in sorted(stats.statuses[endpoint].items()))
+            self.stdout.write(
+                f"{endpoint:<8} {len(values):>6} {_percentile(values, 50):>6.1f}ms "
+                f"{_percentile(values, 95):>6.1f}ms {_percentile(values, 99):>6.1f}ms  {statuses}"
+            )
+        timeouts = sum(stats.timeouts.values())
+        self.stdout.write(f"\nTimeouts: {timeouts} {dict(stats.timeouts) if timeouts else ''}")
+        self.stdout.write(f"Erros de lock no servidor: {server_errors.get('lock', 0)}")
+        others = {k: v for k, v in server_errors.items() if k != 'lock'}
+        if others:
+            self.stdout.write(f"Outros erros 500: {others}")
+
+    def _check_consistency(self, initial_stock):
+        problems = []
+        movements = dict(
+            Product.objects.annotate(net=Sum('stock_movements__quantity')).values_list('pk', 'net')
+        )
+        for pk, quantity in Product.objects.values_list('pk', 'quantity'):
+            expected = initial_stock[pk] + (movements.get(pk) or 0)
+            if quantity != expected:
+                problems.append(f"Produto {pk}: estoque {quantity}, movimentações indicam {expected}")
+            if quantity < 0:
+                problems.append(f"Produto {pk}: estoque negativo ({quantity})")
+
+        for client in Client.objects.all():
+            open_sales = Sale.objects.with_totals().filter(client=client, status=Sale.STATUS_OPEN)
+            expected = sum((s.total_amount - s.paid_total for s in open_sales), Decimal('0.00')).quantize(Decimal('0.01'))
+            if client.client_debts != expected:
+                problems.append(f"Cliente {client.pk}: dívida {client.client_debts}, comandas indicam {expected}")
+
+        for sale in Sale.objects.with_totals().filter(status=Sale.STATUS_FINALIZED):
+            if sale.paid_total < sale.total_amount:
+                problems.append(f"Venda {sale.pk} finalizada com saldo {sale.total_amount - sale.paid_total}")
+
+        counts = Counter(Sale.objects.values_list('status', flat=True))
+        self.stdout.write(f"\nVendas: {dict(counts)}")
+        if problems:
+            for problem in problems:
+                self.stdout.write(self.style.ERROR(problem))
+            self.stdout.write(self.style.ERROR(f"{len(problems)} inconsistências encontradas."))
+        else:
+            self.stdout.write(self.style.SUCCESS('Estoque e dívidas consistentes.'))
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0001_initial'),
+        ('sales', '0004_alter_saleitem_price_alter_saleitem_product_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['created_at'], name='sale_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['status', 'created_at'], name='sale_status_created_idx'),
+        ),
+    ]
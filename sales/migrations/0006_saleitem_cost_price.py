@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:34
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_cost_price(apps, schema_editor):
+    # Itens antigos não guardaram o custo; usa o custo atual do produto.
+    SaleItem = apps.get_model('sales', 'SaleItem')
+    Product = apps.get_model('products', 'Product')
+    SaleItem.objects.update(
+        cost_price=Subquery(
+            Product.objects.filter(pk=OuterRef('product_id')).values('cost_price')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_stock_ledger'),
+        ('sales', '0005_sale_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='saleitem',
+            name='cost_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(backfill_cost_price, migrations.RunPython.noop),
+    ]
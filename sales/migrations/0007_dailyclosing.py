@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0006_saleitem_cost_price'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyClosing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_date', models.DateField(unique=True)),
+                ('payments_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('payments_by_method', models.JSONField(default=dict)),
+                ('sales_count', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('units_sold', models.PositiveIntegerField(default=0)),
+                ('open_sales_count', models.PositiveIntegerField(default=0)),
+                ('open_balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('cancelled_count', models.PositiveIntegerField(default=0)),
+                ('cancelled_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('closed_at', models.DateTimeField(auto_now_add=True)),
+                ('closed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-business_date'],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0007_dailyclosing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncOperation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('op_type', models.CharField(max_length=20)),
+                ('ok', models.BooleanField(default=True)),
+                ('result', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_stock_ledger'),
+        ('sales', '0008_syncoperation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaleRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('product_name', models.CharField(max_length=255)),
+                ('category', models.CharField(max_length=20)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='products.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'product_name'), name='salerollup_day_product_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0009_salerollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='saleitem',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
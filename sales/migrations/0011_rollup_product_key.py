@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:53
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_rollups_by_product(apps, schema_editor):
+    # Um produto renomeado entre dois arquivamentos ficou com duas linhas no mesmo dia
+    SaleRollup = apps.get_model('sales', 'SaleRollup')
+    duplicated = SaleRollup.objects.filter(product__isnull=False).values('day', 'product')\
+        .annotate(rows=Count('pk')).filter(rows__gt=1)
+    for key in duplicated:
+        keep, *others = SaleRollup.objects.filter(day=key['day'], product=key['product']).order_by('pk')
+        for other in others:
+            keep.units += other.units
+            keep.revenue += other.revenue
+            keep.cost += other.cost
+            other.delete()
+        keep.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0010_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaleHourRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('sales', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.RemoveConstraint(
+            model_name='salerollup',
+            name='salerollup_day_product_uniq',
+        ),
+        migrations.RunPython(merge_rollups_by_product, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='salerollup',
+            constraint=models.UniqueConstraint(fields=('day', 'product'), name='salerollup_day_product_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='salehourrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'hour'), name='salehourrollup_day_hour_uniq'),
+        ),
+    ]
@@ -1,6 +1,65 @@
+import random
+import time as _time
+from datetime import datetime, time, timedelta
 from decimal import Decimal
-from django.db import models, transaction
-from django.db.models import F, Sum
+from functools import wraps
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import (
+    Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+)
+from django.utils import timezone
+from django.db.models.functions import Coalesce
+from core.cache import SALES, bump_on_commit
+from products.codes import get_by_code, parse_quick_entry
+from products.models import StockMovement
+
+CONFLICT_RETRIES = 5
+
+
+class ConcurrentUpdate(ValueError):
+    """A comanda foi alterada por outra operação entre a leitura e a escrita."""
+
+
+def retry_on_conflict(method):
+    """Reexecuta a operação da comanda com o estado recarregado em caso de conflito."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        for attempt in range(CONFLICT_RETRIES):
+            try:
+                return method(self, *args, **kwargs)
+            except ConcurrentUpdate:
+                if attempt == CONFLICT_RETRIES - 1:
+                    raise
+                self.refresh_from_db()
+                _time.sleep(random.uniform(0, 0.005 * (attempt + 1)))
+    return wrapper
+
+
+class SaleQuerySet(models.QuerySet):
+    def with_totals(self):
+        """Anota total_amount e paid_total via subqueries (sem N+1)."""
+        money = DecimalField(max_digits=12, decimal_places=2)
+        items_total = SaleItem.objects.filter(sale=OuterRef('pk'))\
+            .values('sale')\
+            .annotate(total=Sum(F('price') * F('quantity')))\
+            .values('total')
+        payments_total = Payment.objects.filter(sale=OuterRef('pk'))\
+            .values('sale')\
+            .annotate(total=Sum('amount'))\
+            .values('total')
+        return self.annotate(
+            total_amount=Coalesce(
+                Subquery(items_total, output_field=money),
+                Value(Decimal('0.00')),
+                output_field=money,
+            ),
+            paid_total=Coalesce(
+                Subquery(payments_total, output_field=money),
+                Value(Decimal('0.00')),
+                output_field=money,
+            ),
+        )
 
 
 class Sale(models.Model):
@@ -22,13 +81,49 @@ class Sale(models.Model):
     )
     client_name = models.CharField(max_length=255, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_OPEN)
+    version = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SaleQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='sale_created_at_idx'),
+            models.Index(fields=['status', 'created_at'], name='sale_status_created_idx'),
+        ]
+
     def __str__(self):
         who = self.client.name if self.client else (self.client_name or 'Cliente Avulso')
         return f"Venda #{self.pk} - {who} - {self.status}"
 
+    def save(self, *args, **kwargs):
+        # A versão só avança via _claim(); um save comum não pode regredi-la
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != 'version'
+            ]
+        super().save(*args, **kwargs)
+
+    def _claim(self, **changes):
+        """Compare-and-swap da versão, gravando `changes` no mesmo UPDATE.
+
+        É a última escrita da transação da operação: a linha da comanda só
+        fica travada entre este UPDATE e o commit. Se outra operação mudou a
+        comanda desde a leitura, a transação inteira é desfeita e refeita
+        pelo retry_on_conflict.
+        """
+        claimed = Sale.objects.filter(pk=self.pk, version=self.version)\
+            .update(version=F('version') + 1, updated_at=timezone.now(), **changes)
+        if not claimed:
+            raise ConcurrentUpdate("A comanda foi alterada por outro aparelho; tente novamente.")
+        self.version += 1
+        for field, value in changes.items():
+            setattr(self, field, value)
+        # O UPDATE acima não dispara sinais; invalida os caches de vendas no commit
+        bump_on_commit(SALES)
+
     @property
     def total(self):
         agg = self.items.aggregate(total=Sum(F('price') * F('quantity')))
@@ -47,67 +142,127 @@ class Sale(models.Model):
         return self.client.name if self.client else self.client_name
 
     def update_client_debt_cache(self):
-        if not self.client:
+        """Recalcula a dívida do cliente (na hora ou pela fila, ver tasks.queue)."""
+        if not self.client_id:
             return
-        debt = Sale.objects.filter(client=self.client, status=self.STATUS_OPEN)\
-            .aggregate(total=Sum(F('items__price') * F('items__quantity')))['total'] or Decimal('0.00')
-        paid = Sale.objects.filter(client=self.client, status=self.STATUS_OPEN)\
-            .aggregate(paid=Sum('payments__amount'))['paid'] or Decimal('0.00')
-        self.client.client_debts = (debt - paid).quantize(Decimal('0.01'))
-        self.client.save(update_fields=['client_debts'])
+        from tasks.queue import enqueue
+        from .jobs import refresh_client_debt
+        enqueue(refresh_client_debt, [self.client_id], unique=True)
 
+    @retry_on_conflict
     def finalize_and_reserve_stock(self):
         if self.status != self.STATUS_OPEN:
             return
+        self._finalize()
+
+    def _finalize(self):
+        """Baixa o estoque e fecha a comanda; o claim é a última escrita."""
         with transaction.atomic():
-            sale_locked = Sale.objects.select_for_update().get(pk=self.pk)
-            for item in sale_locked.items.select_related('product'):
-                if item.product.quantity < item.quantity:
-                    raise ValueError(
-                        f"Estoque insuficiente para {item.product.name} "
-                        f"({item.product.quantity} disponível, {item.quantity} solicitado)."
-                    )
-            for item in sale_locked.items.select_related('product'):
-                item.product.quantity -= item.quantity
-                item.product.save(update_fields=['quantity'])
-            sale_locked.status = self.STATUS_FINALIZED
-            sale_locked.save(update_fields=['status', 'updated_at'])
-            sale_locked.update_client_debt_cache()
+            # Ordem de pk: duas comandas com os mesmos produtos travam as linhas na mesma ordem
+            items = list(self.items.select_related('product').order_by('product_id'))
+            for item in items:
+                # Falha (e desfaz a transação) se algum produto não tiver estoque
+                item.product.take_stock(item.quantity)
+            StockMovement.record(
+                ((item.product, -item.quantity) for item in items),
+                StockMovement.Reason.SALE_FINALIZED,
+                sale_id=self.pk,
+            )
+            self._claim(status=self.STATUS_FINALIZED)
+            self.update_client_debt_cache()
+
+    def return_stock(self, reason):
+        """Devolve ao estoque as quantidades dos itens e registra no ledger."""
+        items = list(self.items.select_related('product').order_by('product_id'))
+        for item in items:
+            item.product.add_stock(item.quantity)
+        StockMovement.record(
+            ((item.product, item.quantity) for item in items), reason, sale_id=self.pk
+        )
 
+    @retry_on_conflict
     def cancel(self):
         if self.status == self.STATUS_CANCELLED:
             return
         with transaction.atomic():
-            for item in self.items.select_related('product'):
-                item.product.quantity += item.quantity
-                item.product.save(update_fields=['quantity'])
-            self.status = self.STATUS_CANCELLED
-            self.save(update_fields=['status', 'updated_at'])
+            self.return_stock(StockMovement.Reason.SALE_CANCELLED)
+            self._claim(status=self.STATUS_CANCELLED)
             self.update_client_debt_cache()
 
+    @retry_on_conflict
     def reopen(self):
         if self.status not in [self.STATUS_CANCELLED, self.STATUS_FINALIZED]:
             return
         with transaction.atomic():
             if self.status == self.STATUS_FINALIZED:
                 # Return reserved stock
-                for item in self.items.select_related('product'):
-                    item.product.quantity += item.quantity
-                    item.product.save(update_fields=['quantity'])
-            self.status = self.STATUS_OPEN
-            self.save(update_fields=['status', 'updated_at'])
+                self.return_stock(StockMovement.Reason.SALE_REOPENED)
+            self._claim(status=self.STATUS_OPEN)
+            self.update_client_debt_cache()
+
+    @retry_on_conflict
+    def add_item(self, product, quantity):
+        """Adiciona o produto à comanda, somando à quantidade se já existir."""
+        if self.status != self.STATUS_OPEN:
+            raise ValueError("Venda não está aberta.")
+        if quantity <= 0:
+            raise ValueError("Quantidade inválida.")
+        with transaction.atomic():
+            item = SaleItem.objects.filter(sale=self, product=product).first()
+            if item is None:
+                try:
+                    with transaction.atomic():
+                        item = SaleItem.objects.create(
+                            sale=self,
+                            product=product,
+                            quantity=quantity,
+                            price=product.sale_price,
+                            cost_price=product.cost_price,
+                        )
+                except IntegrityError:
+                    # Outro aparelho lançou o mesmo produto: refaz somando ao item dele
+                    raise ConcurrentUpdate("A comanda foi alterada por outro aparelho; tente novamente.")
+            else:
+                item.quantity += quantity
+                item.save(update_fields=['quantity'])
+            self._claim()
+            self.update_client_debt_cache()
+        return item
+
+    def add_item_by_code(self, entry):
+        """Lançamento rápido: '12 x3' adiciona 3 unidades do produto de código 12."""
+        code, quantity = parse_quick_entry(entry)
+        product = get_by_code(code)
+        if product is None:
+            raise ValueError(f"Código {code} não encontrado.")
+        return self.add_item(product, quantity)
+
+    @retry_on_conflict
+    def remove_item(self, item):
+        """Remove o item da comanda aberta, devolvendo o estoque."""
+        if self.status != self.STATUS_OPEN:
+            raise ValueError("Venda não está aberta.")
+        with transaction.atomic():
+            # Relido do banco: o delete confere a versão do item
+            item = SaleItem.objects.select_related('product').filter(pk=item.pk, sale=self).first()
+            if item is None:
+                raise ValueError("Item não encontrado.")
+            item.delete()
+            self._claim()
             self.update_client_debt_cache()
 
+    @retry_on_conflict
     def apply_payment(self, amount, method=None, note=None):
         if amount <= 0:
             raise ValueError("Valor do pagamento deve ser positivo.")
         with transaction.atomic():
-            sale_locked = Sale.objects.select_for_update().get(pk=self.pk)
-            Payment.objects.create(sale=sale_locked, amount=amount, method=method, note=note)
-            if sale_locked.paid_amount >= sale_locked.total:
-                sale_locked.finalize_and_reserve_stock()
+            Payment.objects.create(sale=self, amount=amount, method=method, note=note)
+            if self.paid_amount >= self.total:
+                # Sem retry próprio: um conflito refaz o pagamento inteiro
+                self._finalize()
             else:
-                sale_locked.update_client_debt_cache()
+                self._claim()
+                self.update_client_debt_cache()
 
 
 class SaleItem(models.Model):
@@ -115,6 +270,8 @@ class SaleItem(models.Model):
     product = models.ForeignKey('products.Product', on_delete=models.PROTECT)
     quantity = models.PositiveIntegerField(default=1)
     price = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    cost_price = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    version = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         unique_together = ('sale', 'product')
@@ -122,28 +279,65 @@ class SaleItem(models.Model):
     def __str__(self):
         return f"{self.product.name} x {self.quantity}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Quantidade gravada na versão lida, para calcular a diferença no save
+        instance._loaded_quantity = instance.__dict__.get('quantity')
+        return instance
+
+    def _claim(self):
+        """Compare-and-swap da versão do item; falha se ele mudou desde a leitura."""
+        claimed = SaleItem.objects.filter(pk=self.pk, version=self.version)\
+            .update(version=F('version') + 1)
+        if not claimed:
+            raise ConcurrentUpdate("O item foi alterado por outro aparelho; tente novamente.")
+        self.version += 1
+
     def save(self, *args, **kwargs):
         with transaction.atomic():
-            creating = self.pk is None
+            creating = self._state.adding
             if not creating:
-                old = SaleItem.objects.select_for_update().get(pk=self.pk)
-                diff = self.quantity - old.quantity
+                self._claim()
+                diff = self.quantity - self._loaded_quantity
+                update_fields = kwargs.get('update_fields')
+                if update_fields is None:
+                    kwargs['update_fields'] = [
+                        f.name for f in self._meta.concrete_fields
+                        if not f.primary_key and f.name != 'version'
+                    ]
             else:
                 diff = self.quantity
+                if not self.cost_price:
+                    self.cost_price = self.product.cost_price
 
             super().save(*args, **kwargs)
-            if creating or diff > 0:
-                to_sub = diff if not creating else self.quantity
-                self.product.quantity = max(self.product.quantity - to_sub, 0)
-            elif diff < 0:
-                self.product.quantity += abs(diff)
-            self.product.save(update_fields=['quantity'])
+            self._loaded_quantity = self.quantity
+            if diff > 0:
+                moved = -self.product.take_stock(diff, partial=True)
+            else:
+                moved = -diff
+                if moved:
+                    self.product.add_stock(moved)
+            StockMovement.record(
+                [(self.product, moved)],
+                StockMovement.Reason.SALE_ITEM,
+                sale_id=self.sale_id,
+            )
 
     def delete(self, *args, **kwargs):
         with transaction.atomic():
-            self.product.quantity += self.quantity
-            self.product.save(update_fields=['quantity'])
-            super().delete(*args, **kwargs)
+            deleted = SaleItem.objects.filter(pk=self.pk, version=self.version).delete()
+            if not deleted[0]:
+                raise ConcurrentUpdate("O item foi alterado por outro aparelho; tente novamente.")
+            self.product.add_stock(self.quantity)
+            StockMovement.record(
+                [(self.product, self.quantity)],
+                StockMovement.Reason.SALE_ITEM_REMOVED,
+                sale_id=self.sale_id,
+            )
+        self.pk = None
+        return deleted
 
 
 class Payment(models.Model):
@@ -155,3 +349,164 @@ class Payment(models.Model):
 
     def __str__(self):
         return f"R${self.amount} - Venda #{self.sale_id}"
+
+
+class DailyClosing(models.Model):
+    """Fechamento de caixa imutável de um dia de operação (relatório Z)."""
+
+    business_date = models.DateField(unique=True)
+    payments_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    payments_by_method = models.JSONField(default=dict)
+    sales_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    units_sold = models.PositiveIntegerField(default=0)
+    open_sales_count = models.PositiveIntegerField(default=0)
+    open_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    cancelled_count = models.PositiveIntegerField(default=0)
+    cancelled_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    closed_at = models.DateTimeField(auto_now_add=True)
+    closed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+    )
+
+    class Meta:
+        ordering = ['-business_date']
+
+    def __str__(self):
+        return f"Fechamento {self.business_date:%d/%m/%Y} - R${self.payments_total}"
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("Fechamentos de caixa não podem ser alterados.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Fechamentos de caixa não podem ser excluídos.")
+
+    @staticmethod
+    def business_day_range(business_date):
+        """Início e fim do dia de operação (que vira após BUSINESS_DAY_START_HOUR)."""
+        start_hour = getattr(settings, 'BUSINESS_DAY_START_HOUR', 0)
+        start = timezone.make_aware(datetime.combine(business_date, time(hour=start_hour)))
+        return start, start + timedelta(days=1)
+
+    @staticmethod
+    def current_business_date():
+        start_hour = getattr(settings, 'BUSINESS_DAY_START_HOUR', 0)
+        return (timezone.localtime() - timedelta(hours=start_hour)).date()
+
+    @classmethod
+    def compute(cls, business_date):
+        """Totais do dia em poucas queries agrupadas (não persiste nada).
+
+        Lê só as tabelas quentes: dias já arquivados (ver sales.archive)
+        devem ser consultados pelo DailyClosing gravado no fechamento.
+        """
+        start, end = cls.business_day_range(business_date)
+
+        by_method = {}
+        for row in Payment.objects.filter(created_at__gte=start, created_at__lt=end)\
+                .values('method').annotate(total=Sum('amount'), count=Count('pk')).order_by('method'):
+            # '' e None caem no mesmo grupo
+            method = by_method.setdefault(
+                row['method'] or 'Não informado', {'total': Decimal('0.00'), 'count': 0}
+            )
+            method['total'] += row['total']
+            method['count'] += row['count']
+        for method in by_method.values():
+            method['total'] = str(method['total'])
+
+        per_status = {
+            row['status']: row
+            for row in Sale.objects.filter(created_at__gte=start, created_at__lt=end)
+            .with_totals().values('status').annotate(
+                count=Count('pk'), total=Sum('total_amount'), paid=Sum('paid_total')
+            ).order_by()
+        }
+        empty = {'count': 0, 'total': None, 'paid': None}
+        finalized = per_status.get(Sale.STATUS_FINALIZED, empty)
+        open_ = per_status.get(Sale.STATUS_OPEN, empty)
+        cancelled = per_status.get(Sale.STATUS_CANCELLED, empty)
+
+        units_sold = SaleItem.objects.filter(
+            sale__status=Sale.STATUS_FINALIZED,
+            sale__created_at__gte=start,
+            sale__created_at__lt=end,
+        ).aggregate(total=Sum('quantity'))['total'] or 0
+
+        zero = Decimal('0.00')
+        return {
+            'business_date': business_date,
+            'payments_total': sum((Decimal(m['total']) for m in by_method.values()), zero),
+            'payments_by_method': by_method,
+            'sales_count': sum(row['count'] for row in per_status.values()),
+            'revenue': finalized['total'] or zero,
+            'units_sold': units_sold,
+            'open_sales_count': open_['count'],
+            'open_balance': ((open_['total'] or zero) - (open_['paid'] or zero)).quantize(Decimal('0.01')),
+            'cancelled_count': cancelled['count'],
+            'cancelled_total': cancelled['total'] or zero,
+        }
+
+    @classmethod
+    def close(cls, business_date, user=None):
+        """Calcula e grava o fechamento. Um dia só pode ser fechado uma vez."""
+        with transaction.atomic():
+            return cls.objects.create(closed_by=user, **cls.compute(business_date))
+
+
+class SyncOperation(models.Model):
+    """Operação offline já aplicada, indexada pela chave de idempotência do cliente."""
+
+    key = models.CharField(max_length=64, unique=True)
+    op_type = models.CharField(max_length=20)
+    ok = models.BooleanField(default=True)
+    result = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.op_type} {self.key}"
+
+
+class SaleRollup(models.Model):
+    """Totais diários por produto das vendas finalizadas que já foram arquivadas."""
+
+    day = models.DateField()
+    product = models.ForeignKey(
+        'products.Product', null=True, blank=True, on_delete=models.SET_NULL, related_name='+'
+    )
+    product_name = models.CharField(max_length=255)
+    category = models.CharField(max_length=20)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            # Pelo id: produtos diferentes com o mesmo nome não se misturam
+            models.UniqueConstraint(fields=['day', 'product'], name='salerollup_day_product_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.day:%d/%m/%Y} - {self.product_name} x {self.units}"
+
+
+class SaleHourRollup(models.Model):
+    """Vendas finalizadas já arquivadas por dia e hora local, para o heatmap."""
+
+    day = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    sales = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'hour'], name='salehourrollup_day_hour_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.day:%d/%m/%Y} {self.hour}h - {self.sales} vendas"
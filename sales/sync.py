@@ -0,0 +1,185 @@
+"""Aplicação em lote das operações enfileiradas offline pelas comandas no celular.
+
+Cada operação traz uma chave de idempotência gerada no aparelho. A chave é
+gravada em SyncOperation junto com o resultado, então reenviar o mesmo lote
+(ou parte dele) não duplica vendas, itens nem pagamentos: a resposta
+gravada é devolvida de novo.
+"""
+from django.db import IntegrityError, transaction
+
+from clients.models import Client
+from products.models import Product
+from .forms import PaymentForm
+from .models import Sale, SaleItem, SyncOperation
+
+MAX_BATCH_SIZE = 200
+
+
+class SyncError(ValueError):
+    pass
+
+
+def _get_id(payload, name, message):
+    """Id opcional do payload: inteiro positivo ou texto só com dígitos."""
+    value = payload.get(name)
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).isdigit():
+        raise SyncError(message)
+    return int(value)
+
+
+def _get_text(payload, name, max_length, message):
+    value = payload.get(name) or ''
+    if not isinstance(value, str) or len(value) > max_length:
+        raise SyncError(message)
+    return value.strip()
+
+
+def _get_sale(payload, created_sales):
+    """Resolve a venda por sale_id ou pela chave da operação create_sale (sale_key)."""
+    sale_id = _get_id(payload, 'sale_id', "Venda não encontrada.")
+    sale_key = payload.get('sale_key')
+    if sale_key is not None and not isinstance(sale_key, str):
+        raise SyncError("Venda não encontrada.")
+    if not sale_id and sale_key:
+        sale_id = created_sales.get(sale_key)
+        if sale_id is None:
+            created = SyncOperation.objects.filter(key=sale_key, op_type='create_sale', ok=True).first()
+            sale_id = created.result.get('sale_id') if created else None
+    if not sale_id:
+        raise SyncError("Venda não informada.")
+    try:
+        return Sale.objects.get(pk=sale_id)
+    except Sale.DoesNotExist:
+        raise SyncError("Venda não encontrada.")
+
+
+def _get_product(payload):
+    product_id = _get_id(payload, 'product_id', "Produto inválido.")
+    try:
+        return Product.objects.get(pk=product_id)
+    except Product.DoesNotExist:
+        raise SyncError("Produto inválido.")
+
+
+def _get_quantity(payload):
+    try:
+        quantity = int(payload.get('quantity', 1))
+    except (ValueError, TypeError):
+        raise SyncError("Quantidade inválida.")
+    if quantity <= 0:
+        raise SyncError("Quantidade inválida.")
+    return quantity
+
+
+def _create_sale(payload, created_sales):
+    client_id = _get_id(payload, 'client_id', "Cliente inválido.")
+    client_name = _get_text(payload, 'client_name', 255, "Nome do cliente inválido.")
+    client = Client.objects.filter(pk=client_id).first() if client_id else None
+    sale = Sale.objects.create(client=client, client_name=client_name)
+    return {'sale_id': sale.pk}
+
+
+def _add_item(payload, created_sales):
+    sale = _get_sale(payload, created_sales)
+    item = sale.add_item(_get_product(payload), _get_quantity(payload))
+    return {'sale_id': sale.pk, 'item_id': item.pk, 'quantity': item.quantity}
+
+
+def _remove_item(payload, created_sales):
+    sale = _get_sale(payload, created_sales)
+    if sale.status != Sale.STATUS_OPEN:
+        raise SyncError("Venda não está aberta.")
+    item_id = _get_id(payload, 'item_id', "Item não encontrado.")
+    items = SaleItem.objects.filter(sale=sale)
+    if item_id:
+        items = items.filter(pk=item_id)
+    else:
+        items = items.filter(product_id=_get_id(payload, 'product_id', "Item não encontrado."))
+    item = items.first()
+    if item is None:
+        raise SyncError("Item não encontrado.")
+    sale.remove_item(item)
+    return {'sale_id': sale.pk}
+
+
+def _pay(payload, created_sales):
+    sale = _get_sale(payload, created_sales)
+    if sale.status != Sale.STATUS_OPEN:
+        raise SyncError("Venda não está aberta.")
+    # Mesmos limites da API: NaN, Infinity e valores maiores que a coluna são recusados
+    form = PaymentForm(payload)
+    if not form.is_valid():
+        raise SyncError("Valor inválido." if 'amount' in form.errors else "Dados do pagamento inválidos.")
+    sale.apply_payment(**form.cleaned_data)
+    sale.refresh_from_db(fields=['status'])
+    return {'sale_id': sale.pk, 'status': sale.status}
+
+
+def _cancel(payload, created_sales):
+    sale = _get_sale(payload, created_sales)
+    sale.cancel()
+    return {'sale_id': sale.pk, 'status': sale.status}
+
+
+HANDLERS = {
+    'create_sale': _create_sale,
+    'add_item': _add_item,
+    'remove_item': _remove_item,
+    'pay': _pay,
+    'cancel': _cancel,
+}
+
+
+def _apply(operation, created_sales):
+    key = str(operation.get('key') or '').strip()
+    op_type = operation.get('type')
+    if not key or len(key) > 64:
+        return {'key': key, 'status': 'error', 'error': "Chave de idempotência inválida."}
+    if not isinstance(op_type, str) or op_type not in HANDLERS:
+        return {'key': key, 'status': 'error', 'error': "Operação desconhecida."}
+
+    done = SyncOperation.objects.filter(key=key).first()
+    if done:
+        return {'key': key, 'status': 'duplicate', 'ok': done.ok, 'result': done.result}
+
+    payload = operation.get('payload') or {}
+    try:
+        with transaction.atomic():
+            # Grava a chave antes de aplicar: um lote concorrente com a mesma
+            # chave esbarra na unique constraint e não aplica de novo.
+            record = SyncOperation.objects.create(key=key, op_type=op_type)
+            try:
+                with transaction.atomic():
+                    if not isinstance(payload, dict):
+                        raise SyncError("Dados da operação inválidos.")
+                    result = HANDLERS[op_type](payload, created_sales)
+            except ValueError as e:
+                record.ok = False
+                record.result = {'error': str(e)}
+            else:
+                record.result = result
+            record.save(update_fields=['ok', 'result'])
+    except IntegrityError:
+        done = SyncOperation.objects.get(key=key)
+        return {'key': key, 'status': 'duplicate', 'ok': done.ok, 'result': done.result}
+
+    if op_type == 'create_sale' and record.ok:
+        created_sales[key] = record.result['sale_id']
+    if not record.ok:
+        return {'key': key, 'status': 'error', 'error': record.result['error']}
+    return {'key': key, 'status': 'applied', 'result': record.result}
+
+
+def apply_operations(operations):
+    """Aplica as operações em ordem, numa única transação por lote.
+
+    Falhas de negócio (estoque insuficiente, venda fechada...) são gravadas
+    como resultado da operação e não interrompem o lote.
+    """
+    if len(operations) > MAX_BATCH_SIZE:
+        raise SyncError(f"Lote muito grande (máximo {MAX_BATCH_SIZE} operações).")
+    created_sales = {}
+    with transaction.atomic():
+        return [_apply(operation, created_sales) for operation in operations]
@@ -1,3 +1,391 @@
-from django.test import TestCase
+import json
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.cache import SALES, generation
+from products.models import Product
+from .models import CONFLICT_RETRIES, ConcurrentUpdate, DailyClosing, Payment, Sale, SaleItem, SyncOperation
+from .sync import apply_operations
+
+
+class SyncOperationsTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            name='Cerveja', sale_price=10, cost_price=4, quantity=50
+        )
+
+    def _add(self, key, sale_key, quantity=1):
+        return {
+            'key': key, 'type': 'add_item',
+            'payload': {'sale_key': sale_key, 'product_id': self.product.pk, 'quantity': quantity},
+        }
+
+    def test_sale_key_resolves_sale_created_in_same_and_later_batch(self):
+        results = apply_operations([
+            {'key': 'c1', 'type': 'create_sale', 'payload': {'client_name': 'Mesa 4'}},
+            self._add('a1', 'c1', 2),
+        ])
+        sale_id = results[0]['result']['sale_id']
+        self.assertEqual(results[1]['result']['sale_id'], sale_id)
+
+        # Lote seguinte: a chave é resolvida pelo SyncOperation gravado
+        results = apply_operations([self._add('a2', 'c1', 1)])
+        self.assertEqual(results[0]['status'], 'applied')
+        self.assertEqual(SaleItem.objects.get(sale_id=sale_id).quantity, 3)
+
+    def test_duplicate_keys_are_not_applied_twice(self):
+        batch = [
+            {'key': 'c1', 'type': 'create_sale', 'payload': {}},
+            self._add('a1', 'c1', 2),
+        ]
+        apply_operations(batch)
+        results = apply_operations(batch)
+
+        self.assertEqual([r['status'] for r in results], ['duplicate', 'duplicate'])
+        self.assertEqual(Sale.objects.count(), 1)
+        self.assertEqual(SaleItem.objects.get().quantity, 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 48)
+
+    def test_invalid_operation_in_the_middle_does_not_roll_back_the_batch(self):
+        results = apply_operations([
+            {'key': 'c1', 'type': 'create_sale', 'payload': {}},
+            self._add('a1', 'c1', 2),
+            {'key': 'p1', 'type': 'pay', 'payload': {'sale_key': 'c1', 'amount': 'NaN'}},
+            {'key': 'p2', 'type': 'pay', 'payload': {'sale_key': 'c1', 'amount': 'Infinity'}},
+            {'key': 'p3', 'type': 'pay', 'payload': ['c1', 5]},
+            {'key': 'p4', 'type': 'pay', 'payload': {'sale_key': 'c1', 'amount': '5'}},
+        ])
+
+        self.assertEqual(
+            [r['status'] for r in results],
+            ['applied', 'applied', 'error', 'error', 'error', 'applied'],
+        )
+        self.assertEqual(Payment.objects.get().amount, Decimal('5.00'))
+        self.assertEqual(SaleItem.objects.get().quantity, 2)
+        self.assertFalse(SyncOperation.objects.get(key='p1').ok)
+
+    def test_malformed_payload_fields_are_per_operation_errors(self):
+        malformed = [
+            {'type': 'create_sale', 'payload': {'client_name': 5}},
+            {'type': 'create_sale', 'payload': {'client_name': ['Mesa']}},
+            {'type': 'create_sale', 'payload': {'client_id': [1]}},
+            {'type': 'create_sale', 'payload': {'client_id': {'id': 1}}},
+            {'type': 'add_item', 'payload': {'sale_key': ['c1'], 'product_id': self.product.pk}},
+            {'type': 'add_item', 'payload': {'sale_key': 'c1', 'product_id': [self.product.pk]}},
+            {'type': 'remove_item', 'payload': {'sale_key': 'c1', 'item_id': [1]}},
+            {'type': 'remove_item', 'payload': {'sale_id': {'pk': 1}, 'item_id': 1}},
+            {'type': 'remove_item', 'payload': {'sale_key': 'c1', 'product_id': {'pk': 1}}},
+            {'type': 'pay', 'payload': {'sale_key': 'c1', 'amount': '1e20'}},
+            {'type': ['pay'], 'payload': {}},
+        ]
+        results = apply_operations([
+            {'key': 'c1', 'type': 'create_sale', 'payload': {}},
+            self._add('a1', 'c1', 2),
+            *({**operation, 'key': f'm{i}'} for i, operation in enumerate(malformed)),
+            self._add('a2', 'c1', 1),
+        ])
+
+        self.assertEqual([r['status'] for r in results[2:-1]], ['error'] * len(malformed))
+        self.assertEqual(results[-1]['status'], 'applied')
+        self.assertEqual(Sale.objects.count(), 1)
+        self.assertEqual(SaleItem.objects.get().quantity, 3)
+        self.assertFalse(Payment.objects.exists())
+
+    def test_endpoint_returns_per_operation_errors(self):
+        self.client.force_login(User.objects.create_user('garcom', password='x'))
+        response = self.client.post('/sales/sync/', json.dumps({'operations': [
+            {'key': 'c1', 'type': 'create_sale', 'payload': {}},
+            {'key': 'p1', 'type': 'pay', 'payload': {'sale_key': 'c1', 'amount': 'NaN'}},
+        ]}), content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['status'] for r in response.json()['results']], ['applied', 'error'])
+
+
+class SaleTotalsTests(TestCase):
+    def setUp(self):
+        self.beer = Product.objects.create(name='Cerveja', sale_price=10, cost_price=4, quantity=50)
+        self.soda = Product.objects.create(name='Guaraná', sale_price=Decimal('6.50'), cost_price=2, quantity=50)
+
+    def _sale(self, beers, sodas=0, paid=None):
+        sale = Sale.objects.create(client_name='Mesa')
+        sale.add_item(self.beer, beers)
+        if sodas:
+            sale.add_item(self.soda, sodas)
+        if paid:
+            sale.apply_payment(Decimal(paid))
+        return sale
+
+    def test_annotations_match_the_per_sale_properties(self):
+        sales = [self._sale(2, 1, paid='5'), self._sale(1, paid='3'), Sale.objects.create()]
+        sales[1].apply_payment(Decimal('2.50'))
+
+        annotated = {s.pk: s for s in Sale.objects.with_totals()}
+        for sale in sales:
+            with self.subTest(sale=sale.pk):
+                self.assertEqual(annotated[sale.pk].total_amount, sale.total)
+                self.assertEqual(annotated[sale.pk].paid_total, sale.paid_amount)
+        self.assertEqual(annotated[sales[0].pk].total_amount, Decimal('26.50'))
+        self.assertEqual(annotated[sales[1].pk].paid_total, Decimal('5.50'))
+        self.assertEqual(annotated[sales[2].pk].total_amount, Decimal('0.00'))
+
+    def test_admin_changelist_runs_a_constant_number_of_queries(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        url = reverse('admin:sales_sale_changelist')
+        self._sale(1, paid='2')
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        for _ in range(5):
+            self._sale(2, 1, paid='4')
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+
+        self.assertEqual(len(many), len(few))
+        self.assertContains(response, '<td class="field-get_balance">22,50</td>', count=5)
+
+    def test_admin_orders_by_annotated_total(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        small, big = self._sale(1), self._sale(3)
+        response = self.client.get(reverse('admin:sales_sale_changelist'), {'o': '-4'})
+        self.assertEqual([s.pk for s in response.context['cl'].result_list], [big.pk, small.pk])
+
+
+@override_settings(BUSINESS_DAY_START_HOUR=6)
+class DailyClosingTests(TestCase):
+    def setUp(self):
+        self.beer = Product.objects.create(name='Cerveja', sale_price=10, cost_price=4, quantity=100)
+        self.soda = Product.objects.create(name='Guaraná', sale_price=6, cost_price=2, quantity=100)
+        self.day = date(2025, 3, 5)
+
+        late = self._sale(self.beer, 3, Sale.STATUS_FINALIZED, (3, 5, 22))
+        self._payment(late, 30, 'pix', (3, 5, 22, 10))
+        # Depois da meia-noite, antes das 6h: ainda é o dia 5
+        after_midnight = self._sale(self.soda, 2, Sale.STATUS_FINALIZED, (3, 6, 2))
+        self._payment(after_midnight, 12, '', (3, 6, 2, 5))
+        tab = self._sale(self.beer, 1, Sale.STATUS_OPEN, (3, 5, 23))
+        self._payment(tab, 5, None, (3, 5, 23, 30))
+        self._sale(self.beer, 2, Sale.STATUS_CANCELLED, (3, 5, 20))
+        # Fora do dia de operação
+        self._sale(self.beer, 4, Sale.STATUS_FINALIZED, (3, 6, 7))
+        self._sale(self.beer, 4, Sale.STATUS_FINALIZED, (3, 5, 5))
+
+    def _sale(self, product, quantity, status, when):
+        sale = Sale.objects.create()
+        sale.add_item(product, quantity)
+        Sale.objects.filter(pk=sale.pk).update(status=status, created_at=self._at(*when))
+        return sale
+
+    def _payment(self, sale, amount, method, when):
+        payment = Payment.objects.create(sale=sale, amount=amount, method=method)
+        Payment.objects.filter(pk=payment.pk).update(created_at=self._at(*when))
+
+    def _at(self, month, day, hour, minute=0):
+        return timezone.make_aware(datetime(2025, month, day, hour, minute))
+
+    def test_compute_totals_the_business_day(self):
+        self.assertEqual(DailyClosing.compute(self.day), {
+            'business_date': self.day,
+            'payments_total': Decimal('47.00'),
+            'payments_by_method': {
+                'pix': {'total': '30.00', 'count': 1},
+                'Não informado': {'total': '17.00', 'count': 2},
+            },
+            'sales_count': 4,
+            'revenue': Decimal('42.00'),
+            'units_sold': 5,
+            'open_sales_count': 1,
+            'open_balance': Decimal('5.00'),
+            'cancelled_count': 1,
+            'cancelled_total': Decimal('20.00'),
+        })
+
+    def test_business_day_turns_at_the_cutoff_hour(self):
+        self.assertEqual(DailyClosing.business_day_range(self.day), (self._at(3, 5, 6), self._at(3, 6, 6)))
+        for when, expected in (((3, 6, 5, 59), self.day), ((3, 6, 6), date(2025, 3, 6))):
+            with self.subTest(when=when), mock.patch('django.utils.timezone.now', return_value=self._at(*when)):
+                self.assertEqual(DailyClosing.current_business_date(), expected)
+
+    def test_closing_is_recorded_once_and_immutable(self):
+        user = User.objects.create_user('caixa', password='x')
+        closing = DailyClosing.close(self.day, user=user)
+        closing.refresh_from_db()
+        self.assertEqual(closing.payments_total, Decimal('47.00'))
+        self.assertEqual(closing.closed_by, user)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            DailyClosing.close(self.day)
+        with self.assertRaises(ValueError):
+            closing.save()
+        with self.assertRaises(ValueError):
+            closing.delete()
+        self.assertTrue(DailyClosing.objects.filter(pk=closing.pk).exists())
+
+    def test_admin_cannot_delete_closings(self):
+        closing = DailyClosing.close(self.day)
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+
+        response = self.client.get(reverse('admin:sales_dailyclosing_delete', args=[closing.pk]))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse('admin:sales_dailyclosing_changelist'))
+        self.assertNotContains(response, 'delete_selected')
+
+
+class QuickAddItemTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            name='Cerveja', code='12', sale_price=10, cost_price=4, quantity=50
+        )
+        self.sale = Sale.objects.create()
+
+    def test_entry_adds_the_quantity_to_the_sale(self):
+        self.sale.add_item_by_code('12 x3')
+        self.sale.add_item_by_code('12')
+
+        self.assertEqual(self.sale.items.get().quantity, 4)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 46)
+
+    def test_unknown_code_is_rejected(self):
+        with self.assertRaisesMessage(ValueError, 'Código 99 não encontrado.'):
+            self.sale.add_item_by_code('99 x2')
+        self.assertFalse(self.sale.items.exists())
+
+    def test_view_reports_invalid_entries(self):
+        url = reverse('quick_add_item', args=[self.sale.pk])
+        response = self.client.post(url, {'entry': '99'})
+        self.assertEqual(response.status_code, 400)
+        self.assertContains(response, 'Código 99 não encontrado.', status_code=400)
+
+        response = self.client.post(url, {'entry': 'cerveja'})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(url, {'entry': '12 x2'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.sale.items.get().quantity, 2)
+
+
+class OptimisticConcurrencyTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            name='Cerveja', sale_price=10, cost_price=4, quantity=50
+        )
+        self.sale = Sale.objects.create()
+
+    def test_stale_version_is_rejected(self):
+        stale = Sale.objects.get(pk=self.sale.pk)
+        Sale.objects.get(pk=self.sale.pk).add_item(self.product, 1)
+
+        with self.assertRaises(ConcurrentUpdate):
+            stale._claim()
+
+    def test_conflict_is_retried_with_the_reloaded_sale(self):
+        stale = Sale.objects.get(pk=self.sale.pk)
+        Sale.objects.get(pk=self.sale.pk).add_item(self.product, 2)
+
+        with mock.patch('sales.models._time.sleep'):
+            stale.add_item(self.product, 3)
+
+        self.assertEqual(SaleItem.objects.get().quantity, 5)
+        self.assertEqual(stale.version, 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 45)
+
+    def test_claim_bumps_sales_generation_after_commit(self):
+        before = generation(SALES)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.sale._claim()
+            self.assertEqual(generation(SALES), before)
+        self.assertTrue(callbacks)
+        self.assertGreater(generation(SALES), before)
+
+    def _writes(self, operation):
+        with CaptureQueriesContext(connection) as queries:
+            operation()
+        return [
+            query['sql'] for query in queries
+            if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ]
+
+    def test_version_claim_is_the_last_write(self):
+        self.sale.add_item(self.product, 1)
+        for operation in (
+            lambda: self.sale.add_item(self.product, 2),
+            lambda: self.sale.remove_item(SaleItem.objects.get()),
+            lambda: self.sale.add_item(self.product, 1),
+            lambda: self.sale.apply_payment(Decimal('10')),
+            lambda: self.sale.reopen(),
+            lambda: self.sale.cancel(),
+        ):
+            writes = self._writes(operation)
+            self.assertTrue(writes[-1].startswith('UPDATE "sales_sale"'), writes[-1])
+            self.assertEqual(sum(sql.startswith('UPDATE "sales_sale"') for sql in writes), 1)
+
+    def test_stock_is_locked_in_product_order(self):
+        other = Product.objects.create(name='Água', sale_price=3, cost_price=1, quantity=50)
+        third = Product.objects.create(name='Suco', sale_price=7, cost_price=2, quantity=50)
+        for product in (third, self.product, other):
+            self.sale.add_item(product, 1)
+
+        for operation in (self.sale.finalize_and_reserve_stock, self.sale.reopen):
+            writes = self._writes(operation)
+            locked = [
+                int(re.search(r'"product_id" = (\d+)', sql).group(1))
+                for sql in writes if sql.startswith('UPDATE "products_product"')
+            ]
+            self.assertEqual(locked, sorted([self.product.pk, other.pk, third.pk]))
+
+    def test_retries_give_up_after_conflict_retries(self):
+        with mock.patch.object(Sale, '_claim', side_effect=ConcurrentUpdate('conflito')) as claim, \
+                mock.patch('sales.models._time.sleep'):
+            with self.assertRaises(ConcurrentUpdate):
+                self.sale.add_item(self.product, 1)
+        self.assertEqual(claim.call_count, CONFLICT_RETRIES)
+        self.assertFalse(SaleItem.objects.exists())
+
+    def test_stale_item_delete_does_not_return_stock_twice(self):
+        self.sale.add_item(self.product, 2)
+        stale = SaleItem.objects.get()
+        current = SaleItem.objects.get()
+        current.quantity = 3
+        current.save()
+
+        with self.assertRaises(ConcurrentUpdate):
+            stale.delete()
+        self.assertTrue(SaleItem.objects.filter(pk=current.pk).exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 47)
+
+    def test_add_item_view_reports_conflicts_as_bad_request(self):
+        self.client.force_login(User.objects.create_user('garcom', password='x'))
+        url = f'/sales/{self.sale.pk}/add-item/'
+        data = {'product_id': self.product.pk, 'quantity': 1}
+
+        with mock.patch.object(Sale, '_claim', side_effect=ConcurrentUpdate('conflito')), \
+                mock.patch('sales.models._time.sleep'):
+            self.assertEqual(self.client.post(url, data).status_code, 400)
+
+        # Outro aparelho fecha a comanda durante o conflito: a nova tentativa a recarrega fechada
+        refresh_from_db = Sale.refresh_from_db
+
+        def closed_meanwhile(sale, *args, **kwargs):
+            Sale.objects.filter(pk=sale.pk).update(status=Sale.STATUS_CANCELLED)
+            refresh_from_db(sale, *args, **kwargs)
+
+        with mock.patch.object(Sale, '_claim', side_effect=ConcurrentUpdate('conflito')), \
+                mock.patch.object(Sale, 'refresh_from_db', autospec=True, side_effect=closed_meanwhile), \
+                mock.patch('sales.models._time.sleep'):
+            response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 400)
+        self.assertContains(response, 'Venda não está aberta.', status_code=400)
@@ -4,8 +4,11 @@ from . import views
 urlpatterns = [
     path('', views.sale_list, name='sale_list'),
     path('create/', views.sale_create, name='sale_create'),
+    path('sync/', views.sync_operations, name='sync_operations'),
     path('<int:sale_id>/', views.sale_detail, name='sale_detail'),
     path('<int:sale_id>/add-item/', views.add_item, name='add_item'),
+    path('<int:sale_id>/quick-add/', views.quick_add_item, name='quick_add_item'),
+    path('<int:sale_id>/search-products/', views.search_products, name='sale_search_products'),
     path('<int:sale_id>/pay/', views.pay_sale, name='pay_sale'),
     path('<int:sale_id>/cancel/', views.cancel_sale, name='cancel_sale'),
     path('<int:sale_id>/reopen/', views.reopen_sale, name='reopen_sale'),
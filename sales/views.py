@@ -1,12 +1,16 @@
 from decimal import Decimal, InvalidOperation
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.decorators.http import require_POST
-from django.http import HttpResponseBadRequest
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.contrib.auth.decorators import login_required
+import json
 from django.db import transaction
+from django.db.models import Q
 from django.views.generic import CreateView
 from django.urls import reverse_lazy
 from .models import Sale, SaleItem
-from products.models import Product
+from .sync import SyncError, apply_operations
+from products.models import Product, StockMovement
 from clients.models import Client
 
 def sale_list(request):
@@ -58,17 +62,33 @@ def add_item(request, sale_id):
     except (Product.DoesNotExist, ValueError):
         return HttpResponseBadRequest("Produto inválido.")
 
-    with transaction.atomic():
-        item, created = SaleItem.objects.select_for_update().get_or_create(
-            sale=sale,
-            product=product,
-            defaults={'quantity': quantity, 'price': product.sale_price}
-        )
-        if not created:
-            item.quantity += quantity
-            item.save(update_fields=['quantity'])
+    try:
+        sale.add_item(product, quantity)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    return render(request, 'partials/sale_items_fragment.html', {'sale': sale})
+
+@require_POST
+def quick_add_item(request, sale_id):
+    """Adiciona pelo código do produto: '12' ou '12 x3'"""
+    sale = get_object_or_404(Sale, pk=sale_id)
+    try:
+        sale.add_item_by_code(request.POST.get('entry', ''))
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
     return render(request, 'partials/sale_items_fragment.html', {'sale': sale})
 
+def search_products(request, sale_id):
+    """Busca produtos em estoque por nome ou código para a comanda"""
+    sale = get_object_or_404(Sale, pk=sale_id)
+    search = request.GET.get('search', '').strip()
+    products = Product.objects.none()
+    if search:
+        products = Product.objects.filter(quantity__gt=0)\
+            .filter(Q(name__icontains=search) | Q(code=search))\
+            .order_by('name')[:20]
+    return render(request, 'partials/search_results_fragment.html', {'sale': sale, 'products': products})
+
 @require_POST
 def pay_sale(request, sale_id):
     sale = get_object_or_404(Sale, pk=sale_id)
@@ -122,8 +142,10 @@ def remove_item(request, sale_id, item_id):
     except SaleItem.DoesNotExist:
         return HttpResponseBadRequest("Item não encontrado.")
 
-    with transaction.atomic():
-        item.delete()
+    try:
+        sale.remove_item(item)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
 
     return render(request, 'partials/sale_items_fragment.html', {'sale': sale})
 
@@ -133,12 +155,27 @@ def delete_sale(request, sale_id):
     with transaction.atomic():
         if sale.status == Sale.STATUS_FINALIZED:
             # Return reserved stock before deleting
-            for item in sale.items.select_related('product'):
-                item.product.quantity += item.quantity
-                item.product.save(update_fields=['quantity'])
+            sale.return_stock(StockMovement.Reason.SALE_DELETED)
         sale.delete()
     return redirect('sale_list')
 
+@login_required
+@require_POST
+def sync_operations(request):
+    try:
+        body = json.loads(request.body or b'{}')
+        operations = body['operations']
+        if not isinstance(operations, list) or not all(isinstance(op, dict) for op in operations):
+            raise ValueError()
+    except (ValueError, KeyError, TypeError):
+        return HttpResponseBadRequest("Lote de operações inválido.")
+
+    try:
+        results = apply_operations(operations)
+    except SyncError as e:
+        return HttpResponseBadRequest(str(e))
+    return JsonResponse({'results': results})
+
 class SaleCreateView(CreateView):
     model = Sale
     fields = ['product', 'quantity', 'price']
@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from .models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'priority', 'run_at', 'attempts', 'locked_by', 'finished_at')
+    list_filter = ('status', 'name')
+    date_hierarchy = 'created_at'
+    readonly_fields = ('attempts', 'last_error', 'locked_by', 'locked_at', 'created_at', 'finished_at')
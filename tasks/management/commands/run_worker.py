@@ -0,0 +1,85 @@
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from tasks.queue import claim, prune_finished, requeue_stale, run
+
+
+class Command(BaseCommand):
+    help = (
+        'Executa as tarefas da fila (tasks.Task) num pool de threads. '
+        'Vários workers podem rodar ao mesmo tempo; ligue TASKS_ASYNC=1 nos servidores web.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--poll', type=float, default=1.0,
+                            help='Segundos de espera quando a fila está vazia.')
+        parser.add_argument('--once', action='store_true',
+                            help='Executa o que estiver vencido e sai.')
+
+    def handle(self, *args, **options):
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        threads = options['threads']
+        stopping = threading.Event()
+        busy = threading.Semaphore(threads)
+        counts = {'ok': 0, 'failed': 0}
+        counts_lock = threading.Lock()
+
+        def stop(signum, frame):
+            self.stdout.write("Encerrando: aguardando as tarefas em andamento...")
+            stopping.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        def execute(task_obj):
+            try:
+                ok = run(task_obj)
+            except Exception as e:
+                # Erro do próprio banco ao gravar o resultado; a tarefa volta pela requeue_stale
+                self.stderr.write(f"Tarefa {task_obj.pk}: {e}")
+                ok = False
+            try:
+                with counts_lock:
+                    counts['ok' if ok else 'failed'] += 1
+            finally:
+                # Cada thread tem a própria conexão; fecha para não acumular
+                connection.close()
+                busy.release()
+
+        self.stdout.write(f"Worker {worker} com {threads} threads")
+        last_requeue = 0.0
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='task') as pool:
+            while not stopping.is_set():
+                close_old_connections()
+                if time.monotonic() - last_requeue > 60:
+                    requeued = requeue_stale()
+                    if requeued:
+                        self.stdout.write(f"{requeued} tarefas presas devolvidas à fila")
+                    pruned = prune_finished()
+                    if pruned:
+                        self.stdout.write(f"{pruned} tarefas antigas apagadas")
+                    last_requeue = time.monotonic()
+
+                # Só reserva o que as threads livres conseguem executar agora
+                free = 0
+                while busy.acquire(blocking=False):
+                    free += 1
+                batch = claim(worker, free) if free else []
+                for _ in range(free - len(batch)):
+                    busy.release()
+                for task_obj in batch:
+                    pool.submit(execute, task_obj)
+
+                if not batch:
+                    if options['once'] and free == threads:
+                        break
+                    stopping.wait(options['poll'])
+        self.stdout.write(f"{counts['ok']} tarefas concluídas, {counts['failed']} com falha")
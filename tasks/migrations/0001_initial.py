@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:09
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='Função')),
+                ('args', models.JSONField(blank=True, default=list, verbose_name='Argumentos')),
+                ('kwargs', models.JSONField(blank=True, default=dict, verbose_name='Argumentos nomeados')),
+                ('priority', models.SmallIntegerField(default=0, verbose_name='Prioridade')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Executar em')),
+                ('status', models.CharField(choices=[('PE', 'Pendente'), ('RU', 'Executando'), ('OK', 'Concluída'), ('FA', 'Falhou')], default='PE', max_length=2, verbose_name='Status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3, verbose_name='Máximo de Tentativas')),
+                ('last_error', models.TextField(blank=True, verbose_name='Último Erro')),
+                ('locked_by', models.CharField(blank=True, max_length=100, verbose_name='Worker')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='Iniciada em')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criada em')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finalizada em')),
+            ],
+            options={
+                'ordering': ['-priority', 'run_at', 'pk'],
+                'indexes': [models.Index(fields=['status', '-priority', 'run_at'], name='task_queue_idx')],
+            },
+        ),
+    ]
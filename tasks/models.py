@@ -0,0 +1,38 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """Uma chamada de função agendada, executada pelo manage.py run_worker."""
+
+    class Status(models.TextChoices):
+        PENDING = 'PE', 'Pendente'
+        RUNNING = 'RU', 'Executando'
+        DONE = 'OK', 'Concluída'
+        FAILED = 'FA', 'Falhou'
+
+    name = models.CharField(max_length=255, verbose_name='Função')
+    args = models.JSONField(default=list, blank=True, verbose_name='Argumentos')
+    kwargs = models.JSONField(default=dict, blank=True, verbose_name='Argumentos nomeados')
+    priority = models.SmallIntegerField(default=0, verbose_name='Prioridade')  # maior sai antes
+    run_at = models.DateTimeField(default=timezone.now, verbose_name='Executar em')
+    status = models.CharField(
+        max_length=2, choices=Status.choices, default=Status.PENDING, verbose_name='Status'
+    )
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas')
+    max_attempts = models.PositiveSmallIntegerField(default=3, verbose_name='Máximo de Tentativas')
+    last_error = models.TextField(blank=True, verbose_name='Último Erro')
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name='Worker')
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name='Iniciada em')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criada em')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Finalizada em')
+
+    class Meta:
+        ordering = ['-priority', 'run_at', 'pk']
+        indexes = [
+            # Fila: status=PE e run_at <= agora, na ordem de Meta.ordering
+            models.Index(fields=['status', '-priority', 'run_at'], name='task_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.get_status_display()})"
@@ -0,0 +1,165 @@
+"""Fila de tarefas no próprio banco, sem broker externo.
+
+Funções marcadas com @task podem ser enfileiradas com func.enqueue(...)
+ou enqueue(func, ...). Com TASKS_ASYNC desligado (padrão) a função roda
+na hora, dentro da requisição, como antes; ligado, vira uma linha em
+Task gravada na mesma transação de quem enfileirou, e o manage.py
+run_worker a executa depois do commit.
+
+Cada worker reserva tarefas com select_for_update(skip_locked=True) e um
+compare-and-swap no status, então vários workers podem dividir a fila.
+Falhas voltam para a fila com espera exponencial até max_attempts;
+tarefas presas em RUNNING (worker morto) são devolvidas depois de
+TASK_LOCK_TIMEOUT segundos, e as concluídas ou falhas são apagadas
+depois de TASK_RETENTION_DAYS dias.
+"""
+import logging
+import traceback
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+RETRY_BACKOFF_SECONDS = 30
+
+
+def task(func=None, *, priority=0, max_attempts=3):
+    """Registra a função como tarefa. Argumentos precisam ser serializáveis em JSON."""
+    if func is None:
+        return lambda f: task(f, priority=priority, max_attempts=max_attempts)
+    func.task_name = f'{func.__module__}.{func.__qualname__}'
+    func.task_options = {'priority': priority, 'max_attempts': max_attempts}
+
+    @wraps(func)
+    def enqueue_task(*args, **kwargs):
+        return enqueue(func, args, kwargs)
+
+    func.enqueue = enqueue_task
+    return func
+
+
+def enqueue(func, args=(), kwargs=None, *, priority=None, run_at=None, delay=None,
+            max_attempts=None, unique=False):
+    """Enfileira func(*args, **kwargs); devolve a Task (ou None se rodou na hora).
+
+    `delay` (segundos ou timedelta) e `run_at` agendam a execução;
+    `unique` não cria outra tarefa se já houver uma pendente igual.
+    """
+    if not hasattr(func, 'task_name'):
+        raise ValueError(f"{func!r} não é uma tarefa (@task).")
+    kwargs = kwargs or {}
+    if not getattr(settings, 'TASKS_ASYNC', False):
+        func(*args, **kwargs)
+        return None
+
+    if delay is not None:
+        run_at = timezone.now() + (delay if isinstance(delay, timedelta) else timedelta(seconds=delay))
+    fields = {'name': func.task_name, 'args': list(args), 'kwargs': kwargs}
+    if unique:
+        existing = Task.objects.filter(status=Task.Status.PENDING, **fields).first()
+        if existing is not None:
+            return existing
+    options = func.task_options
+    return Task.objects.create(
+        **fields,
+        priority=options['priority'] if priority is None else priority,
+        max_attempts=options['max_attempts'] if max_attempts is None else max_attempts,
+        run_at=run_at or timezone.now(),
+    )
+
+
+def claim(worker, limit):
+    """Reserva até `limit` tarefas vencidas para o worker, por prioridade."""
+    now = timezone.now()
+    with transaction.atomic():
+        candidates = list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(status=Task.Status.PENDING, run_at__lte=now)
+            .values_list('pk', flat=True)[:limit]
+        )
+        claimed = [pk for pk in candidates if _claim_one(pk, worker, now)]
+    return list(Task.objects.filter(pk__in=claimed))
+
+
+def _claim_one(pk, worker, now):
+    """Compare-and-swap: em bancos sem SKIP LOCKED (SQLite) outro worker pode ter lido a mesma."""
+    return bool(Task.objects.filter(pk=pk, status=Task.Status.PENDING).update(
+        status=Task.Status.RUNNING, locked_by=worker, locked_at=now, attempts=F('attempts') + 1,
+    ))
+
+
+def run(task_obj):
+    """Executa uma tarefa reservada e grava o resultado (ou agenda nova tentativa)."""
+    try:
+        func = import_string(task_obj.name)
+        if not hasattr(func, 'task_name'):
+            raise ValueError(f"{task_obj.name} não é uma tarefa (@task).")
+        func(*task_obj.args, **task_obj.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Tarefa %s falhou (tentativa %s/%s)", task_obj, task_obj.attempts, task_obj.max_attempts)
+        _fail(task_obj, error)
+        return False
+    Task.objects.filter(pk=task_obj.pk).update(
+        status=Task.Status.DONE, finished_at=timezone.now(), last_error='',
+    )
+    return True
+
+
+def _fail(task_obj, error):
+    # Só mexe se ainda estiver em RUNNING (outro caminho pode já ter concluído a tarefa)
+    running = Task.objects.filter(pk=task_obj.pk, status=Task.Status.RUNNING)
+    if task_obj.attempts < task_obj.max_attempts:
+        delay = RETRY_BACKOFF_SECONDS * 2 ** (task_obj.attempts - 1)
+        running.update(
+            status=Task.Status.PENDING,
+            run_at=timezone.now() + timedelta(seconds=delay),
+            last_error=error,
+        )
+    else:
+        running.update(
+            status=Task.Status.FAILED, finished_at=timezone.now(), last_error=error,
+        )
+
+
+def requeue_stale(timeout=None):
+    """Devolve à fila tarefas em RUNNING há mais de `timeout` segundos."""
+    timeout = getattr(settings, 'TASK_LOCK_TIMEOUT', 600) if timeout is None else timeout
+    stale = Task.objects.filter(
+        status=Task.Status.RUNNING, locked_at__lt=timezone.now() - timedelta(seconds=timeout),
+    )
+    requeued = 0
+    for task_obj in stale:
+        _fail(task_obj, f"Worker {task_obj.locked_by} não concluiu a tarefa em {timeout}s.")
+        requeued += 1
+    return requeued
+
+
+def prune_finished(days=None):
+    """Apaga tarefas concluídas ou falhas há mais de `days` dias."""
+    days = getattr(settings, 'TASK_RETENTION_DAYS', 7) if days is None else days
+    deleted, _ = Task.objects.filter(
+        status__in=[Task.Status.DONE, Task.Status.FAILED],
+        finished_at__lt=timezone.now() - timedelta(days=days),
+    ).delete()
+    return deleted
+
+
+def run_pending(worker='inline'):
+    """Executa no processo atual tudo o que estiver vencido na fila."""
+    done = 0
+    while True:
+        batch = claim(worker, 50)
+        if not batch:
+            return done
+        for task_obj in batch:
+            run(task_obj)
+            done += 1
@@ -0,0 +1,117 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Task
+from .queue import _claim_one, claim, enqueue, prune_finished, requeue_stale, run, run_pending, task
+
+calls = []
+
+
+@task
+def record(value):
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def explode():
+    raise RuntimeError('falhou')
+
+
+class InlineQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_runs_immediately_without_creating_tasks(self):
+        record.enqueue('agora')
+
+        self.assertEqual(calls, ['agora'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_only_registered_functions_can_be_enqueued(self):
+        with self.assertRaises(ValueError):
+            enqueue(print, ['x'])
+
+
+@override_settings(TASKS_ASYNC=True)
+class QueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_stores_the_call_without_running_it(self):
+        created = record.enqueue('depois')
+
+        self.assertEqual(calls, [])
+        self.assertEqual((created.name, created.args, created.status), ('tasks.tests.record', ['depois'], 'PE'))
+
+    def test_unique_reuses_the_pending_task(self):
+        first = enqueue(record, ['a'], unique=True)
+        second = enqueue(record, ['a'], unique=True)
+        other = enqueue(record, ['b'], unique=True)
+
+        self.assertEqual(first.pk, second.pk)
+        self.assertNotEqual(first.pk, other.pk)
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_claim_follows_priority_and_skips_scheduled_tasks(self):
+        enqueue(record, ['baixa'])
+        enqueue(record, ['alta'], priority=10)
+        enqueue(record, ['depois'], delay=3600)
+
+        claimed = claim('w1', 10)
+
+        self.assertEqual([t.args for t in claimed], [['alta'], ['baixa']])
+        self.assertTrue(all(t.status == Task.Status.RUNNING and t.attempts == 1 for t in claimed))
+        self.assertEqual(claim('w2', 10), [])
+
+    def test_claim_is_a_compare_and_swap(self):
+        pending = enqueue(record, ['x'])
+        now = timezone.now()
+
+        self.assertTrue(_claim_one(pending.pk, 'w1', now))
+        # Segundo worker leu a mesma tarefa antes da troca de status
+        self.assertFalse(_claim_one(pending.pk, 'w2', now))
+        self.assertEqual(Task.objects.get().locked_by, 'w1')
+
+    def test_failure_is_retried_with_backoff_then_marked_failed(self):
+        explode.enqueue()
+        run_pending()
+
+        failed = Task.objects.get()
+        self.assertEqual((failed.status, failed.attempts), (Task.Status.PENDING, 1))
+        self.assertIn('falhou', failed.last_error)
+        self.assertGreater(failed.run_at, timezone.now() + timedelta(seconds=20))
+
+        Task.objects.update(run_at=timezone.now())
+        run_pending()
+
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.attempts), (Task.Status.FAILED, 2))
+        self.assertIsNotNone(failed.finished_at)
+
+    def test_successful_run_marks_done(self):
+        record.enqueue('ok')
+        [claimed] = claim('w1', 1)
+
+        self.assertTrue(run(claimed))
+        self.assertEqual(calls, ['ok'])
+        self.assertEqual(Task.objects.get().status, Task.Status.DONE)
+
+    def test_stale_running_tasks_are_requeued(self):
+        record.enqueue('preso')
+        claim('morto', 1)
+        Task.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(requeue_stale(timeout=600), 1)
+        self.assertEqual(Task.objects.get().status, Task.Status.PENDING)
+
+    def test_prune_deletes_only_old_finished_tasks(self):
+        old = timezone.now() - timedelta(days=30)
+        Task.objects.create(name='tasks.tests.record', status=Task.Status.DONE, finished_at=old)
+        Task.objects.create(name='tasks.tests.record', status=Task.Status.FAILED, finished_at=old)
+        Task.objects.create(name='tasks.tests.record', status=Task.Status.DONE, finished_at=timezone.now())
+        Task.objects.create(name='tasks.tests.record')
+
+        self.assertEqual(prune_finished(days=7), 2)
+        self.assertEqual(Task.objects.count(), 2)